@@ -23,7 +23,7 @@ class Analyzer:
         """
         self.config: Dict[str, Any] = config
         self.env = Environment(loader=FileSystemLoader("."))
-        self.analyze_llm = LLMRequest("solve_agent")
+        self.analyze_llm = LLMRequest("analyzer")
         self.problem = problem
         with open("./prompt.yaml", "r", encoding="utf-8") as file:
             self.prompt: Dict[str, Any] = yaml.safe_load(file)
@@ -49,7 +49,10 @@ class Analyzer:
         Raises:
             json.JSONDecodeError: 当修复后的结果仍无法解析时抛出。
         """
-        history_summary = memory.get_summary()
+        # 召回查询与召回库中的步骤一样只取输出开头，避免超长输出使向量化失败
+        history_summary = memory.get_summary(
+            query=f"{think}\n{output[:memory.recall_output_chars]}"
+        )
 
         template = self.env.from_string(self.prompt.get("step_analysis", ""))
         prompt = template.render(
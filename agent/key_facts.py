@@ -0,0 +1,177 @@
+"""解题关键事实存储模块。"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+FINDING = "finding"
+TOOL = "tool"
+
+# 各类事实的默认数量上限与单条字符上限
+DEFAULT_CAPACITY: Dict[str, int] = {FINDING: 20, TOOL: 5}
+DEFAULT_MAX_CHARS: Dict[str, int] = {FINDING: 500, TOOL: 200}
+
+# 字符三元组 Jaccard 相似度达到该值视为同一事实
+NEAR_DUPLICATE_THRESHOLD = 0.85
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    """归一化事实文本（折叠空白、转小写），用于哈希与相似度比较。"""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def _shingles(text: str) -> Set[str]:
+    """计算文本的字符三元组集合。"""
+    if len(text) < 3:
+        return {text}
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+class KeyFactStore:
+    """按类别管理关键事实：内容哈希去重、近似重复抑制、长度截断与 LRU 淘汰。
+
+    事实键由类别与归一化内容的 SHA-1 摘要组成，跨进程稳定，
+    从存档恢复后同一事实仍对应同一键。
+    """
+
+    def __init__(
+        self,
+        capacity: Optional[Dict[str, int]] = None,
+        max_chars: Optional[Dict[str, int]] = None,
+    ) -> None:
+        """初始化事实存储。
+
+        Args:
+            capacity: 各类别的事实数量上限。
+            max_chars: 各类别单条事实的字符上限。
+        """
+        self.capacity = dict(DEFAULT_CAPACITY, **(capacity or {}))
+        self.max_chars = dict(DEFAULT_MAX_CHARS, **(max_chars or {}))
+        # 键 -> {"kind", "text"}，按最近使用排序（末尾最新）
+        self._facts: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._shingle_cache: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        """事实数量。"""
+        return len(self._facts)
+
+    @staticmethod
+    def make_key(kind: str, text: str) -> str:
+        """计算事实的稳定键。
+
+        Args:
+            kind: 事实类别。
+            text: 事实文本。
+
+        Returns:
+            形如 ``finding:1a2b3c4d5e6f`` 的键。
+        """
+        digest = hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()[:12]
+        return f"{kind}:{digest}"
+
+    def _truncate(self, kind: str, text: str) -> str:
+        """按类别字符上限截断事实文本。"""
+        limit = self.max_chars.get(kind, 0)
+        text = text.strip()
+        if limit > 0 and len(text) > limit:
+            return text[:limit] + "..."
+        return text
+
+    def _find_near_duplicate(self, kind: str, text: str) -> Optional[str]:
+        """查找同类别中与 text 近似重复的事实键。"""
+        shingles = _shingles(_normalize(text))
+        for key, fact in self._facts.items():
+            if fact["kind"] != kind:
+                continue
+            existing = self._shingle_cache.get(key)
+            if existing is None:
+                existing = _shingles(_normalize(fact["text"]))
+                self._shingle_cache[key] = existing
+            union = len(shingles | existing)
+            if union and len(shingles & existing) / union >= NEAR_DUPLICATE_THRESHOLD:
+                return key
+        return None
+
+    def add(self, kind: str, text: str) -> bool:
+        """加入一条事实。
+
+        完全相同或近似重复的事实只刷新其最近使用时间（近似重复时保留较新的措辞）。
+
+        Args:
+            kind: 事实类别。
+            text: 事实文本。
+
+        Returns:
+            存储内容是否发生变化。
+        """
+        text = self._truncate(kind, text)
+        if not text:
+            return False
+
+        key = self.make_key(kind, text)
+        if key not in self._facts:
+            key = self._find_near_duplicate(kind, text) or key
+
+        existing = self._facts.get(key)
+        if existing is not None:
+            changed = existing["text"] != text or next(reversed(self._facts)) != key
+            existing["text"] = text
+            self._shingle_cache.pop(key, None)
+            self._facts.move_to_end(key)
+            return changed
+
+        self._facts[key] = {"kind": kind, "text": text}
+        self._evict(kind)
+        return True
+
+    def _evict(self, kind: str) -> None:
+        """淘汰超出类别上限的最久未使用事实。"""
+        limit = self.capacity.get(kind, 0)
+        if limit <= 0:
+            return
+        keys = [key for key, fact in self._facts.items() if fact["kind"] == kind]
+        for key in keys[: max(0, len(keys) - limit)]:
+            del self._facts[key]
+            self._shingle_cache.pop(key, None)
+
+    def values(self) -> List[str]:
+        """按最近使用顺序返回全部事实文本（末尾最新）。"""
+        return [fact["text"] for fact in self._facts.values()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出为可 JSON 序列化的字典。"""
+        return {
+            "version": 2,
+            "facts": [
+                {"key": key, "kind": fact["kind"], "text": fact["text"]}
+                for key, fact in self._facts.items()
+            ],
+        }
+
+    def restore(self, data: Any) -> None:
+        """从 to_dict 导出的数据或旧版 {键: 文本} 格式恢复。
+
+        旧版中以 ``finding:`` 开头的键视为发现，其余（tool_results、tool_calls）视为工具记录，
+        恢复时按稳定哈希重新生成键。
+
+        Args:
+            data: 存档中的关键事实数据。
+        """
+        self._facts = OrderedDict()
+        self._shingle_cache = {}
+        if not isinstance(data, dict):
+            return
+
+        if data.get("version") == 2 and isinstance(data.get("facts"), list):
+            for fact in data["facts"]:
+                if isinstance(fact, dict) and isinstance(fact.get("text"), str):
+                    self.add(str(fact.get("kind", FINDING)), fact["text"])
+            return
+
+        for key, value in data.items():
+            if isinstance(value, str):
+                kind = FINDING if str(key).startswith("finding") else TOOL
+                self.add(kind, value)
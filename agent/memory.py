@@ -1,60 +1,193 @@
 """解题过程记忆管理模块。"""
 
+import contextvars
 import json
 import logging
-from typing import Any, Dict, List
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 import json_repair
 
+from agent.key_facts import FINDING, TOOL, KeyFactStore
+from agent.step_record import StepRecord
 from config import Config
+from utils.blob_store import BlobStore
 from utils.llm_request import LLMRequest
 from utils.text import optimize_text
+from utils.tokenizer import count_tokens
+from utils.vector_index import VectorIndex
 
 logger = logging.getLogger(__name__)
 
+# 单次 embedding 请求的最大文本条数
+_EMBED_BATCH_SIZE = 64
+# 缓存的查询向量条数（规划重试、反思等会以相同查询再次召回）
+_QUERY_CACHE_SIZE = 8
+
 
 class Memory:
     """管理解题历史、关键事实与压缩记忆。
 
-    基于 token 估算的上下文占用率触发压缩：
-    当 get_summary() 的估算 token 数 >= context_window * compression_ratio 时自动压缩。
+    基于 token 计数的上下文占用率触发压缩：
+    当提示词固定部分与 get_summary() 的 token 数之和 >= context_window * compression_ratio 时，
+    在后台线程中压缩已执行完的步骤快照，完成后在下次写入时换入，解题循环不必等待；
+    仅当占用超过 context_window * high_water 时才同步压缩。
+    压缩分层滚动进行：最近 keep_recent 个步骤保留原文，更早的步骤每次最多压缩
+    compress_window 个为一个记忆块；记忆块超过 max_blocks 个时，较早的块递归合并为
+    一个早期摘要，使每次压缩调用的输入规模有界。
+    摘要按步骤增量渲染：每次写入只重新渲染变化的步骤并更新累计 token 数，
+    get_summary() 只拼接缓存片段。
     """
 
     def __init__(
         self,
         context_window: int = 128000,
         compression_ratio: float = 0.8,
+        high_water: float = 0.95,
+        keep_recent: int = 4,
+        compress_window: int = 8,
+        max_blocks: int = 4,
     ) -> None:
         """初始化记忆对象。
 
         Args:
             context_window: 模型上下文窗口大小（token 数）。
-            compression_ratio: 触发压缩的上下文占用比例。
+            compression_ratio: 触发后台压缩的上下文占用比例。
+            high_water: 触发同步压缩的上下文占用比例。
+            keep_recent: 压缩时保留原文的最近步骤数。
+            compress_window: 单次压缩的最大步骤数。
+            max_blocks: 压缩记忆块数量上限（含早期摘要），超出后合并较早的块。
         """
         self.config = Config.load_config()
-        self.solve_llm = LLMRequest("solve_agent")
+        self.compress_llm = LLMRequest("compressor")
         self.context_window = context_window
         self.compression_ratio = compression_ratio
-        self.history: List[Dict[str, Any]] = []
+        self.high_water = max(high_water, compression_ratio)
+        self.keep_recent = max(0, keep_recent)
+        self.compress_window = max(1, compress_window)
+        self.max_blocks = max(2, max_blocks)
+        self.history: List[StepRecord] = []
+        # 工具输出按内容寻址存放，步骤记录只保存引用
+        self.blobs = BlobStore()
         self.compressed_memory: List[Dict[str, Any]] = []
-        self.key_facts: Dict[str, str] = {}
+        self.key_facts = KeyFactStore()
         self.failed_attempts: Dict[str, int] = {}
+        self.reserved_tokens = 0
 
         self._token_limit = int(context_window * compression_ratio)
+        self._high_water_limit = int(context_window * self.high_water)
+        # 后台任务（压缩或合并）及其覆盖的条目数；记忆被整体替换时 generation 递增
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Future] = None
+        self._pending_kind = ""
+        self._pending_count = 0
+        self._pending_generation = 0
+        self._generation = 0
+        # 最近一次合并失败时的记忆块数；块数增长前不再重试，避免压缩模型持续失败时每步都发起调用
+        self._merge_failed_blocks: Optional[int] = None
+        # 与 history 一一对应的已渲染步骤片段及其 token 数
+        self._fragments: List[str] = []
+        self._entry_tokens: List[int] = []
+        self._history_tokens = 0
+        # 关键事实块与压缩记忆块的渲染缓存：(文本, token 数)，None 表示需重新渲染
+        self._facts_block: Optional[Tuple[str, int]] = None
+        self._compressed_block: Optional[Tuple[str, int]] = None
+        # include_key_facts -> 完整摘要
+        self._summary_cache: Dict[bool, str] = {}
+
+        recall_config = self.config.get("memory_recall", {})
+        if not isinstance(recall_config, dict):
+            recall_config = {}
+        self.recall_top_k = int(recall_config.get("top_k", 5))
+        self.recall_output_chars = int(recall_config.get("output_chars", 800))
+        self.embed_llm: Optional[LLMRequest] = None
+        if recall_config.get("enabled", False):
+            llm_config = self.config.get("llm", {})
+            if isinstance(llm_config, dict) and "embedding" in llm_config:
+                self.embed_llm = LLMRequest("embedding")
+            else:
+                logger.warning("未配置 llm.embedding，记忆语义召回已禁用")
+        # 步骤键 -> 召回时展示的步骤文本（截断输出），压缩后仍保留
+        self._recall_store: Dict[str, str] = {}
+        self._recall_index = VectorIndex()
+        # 查询文本 -> 向量，避免同一查询重复向量化
+        self._query_vectors: "OrderedDict[str, List[float]]" = OrderedDict()
 
     @staticmethod
     def _estimate_tokens(text: str) -> int:
-        """简单估算文本的 token 数量（约 4 字符/token）。"""
-        return max(1, len(text) // 4)
+        """计算文本的 token 数量。"""
+        return count_tokens(text)
 
-    def _current_usage_tokens(self) -> int:
-        """估算当前 get_summary() 会占据的 token 数。"""
-        summary = self.get_summary()
-        return self._estimate_tokens(summary)
+    def reserve_tokens(self, tokens: int) -> None:
+        """设置提示词中记忆以外部分（模板、题目、工具说明等）占用的 token 数。
+
+        Args:
+            tokens: 固定占用的 token 数。
+        """
+        self.reserved_tokens = max(0, tokens)
+
+    def _render_entry(self, index: int) -> None:
+        """渲染第 index 个历史步骤并更新其片段与 token 计数。
 
-    def _should_compress(self) -> bool:
-        """判断当前上下文占用是否达到压缩阈值。"""
-        return self._current_usage_tokens() >= self._token_limit
+        Args:
+            index: 历史步骤下标。
+        """
+        fragment = self._format_step(self.history[index], index + 1)
+        tokens = self._estimate_tokens(fragment)
+        if index == len(self._fragments):
+            self._fragments.append(fragment)
+            self._entry_tokens.append(tokens)
+        else:
+            self._history_tokens -= self._entry_tokens[index]
+            self._fragments[index] = fragment
+            self._entry_tokens[index] = tokens
+        self._history_tokens += tokens
+        self._summary_cache.clear()
+
+    def _reset_entries(self) -> None:
+        """丢弃全部渲染缓存并按当前状态重建。"""
+        self._fragments = []
+        self._entry_tokens = []
+        self._history_tokens = 0
+        for index in range(len(self.history)):
+            self._render_entry(index)
+        self._facts_block = None
+        self._compressed_block = None
+        self._summary_cache.clear()
+
+    def _invalidate_facts(self) -> None:
+        """关键事实变化后使其渲染缓存失效。"""
+        self._facts_block = None
+        self._summary_cache.clear()
+
+    def _invalidate_compressed(self) -> None:
+        """压缩记忆变化后使其渲染缓存失效。"""
+        self._compressed_block = None
+        self._summary_cache.clear()
+
+    def _get_facts_block(self) -> Tuple[str, int]:
+        """获取关键事实块文本及 token 数。"""
+        if self._facts_block is None:
+            text = self._format_key_facts()
+            self._facts_block = (text, self._estimate_tokens(text))
+        return self._facts_block
+
+    def _get_compressed_block(self) -> Tuple[str, int]:
+        """获取压缩记忆块文本及 token 数。"""
+        if self._compressed_block is None:
+            text = self._format_compressed_memory()
+            self._compressed_block = (text, self._estimate_tokens(text))
+        return self._compressed_block
+
+    def _current_usage_tokens(self) -> int:
+        """计算当前提示词（固定部分 + 记忆摘要）占据的 token 数。"""
+        return (
+            self.reserved_tokens
+            + self._get_facts_block()[1]
+            + self._get_compressed_block()[1]
+            + self._history_tokens
+        )
 
     def add_step(self, step: Dict[str, Any]) -> None:
         """添加执行步骤并在 token 超限时触发压缩。
@@ -62,9 +195,10 @@ class Memory:
         Args:
             step: 步骤数据字典，包含工具调用、结果与分析等信息。
         """
-        self.history.append(step)
+        record = StepRecord.from_dict(step, self.blobs)
+        self.history.append(record)
 
-        self._extract_key_facts(step)
+        self._extract_key_facts(record)
 
         if "analysis" in step and "success" in step["analysis"]:
             if not step["analysis"]["success"]:
@@ -81,8 +215,11 @@ class Memory:
                     self.failed_attempts.get(command, 0) + 1
                 )
 
-        if self._should_compress():
-            self.compress_memory()
+        self._render_entry(len(self.history) - 1)
+        if record.status != "planned":
+            self._remember_step(record)
+
+        self._maybe_compress()
 
     def add_planned_step(
         self,
@@ -97,17 +234,10 @@ class Memory:
             think: 当前步骤的思考内容。
             tool_calls: 工具调用列表。
         """
-        self.history.append(
-            {
-                "step": step_num,
-                "think": think,
-                "tool_calls": tool_calls,
-                "status": "planned",
-            }
-        )
+        self.history.append(StepRecord(step_num, think, tool_calls))
+        self._render_entry(len(self.history) - 1)
 
-        if self._should_compress():
-            self.compress_memory()
+        self._maybe_compress()
 
     def update_step(self, step_num: int, fields: Dict[str, Any]) -> None:
         """按步骤号更新历史记录并在 token 超限时触发压缩。
@@ -117,50 +247,319 @@ class Memory:
             fields: 需要更新的字段字典。
         """
         for index in range(len(self.history) - 1, -1, -1):
-            step = self.history[index]
-            if step.get("step") == step_num:
-                step.update(fields)
+            record = self.history[index]
+            if record.step == step_num:
+                record.update(fields, self.blobs)
+                self._render_entry(index)
+                if record.status != "planned":
+                    self._extract_key_facts(record)
+                    self._remember_step(record)
                 break
 
-        if self._should_compress():
-            self.compress_memory()
+        self._maybe_compress()
 
-    def _extract_key_facts(self, step: Dict[str, Any]) -> None:
-        """从步骤中提取关键命令、输出与分析信息。
+    def _extract_key_facts(self, record: StepRecord) -> None:
+        """从步骤中提取工具调用记录与关键发现。
 
         Args:
-            step: 步骤数据字典。
+            record: 步骤记录。
         """
-        if "tool_results" in step and step["tool_results"]:
-            pairs = []
-            for index, tr in enumerate(step["tool_results"], 1):
-                name = tr.get("tool_name", "未知工具")
-                args = tr.get("arguments", {})
-                output = str(tr.get("output", ""))
-                short_out = output
-                pairs.append(f"{index}. {name}({args}) → {short_out}")
-            self.key_facts["tool_results"] = "\n".join(pairs)
-        elif "tool_calls" in step and step["tool_calls"]:
-            tool_call_summary = []
-            for index, tool_call in enumerate(step["tool_calls"], 1):
+        changed = False
+        if record.tool_results:
+            for result in record.tool_results:
+                name = result.tool_name or "未知工具"
+                output = self.blobs.get(result.output_ref)
+                changed |= self.key_facts.add(TOOL, f"{name}({result.arguments}) → {output}")
+        elif record.tool_calls:
+            for tool_call in record.tool_calls:
                 tool_name = tool_call.get("tool_name", "未知工具")
                 args = tool_call.get("arguments", {})
-                tool_call_summary.append(f"{index}. {tool_name}({args})")
-            self.key_facts["tool_calls"] = (
-                f"工具调用: {', '.join(tool_call_summary)}"
+                changed |= self.key_facts.add(TOOL, f"工具调用: {tool_name}({args})")
+
+        analysis = (record.analysis or {}).get("analysis")
+        if isinstance(analysis, str) and "关键发现" in analysis:
+            changed |= self.key_facts.add(FINDING, analysis)
+
+        if changed:
+            self._invalidate_facts()
+
+    def _maybe_compress(self) -> None:
+        """按上下文占用决定是否压缩。
+
+        先合入已完成的后台任务；超过压缩阈值时在后台压缩一个窗口的较早步骤，
+        仅当超过高水位时才同步压缩。
+        """
+        self._apply_pending()
+
+        usage = self._current_usage_tokens()
+        if usage >= self._high_water_limit:
+            logger.info(
+                "上下文占用达到 %.0f%% 高水位，同步压缩记忆...",
+                self.high_water * 100,
+            )
+            self.compress_memory()
+        elif self._pending is None:
+            if usage >= self._token_limit:
+                self._start_background_compress()
+            elif len(self.compressed_memory) > self.max_blocks:
+                self._start_background_merge()
+
+    def _compressible_count(self, keep_recent: int) -> int:
+        """计算本次可压缩的历史前缀步骤数。
+
+        只压缩已执行完的步骤，保留最近 keep_recent 个步骤原文，且不超过一个窗口。
+
+        Args:
+            keep_recent: 保留原文的最近步骤数。
+
+        Returns:
+            可压缩的步骤数。
+        """
+        executed = 0
+        for record in self.history:
+            if record.status == "planned":
+                break
+            executed += 1
+        limit = min(executed, len(self.history) - keep_recent)
+        return max(0, min(limit, self.compress_window))
+
+    def _submit(self, kind: str, count: int, func: Any, *args: Any) -> None:
+        """提交后台任务。
+
+        Args:
+            kind: 任务类型（compress 或 merge）。
+            count: 任务覆盖的历史步骤数或记忆块数。
+            func: 在后台线程执行的函数。
+            args: 函数参数。
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="memory-compress"
+            )
+        # 复制上下文，使后台调用的遥测仍归属当前题目与步骤
+        context = contextvars.copy_context()
+        self._pending = self._executor.submit(context.run, func, *args)
+        self._pending_kind = kind
+        self._pending_count = count
+        self._pending_generation = self._generation
+
+    def _start_background_compress(self) -> None:
+        """在后台线程中压缩一个窗口的较早历史步骤。"""
+        count = self._compressible_count(self.keep_recent)
+        if count == 0:
+            if len(self.compressed_memory) > 1:
+                self._start_background_merge()
+            return
+
+        logger.info(
+            "上下文占用达到 %.0f%%，后台压缩 %d 个历史步骤...",
+            self.compression_ratio * 100,
+            count,
+        )
+        self._submit(
+            "compress",
+            count,
+            self._compress_history,
+            list(self.history[:count]),
+            list(self.key_facts.values()),
+        )
+
+    def _start_background_merge(self) -> None:
+        """在后台线程中将较早的记忆块合并为早期摘要。"""
+        count = self._merge_count()
+        if count < 2 or self._merge_backed_off():
+            return
+        logger.info("后台合并 %d 个较早的压缩记忆块...", count)
+        self._submit(
+            "merge",
+            count,
+            self._merge_blocks,
+            list(self.compressed_memory[:count]),
+        )
+
+    def _merge_backed_off(self) -> bool:
+        """上次合并失败且记忆块数尚未增长时返回 True。"""
+        return (
+            self._merge_failed_blocks is not None
+            and len(self.compressed_memory) <= self._merge_failed_blocks
+        )
+
+    def _record_merge_result(self, digest: Optional[Dict[str, Any]]) -> None:
+        """记录合并结果：失败时记下当前块数以暂停重试，成功时清除记录。"""
+        if digest is None:
+            self._merge_failed_blocks = len(self.compressed_memory)
+            logger.warning(
+                "记忆块合并失败，记忆块数增长前不再重试（当前 %d 块）",
+                self._merge_failed_blocks,
             )
+        else:
+            self._merge_failed_blocks = None
+
+    def _merge_count(self) -> int:
+        """计算需要合并的较早记忆块数量（保留最新 max_blocks - 1 个）。"""
+        return max(0, len(self.compressed_memory) - (self.max_blocks - 1))
+
+    def _apply_pending(self, wait: bool = False) -> None:
+        """将已完成的后台任务结果换入记忆。
+
+        Args:
+            wait: 是否等待进行中的后台任务完成。
+        """
+        pending = self._pending
+        if pending is None or (not wait and not pending.done()):
+            return
 
-        if "analysis" in step and "analysis" in step["analysis"]:
-            analysis = step["analysis"]["analysis"]
-            if "关键发现" in analysis:
-                self.key_facts[f"finding:{hash(analysis)}"] = analysis
+        self._pending = None
+        result = pending.result()
+        # 期间记忆被整体替换（如恢复存档）时丢弃过期结果
+        if self._pending_generation != self._generation:
+            return
+        if self._pending_kind == "compress":
+            self._commit_compression(result, self._pending_count)
+            return
+        self._record_merge_result(result)
+        if result is not None:
+            self._commit_merge(result, self._pending_count)
 
     def compress_memory(self) -> None:
-        """调用 LLM 压缩历史并生成结构化记忆块。"""
-        logger.info("上下文占用达到 %.0f%%，开始压缩记忆...", self.compression_ratio * 100)
-        if not self.history:
+        """同步压缩历史直至上下文占用回到阈值以下。
+
+        先在保留最近步骤原文的前提下逐窗口压缩；若最近步骤本身仍超过高水位，
+        再压缩最近步骤。
+        """
+        self._apply_pending(wait=True)
+
+        for keep_recent, limit in (
+            (self.keep_recent, self._token_limit),
+            (0, self._high_water_limit),
+        ):
+            while self._current_usage_tokens() >= limit:
+                count = self._compressible_count(keep_recent)
+                if count == 0:
+                    break
+                block = self._compress_history(
+                    list(self.history[:count]), list(self.key_facts.values())
+                )
+                self._commit_compression(block, count)
+                self._merge_blocks_now()
+
+    def _merge_blocks_now(self) -> None:
+        """记忆块超过上限时同步合并较早的块。"""
+        count = self._merge_count()
+        if (
+            len(self.compressed_memory) <= self.max_blocks
+            or count < 2
+            or self._merge_backed_off()
+        ):
             return
+        digest = self._merge_blocks(list(self.compressed_memory[:count]))
+        self._record_merge_result(digest)
+        if digest is not None:
+            self._commit_merge(digest, count)
+
+    def _commit_compression(self, block: Dict[str, Any], count: int) -> None:
+        """写入压缩记忆块并移除被压缩的历史步骤。
+
+        Args:
+            block: 压缩得到的记忆块。
+            count: 被压缩的历史前缀步骤数。
+        """
+        failed_attempts = block.get("failed_attempts", [])
+        if isinstance(failed_attempts, list):
+            for attempt in failed_attempts:
+                attempt_key = str(attempt)
+                self.failed_attempts[attempt_key] = (
+                    self.failed_attempts.get(attempt_key, 0) + 1
+                )
+
+        self.compressed_memory.append(block)
+        # 移除已压缩的详细历史，由 compressed_memory + key_facts 提供摘要
+        self.history = self.history[count:]
+        self.blobs.retain(
+            ref for record in self.history for ref in record.output_refs()
+        )
+        self._reset_entries()
+
+    def _commit_merge(self, digest: Dict[str, Any], count: int) -> None:
+        """用早期摘要替换被合并的较早记忆块。
+
+        Args:
+            digest: 合并得到的早期摘要。
+            count: 被合并的较早记忆块数。
+        """
+        self.compressed_memory = [digest] + self.compressed_memory[count:]
+        self._invalidate_compressed()
+
+    def _merge_blocks(self, blocks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """调用 LLM 将多个压缩记忆块合并为一个早期摘要。
+
+        只读取传入的快照，不修改记忆状态，可在后台线程中执行。
+
+        Args:
+            blocks: 待合并的记忆块（按时间先后）。
+
+        Returns:
+            早期摘要记忆块；合并失败时返回 None。
+        """
+        prompt = (
+            "你是一个专业的CTF解题助手，需要将多段按时间先后排列的解题记忆合并为一段摘要。请执行以下任务：\n"
+            "1. 合并去重关键发现，保留对解题仍有价值的技术细节\n"
+            "2. 合并已失败的尝试，避免后续重复\n"
+            "3. 以最后一段的状态为准总结当前状态和下一步建议\n"
+            "4. 以JSON格式返回以下结构的数据：\n"
+            "{\n"
+            '  "key_findings": ["发现1", "发现2"],\n'
+            '  "failed_attempts": ["命令1", "命令2"],\n'
+            '  "current_status": "当前状态描述",\n'
+            '  "next_steps": ["建议1", "建议2"]\n'
+            "}\n\n"
+            "待合并的记忆:\n"
+        )
+        for index, block in enumerate(blocks, 1):
+            content = {key: value for key, value in block.items() if key != "source_steps"}
+            prompt += f"\n记忆 {index}:\n{json.dumps(content, ensure_ascii=False)}\n"
+
+        source_steps = sum(int(block.get("source_steps", 0) or 0) for block in blocks)
+        try:
+            response = self.compress_llm.text_completion(
+                prompt=optimize_text(prompt),
+                json_check=True,
+                cache=True,
+                max_tokens=1024,
+            )
+            raw_content = response.choices[0].message.content
+            merged = json_repair.loads(
+                raw_content if isinstance(raw_content, str) else str(raw_content)
+            )
+        except Exception as error:
+            logger.error("记忆合并失败: %s", error)
+            return None
+
+        if not isinstance(merged, dict) or "key_findings" not in merged:
+            logger.warning("记忆合并结果格式错误，保留原记忆块")
+            return None
+
+        merged["digest"] = True
+        merged["source_steps"] = source_steps
+        logger.info("记忆合并成功: %d 个记忆块合并为早期摘要", len(blocks))
+        return merged
+
+    def _compress_history(
+        self,
+        history: List[StepRecord],
+        key_facts: List[str],
+    ) -> Dict[str, Any]:
+        """调用 LLM 将历史步骤压缩为结构化记忆块。
 
+        只读取传入的快照，不修改记忆状态，可在后台线程中执行。
+
+        Args:
+            history: 待压缩的历史步骤。
+            key_facts: 关键事实列表。
+
+        Returns:
+            压缩记忆块。
+        """
         prompt = (
             "你是一个专业的CTF解题助手，需要压缩解题历史记录。请执行以下任务：\n"
             "1. 识别并提取关键的技术细节和发现\n"
@@ -177,37 +576,35 @@ class Memory:
         )
 
         prompt += "关键事实摘要:\n"
-        for _, value in list(self.key_facts.items())[-5:]:
+        for value in key_facts[-5:]:
             prompt += f"- {value}\n"
 
-        for index, step in enumerate(
-            self.history[-len(self.history):]
-        ):
+        for index, record in enumerate(history):
             prompt += f"\n步骤 {index + 1}:\n"
-            prompt += f"- 目的: {step.get('think', '未指定')}\n"
-            if "tool_results" in step and step["tool_results"]:
-                for i, tr in enumerate(step["tool_results"], 1):
-                    name = tr.get("tool_name", "未知工具")
-                    args = tr.get("arguments", {})
-                    output = str(tr.get("output", ""))
-                    prompt += f"- 工具{i}: {name}({args}) → {output}\n"
-            elif step.get("tool_calls"):
+            prompt += f"- 目的: {record.think or '未指定'}\n"
+            if record.tool_results:
+                for i, result in enumerate(record.tool_results, 1):
+                    name = result.tool_name or "未知工具"
+                    output = self.blobs.get(result.output_ref)
+                    prompt += f"- 工具{i}: {name}({result.arguments}) → {output}\n"
+            elif record.tool_calls:
                 tool_call_list = []
-                for tool_call in step.get("tool_calls", []):
+                for tool_call in record.tool_calls:
                     name = tool_call.get("tool_name", "未知工具")
                     args = tool_call.get("arguments", {})
                     tool_call_list.append(f"{name}({args})")
                 prompt += f"- 命令: {', '.join(tool_call_list)}\n"
 
-            if "analysis" in step:
-                analysis = step["analysis"].get("analysis", "无分析")
+            if record.analysis is not None:
+                analysis = record.analysis.get("analysis", "无分析")
                 prompt += f"- 分析: {analysis}\n"
 
         response_content = ""
         try:
-            response = self.solve_llm.text_completion(
+            response = self.compress_llm.text_completion(
                 prompt=optimize_text(prompt),
                 json_check=True,
+                cache=True,
                 max_tokens=1024,
             )
 
@@ -217,46 +614,25 @@ class Memory:
             compressed_data: Dict[str, Any] = (
                 compressed_data_raw if isinstance(compressed_data_raw, dict) else {}
             )
-
-            failed_attempts = compressed_data.get("failed_attempts", [])
-            if isinstance(failed_attempts, list):
-                for attempt in failed_attempts:
-                    attempt_key = str(attempt)
-                    self.failed_attempts[attempt_key] = (
-                        self.failed_attempts.get(attempt_key, 0) + 1
-                    )
-
-            compressed_data["source_steps"] = len(self.history)
-            self.compressed_memory.append(compressed_data)
+            compressed_data["source_steps"] = len(history)
 
             key_findings = compressed_data.get("key_findings", [])
             finding_count = len(key_findings) if isinstance(key_findings, list) else 0
             logger.info("记忆压缩成功: 添加了%d个关键发现", finding_count)
+            return compressed_data
 
         except (json.JSONDecodeError, KeyError, TypeError):
             fallback = response_content.strip() if response_content else "压缩失败"
-            self.compressed_memory.append(
-                {
-                    "fallback_summary": fallback,
-                    "source_steps": len(self.history),
-                }
-            )
+            return {
+                "fallback_summary": fallback,
+                "source_steps": len(history),
+            }
         except Exception as error:
             logger.error("记忆压缩失败: %s", error)
-            self.compressed_memory.append(
-                {
-                    "error": f"压缩失败: {str(error)}",
-                    "source_steps": len(self.history),
-                }
-            )
-
-        # 压缩后清除详细历史，仅靠 compressed_memory + key_facts 提供摘要
-        self.history = []
-
-        # 压缩后再次检查是否需要继续压缩
-        if self._should_compress():
-            keep_last = min(2, len(self.compressed_memory))
-            self.compressed_memory = self.compressed_memory[-keep_last:]
+            return {
+                "error": f"压缩失败: {str(error)}",
+                "source_steps": len(history),
+            }
 
     def to_dict(self) -> Dict[str, Any]:
         """导出当前记忆状态为字典。
@@ -264,11 +640,16 @@ class Memory:
         Returns:
             包含历史、压缩记忆、关键事实等字段的字典。
         """
+        history = [record.to_dict() for record in self.history]
         return {
-            "history": self.history,
+            "history": history,
+            "blobs": self.blobs.to_dict(
+                ref for record in self.history for ref in record.output_refs()
+            ),
             "compressed_memory": self.compressed_memory,
-            "key_facts": self.key_facts,
+            "key_facts": self.key_facts.to_dict(),
             "failed_attempts": self.failed_attempts,
+            "recall_store": self._recall_store,
             "context_window": self.context_window,
             "compression_ratio": self.compression_ratio,
         }
@@ -279,9 +660,14 @@ class Memory:
         Args:
             data: 由 to_dict 导出的记忆状态字典。
         """
-        self.history = data.get("history", [])
+        self.blobs.restore(data.get("blobs", {}))
+        self.history = [
+            StepRecord.from_dict(step, self.blobs)
+            for step in data.get("history", [])
+            if isinstance(step, dict)
+        ]
         self.compressed_memory = data.get("compressed_memory", [])
-        self.key_facts = data.get("key_facts", {})
+        self.key_facts.restore(data.get("key_facts", {}))
         self.failed_attempts = data.get("failed_attempts", {})
         self.context_window = data.get(
             "context_window", self.context_window
@@ -290,85 +676,276 @@ class Memory:
             "compression_ratio", self.compression_ratio
         )
         self._token_limit = int(self.context_window * self.compression_ratio)
-
-    def get_summary(self, include_key_facts: bool = True) -> str:
+        self._high_water_limit = int(
+            self.context_window * max(self.high_water, self.compression_ratio)
+        )
+        self._generation += 1
+        self._merge_failed_blocks = None
+        self._pending = None
+        self._reset_entries()
+        recall_store = data.get("recall_store", {})
+        self._recall_store = dict(recall_store) if isinstance(recall_store, dict) else {}
+        self._recall_index.clear()
+
+    def close(self) -> None:
+        """关闭后台压缩线程，不等待进行中的压缩。"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._pending = None
+
+    def get_summary(
+        self,
+        include_key_facts: bool = True,
+        query: Optional[str] = None,
+    ) -> str:
         """生成综合记忆摘要文本。
 
+        各部分在状态变化时增量渲染并缓存，此处仅拼接缓存片段。
+        启用语义召回且提供 query 时，详细步骤只包含最近 keep_recent 个步骤
+        与 query 最相关的历史步骤，使提示词规模不随步数增长。
+
         Args:
             include_key_facts: 是否在摘要中包含关键事实。
+            query: 可选的召回查询文本（如当前思考内容）。
 
         Returns:
             综合记忆摘要字符串。
         """
-        summary = ""
-
-        if include_key_facts and self.key_facts:
-            summary += "关键事实:\n"
-            for _, value in list(self.key_facts.items())[-10:]:
-                summary += f"- {value}\n"
-            summary += "\n"
-
-        if self.compressed_memory:
-            summary += "压缩记忆块:\n"
-            for index, mem in enumerate(self.compressed_memory[-3:]):
-                summary += f"记忆块 #{len(self.compressed_memory) - index}:\n"
-
-                if "key_findings" in mem:
-                    summary += f"- 状态: {mem.get('current_status', '未知')}\n"
-                    summary += f"- 关键发现: {', '.join(mem['key_findings'][:3])}"
-                    if len(mem["key_findings"]) > 3:
-                        summary += f" 等{len(mem['key_findings'])}项"
-                    summary += "\n"
-
-                if "failed_attempts" in mem:
-                    failed_attempts = ", ".join(mem["failed_attempts"][:3])
-                    summary += f"- 失败尝试: {failed_attempts}"
-                    if len(mem["failed_attempts"]) > 3:
-                        summary += f" 等{len(mem['failed_attempts'])}项"
-                    summary += "\n"
-
-                if "next_steps" in mem:
-                    summary += f"- 建议步骤: {mem['next_steps'][0]}\n"
-
-                summary += f"- 来源: 基于{mem['source_steps']}个历史步骤\n\n"
-
-        if self.history:
-            summary += "最近详细步骤:\n"
-            for index, step in enumerate(self.history):
-                step_num = len(self.history) - index
-                summary += f"步骤 {step_num}:\n"
-                summary += f"- 目的: {step.get('think', '未指定')}\n"
-
-                if "tool_results" in step and step["tool_results"]:
-                    for i, tr in enumerate(step["tool_results"], 1):
-                        name = tr.get("tool_name", "未知工具")
-                        args = tr.get("arguments", {})
-                        output = str(tr.get("output", ""))
-                        summary += f"- 工具{i}: {name}({args})\n"
-                        summary += (
-                            f"  输出: {output}\n"
-                        )
-                elif step.get("tool_calls"):
-                    tool_call_list = []
-                    for tool_call in step.get("tool_calls", []):
-                        name = tool_call.get("tool_name", "未知工具")
-                        args = tool_call.get("arguments", {})
-                        tool_call_list.append(f"{name}({args})")
-                    summary += f"- 命令: {', '.join(tool_call_list)}\n"
-
-                if "analysis" in step:
-                    analysis = step["analysis"].get("analysis", "无分析")
-                    summary += f"- 分析: {analysis}\n"
-
-                if (
-                    "content" in step
-                    and step["content"] in self.failed_attempts
-                ):
-                    summary += (
-                        f"- 历史失败次数: "
-                        f"{self.failed_attempts[step['content']]}\n"
-                    )
+        self._apply_pending()
+        if query and self.embed_llm is not None:
+            recalled = self._recall_summary(include_key_facts, query)
+            if recalled is not None:
+                return recalled
+
+        cached = self._summary_cache.get(include_key_facts)
+        if cached is not None:
+            return cached
+
+        parts: List[str] = []
+        if include_key_facts:
+            parts.append(self._get_facts_block()[0])
+        parts.append(self._get_compressed_block()[0])
+        if self._fragments:
+            parts.append("最近详细步骤:\n")
+            parts.extend(self._fragments)
+
+        summary = "".join(parts) or "无历史记录"
+        self._summary_cache[include_key_facts] = summary
+        return summary
+
+    def latest_context(self) -> str:
+        """返回最近一个步骤的思考与分析，用作召回查询。
+
+        Returns:
+            最近步骤的思考与分析文本，无历史时返回空字符串。
+        """
+        if not self.history:
+            return ""
+        record = self.history[-1]
+        analysis_text = (record.analysis or {}).get("analysis", "")
+        return f"{record.think}\n{analysis_text}".strip()
+
+    def _remember_step(self, record: StepRecord) -> None:
+        """记录执行完的步骤以供语义召回，向量在下次召回时批量计算。
+
+        Args:
+            record: 步骤记录。
+        """
+        if self.embed_llm is None:
+            return
+        position = len(self._recall_store) + 1
+        key = str(record.step if record.step is not None else position)
+        self._recall_store[key] = self._format_step(
+            record, position, self.recall_output_chars
+        )
+        self._recall_index.discard(key)
+
+    def _recall(self, query: str, exclude: List[str]) -> Optional[List[str]]:
+        """检索与查询最相关的历史步骤键。
+
+        查询向量按文本缓存，相同查询再次召回时不再请求 embedding；
+        未建立向量的步骤单独批量向量化，失败时只在已建立向量的步骤中检索，下次召回再重试。
+
+        Args:
+            query: 查询文本。
+            exclude: 需要排除的步骤键。
+
+        Returns:
+            按相关度排序的步骤键；查询向量化失败时返回 None。
+        """
+        if self.embed_llm is None:
+            return None
+
+        query_vector = self._query_vectors.get(query)
+        if query_vector is None:
+            try:
+                query_vector = self._embed([query])[0]
+            except Exception as error:
+                logger.warning("记忆语义召回失败，改用完整摘要: %s", error)
+                return None
+            self._query_vectors[query] = query_vector
+            while len(self._query_vectors) > _QUERY_CACHE_SIZE:
+                self._query_vectors.popitem(last=False)
+        else:
+            self._query_vectors.move_to_end(query)
+
+        pending = [key for key in self._recall_store if key not in self._recall_index]
+        try:
+            vectors = self._embed([self._recall_store[key] for key in pending])
+        except Exception as error:
+            logger.warning("历史步骤向量化失败，本次仅检索已向量化的步骤: %s", error)
+            vectors = []
+        for key, vector in zip(pending, vectors):
+            self._recall_index.add(key, vector)
+
+        hits = self._recall_index.search(query_vector, self.recall_top_k, exclude=exclude)
+        return [key for key, _ in hits]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """按批次向量化文本。
+
+        Args:
+            texts: 文本列表。
+
+        Returns:
+            与 texts 一一对应的向量列表。
+        """
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), _EMBED_BATCH_SIZE):
+            response = self.embed_llm.embedding(texts[start:start + _EMBED_BATCH_SIZE])
+            vectors.extend(item["embedding"] for item in response.data)
+        return vectors
+
+    def _recall_summary(self, include_key_facts: bool, query: str) -> Optional[str]:
+        """生成包含最近步骤与召回步骤的摘要。
+
+        Args:
+            include_key_facts: 是否在摘要中包含关键事实。
+            query: 召回查询文本。
+
+        Returns:
+            摘要文本；无需召回或召回失败时返回 None。
+        """
+        recent_count = min(self.keep_recent, len(self.history))
+        recent = self.history[len(self.history) - recent_count:]
+        recent_keys = [
+            str(record.step if record.step is not None else position)
+            for position, record in enumerate(recent, len(self.history) - recent_count + 1)
+        ]
+        # 召回库中的步骤都已在最近步骤里时无需召回
+        if not set(self._recall_store) - set(recent_keys):
+            return None
+
+        keys = self._recall(query, recent_keys)
+        if keys is None:
+            return None
+
+        parts: List[str] = []
+        if include_key_facts:
+            parts.append(self._get_facts_block()[0])
+        parts.append(self._get_compressed_block()[0])
+        if keys:
+            parts.append("相关历史步骤:\n")
+            ordered = sorted(keys, key=lambda key: int(key) if key.isdigit() else 0)
+            parts.extend(self._recall_store[key] for key in ordered)
+        if recent_count:
+            parts.append("最近详细步骤:\n")
+            parts.extend(self._fragments[len(self._fragments) - recent_count:])
+        return "".join(parts)
+
+    def _format_key_facts(self) -> str:
+        """格式化关键事实（数量与长度由 KeyFactStore 限制）。
+
+        Returns:
+            关键事实文本，无关键事实时返回空字符串。
+        """
+        if not len(self.key_facts):
+            return ""
+
+        text = "关键事实:\n"
+        for value in self.key_facts.values():
+            text += f"- {value}\n"
+        return text + "\n"
+
+    def _format_compressed_memory(self) -> str:
+        """格式化早期摘要与压缩记忆块。
+
+        Returns:
+            压缩记忆块文本，无压缩记忆时返回空字符串。
+        """
+        if not self.compressed_memory:
+            return ""
+
+        text = "压缩记忆块:\n"
+        for index, mem in enumerate(self.compressed_memory, 1):
+            if mem.get("digest"):
+                text += "早期摘要:\n"
+            else:
+                text += f"记忆块 #{index}:\n"
+
+            if "key_findings" in mem:
+                text += f"- 状态: {mem.get('current_status', '未知')}\n"
+                text += f"- 关键发现: {', '.join(mem['key_findings'][:3])}"
+                if len(mem["key_findings"]) > 3:
+                    text += f" 等{len(mem['key_findings'])}项"
+                text += "\n"
+
+            if "failed_attempts" in mem:
+                failed_attempts = ", ".join(mem["failed_attempts"][:3])
+                text += f"- 失败尝试: {failed_attempts}"
+                if len(mem["failed_attempts"]) > 3:
+                    text += f" 等{len(mem['failed_attempts'])}项"
+                text += "\n"
+
+            if "next_steps" in mem:
+                text += f"- 建议步骤: {mem['next_steps'][0]}\n"
+
+            text += f"- 来源: 基于{mem['source_steps']}个历史步骤\n\n"
+        return text
+
+    def _format_step(
+        self,
+        record: StepRecord,
+        position: int,
+        output_limit: Optional[int] = None,
+    ) -> str:
+        """渲染单个历史步骤。
+
+        Args:
+            record: 步骤记录。
+            position: 步骤在历史中的序号（步骤缺少编号时使用）。
+            output_limit: 工具输出的最大字符数，None 表示不截断。
+
+        Returns:
+            步骤摘要文本。
+        """
+        step_num = record.step if record.step is not None else position
+        text = f"步骤 {step_num}:\n"
+        text += f"- 目的: {record.think or '未指定'}\n"
+
+        if record.tool_results:
+            for i, result in enumerate(record.tool_results, 1):
+                name = result.tool_name or "未知工具"
+                output = self.blobs.get(result.output_ref)
+                if output_limit is not None and len(output) > output_limit:
+                    output = output[:output_limit] + "...（已截断）"
+                text += f"- 工具{i}: {name}({result.arguments})\n"
+                text += f"  输出: {output}\n"
+        elif record.tool_calls:
+            tool_call_list = []
+            for tool_call in record.tool_calls:
+                name = tool_call.get("tool_name", "未知工具")
+                args = tool_call.get("arguments", {})
+                tool_call_list.append(f"{name}({args})")
+            text += f"- 命令: {', '.join(tool_call_list)}\n"
+
+        if record.analysis is not None:
+            analysis = record.analysis.get("analysis", "无分析")
+            text += f"- 分析: {analysis}\n"
 
-                summary += "\n"
+        content = (record.extra or {}).get("content")
+        if isinstance(content, str) and content in self.failed_attempts:
+            text += f"- 历史失败次数: {self.failed_attempts[content]}\n"
 
-        return summary if summary else "无历史记录"
+        return text + "\n"
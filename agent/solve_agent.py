@@ -3,7 +3,7 @@
 import logging
 import re
 import time
-from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union, cast
 
 import yaml
 from jinja2 import Environment, FileSystemLoader
@@ -15,12 +15,27 @@ from config import Config
 from ctf_tool.base_tool import BaseTool
 from skill.manager import SkillManager
 from utils.llm_request import LLMRequest
+from utils.llm_retry import PARSE_ERROR, CircuitOpenError, RetryPolicy, record_failure
+from utils.telemetry import Telemetry, get_telemetry
+from utils.tokenizer import count_tokens
 from utils.tools import ToolUtils
 from utils.user_interface import ApprovedStep, UserInterface
+from utils.workspace import current_workspace
 
 logger = logging.getLogger(__name__)
 
 
+class _PlanUnavailable:
+    """规划请求因 LLM 调用本身失败而放弃的标记类型。"""
+
+
+# LLM 层已重试耗尽、遇到不可重试错误或全部端点熔断时的规划结果；
+# 与输出格式错误（返回 None，可重新请求）区分，调用方遇到时不再重试
+PLAN_UNAVAILABLE = _PlanUnavailable()
+
+PlanResult = Union[Tuple[str, List[Dict[str, Any]]], _PlanUnavailable, None]
+
+
 class SolveAgent:
     """负责逐步生成、执行并分析解题动作。"""
 
@@ -53,9 +68,13 @@ class SolveAgent:
         self.memory = Memory(
             context_window=self.config.get("context_window", 128000),
             compression_ratio=self.config.get("compression_ratio", 0.8),
+            high_water=self.config.get("compression_high_water", 0.95),
+            keep_recent=self.config.get("compression_keep_recent", 4),
+            compress_window=self.config.get("compression_window", 8),
+            max_blocks=self.config.get("compression_max_blocks", 4),
         )
 
-        self.tools: Dict[str, BaseTool] = {}
+        self.tools: Mapping[str, BaseTool] = {}
         self.function_configs: List[Dict[str, Any]] = []
         self.tool_classification: Dict[str, Any] = {}
 
@@ -63,9 +82,13 @@ class SolveAgent:
 
         self.tool = ToolUtils()
         self.tools, self.function_configs = self.tool.load_tools()
+        self._templates: Dict[str, Any] = {}
+        # (工具集合版本, skill 集合版本) -> (工具说明, 技能说明)
+        self._prompt_blocks: Optional[Tuple[Tuple[int, int], Tuple[str, str]]] = None
 
         skill_paths = self.config.get("skills", {}).get("paths", [])
         self.skill_manager = SkillManager(extra_paths=skill_paths)
+        self.memory.reserve_tokens(self._static_prompt_tokens())
 
         self.auto_mode = self.user_interface.select_mode()
 
@@ -75,6 +98,11 @@ class SolveAgent:
             checkpoint_dir=self.config.get("checkpoint_dir", "./checkpoints")
         )
 
+        self.plan_retry = RetryPolicy.from_config(self.config)
+
+        stream_value = self.config.get("llm_stream", False)
+        self.stream_enabled = stream_value if isinstance(stream_value, bool) else False
+
     def solve(self, resume_step: int = 0) -> str:
         """主解题循环，逐步调用工具并分析输出。
 
@@ -89,22 +117,33 @@ class SolveAgent:
         try:
             while True:
                 step_count += 1
+                get_telemetry().set_step(step_count)
                 self.user_interface.display_message(f"\n正在思考第 {step_count} 步...")
 
                 if not self.function_configs:
                     self.user_interface.display_message("当前没有可用工具，无法继续解题")
                     return "未找到flag：无可用工具"
 
-                next_step = None
-                while next_step is None:
+                # 传输层错误已由 LLMRequest 重试，这里只重试输出格式错误或空计划
+                next_step: PlanResult = None
+                for attempt in range(self.plan_retry.max_attempts):
                     next_step = self.next_instruction()
-                    if next_step:
-                        think, tool_calls = next_step
+                    if next_step is not None:
                         break
-                    self.user_interface.display_message("生成执行内容失败，10秒后重试...")
-                    time.sleep(10)
+                    if attempt + 1 >= self.plan_retry.max_attempts:
+                        break
+                    delay = self.plan_retry.backoff(attempt)
+                    self.user_interface.display_message(
+                        f"生成执行内容失败，{delay:.0f}秒后重试..."
+                    )
+                    time.sleep(delay)
 
-                if next_step is None:
+                if next_step is PLAN_UNAVAILABLE:
+                    self.user_interface.display_message(
+                        "LLM 服务暂不可用，已停止解题，可稍后从存档恢复"
+                    )
+                    return "解题终止：LLM 服务不可用"
+                if not isinstance(next_step, tuple):
                     self.user_interface.display_message("生成执行内容失败")
                     return "解题终止"
 
@@ -121,7 +160,13 @@ class SolveAgent:
                     tools=self.tools,
                     tool_calls=tool_calls,
                     display_message=self.user_interface.display_message,
+                    display_stream=self.user_interface.display_stream,
                 )
+                workspace = current_workspace()
+                quota_notice = workspace.check_quota() if workspace is not None else None
+                if quota_notice:
+                    self.user_interface.display_message(quota_notice)
+                    combined_raw_output = f"{combined_raw_output}\n{quota_notice}"
 
                 analysis_result: Dict[str, Any] = (
                     self.analyzer.analyze_step_output(
@@ -144,19 +189,10 @@ class SolveAgent:
                         return flag_candidate
                     logger.info("用户确认flag不正确，继续解题")
 
-                tool_results_with_args = [
-                    {
-                        "tool_name": r.get("tool_name"),
-                        "arguments": r.get("arguments", {}),
-                        "output": str(r.get("raw_output", "")),
-                    }
-                    for r in all_tool_results
-                ]
-
                 self.memory.update_step(
                     step_count,
                     {
-                        "tool_results": tool_results_with_args,
+                        "tool_results": all_tool_results,
                         "analysis": analysis_result,
                         "status": "executed",
                     },
@@ -168,6 +204,7 @@ class SolveAgent:
                     auto_mode=self.auto_mode,
                     memory_data=self.memory.to_dict(),
                 )
+                self._log_step_usage(step_count)
 
                 if analysis_result.get("terminate", False):
                     self.user_interface.display_message("LLM建议提前终止解题")
@@ -183,6 +220,40 @@ class SolveAgent:
             )
             return "用户中断"
 
+    @staticmethod
+    def _log_step_usage(step_count: int) -> None:
+        """记录本步骤 LLM 调用的 token 用量与耗时汇总。
+
+        Args:
+            step_count: 步骤编号。
+        """
+        telemetry = get_telemetry()
+        records = telemetry.records(problem=telemetry.current_problem(), step=step_count)
+        if not records:
+            return
+        total = Telemetry.summarize(records)["总计"]
+        logger.info(
+            "第 %d 步 LLM 调用 %d 次：输入 %d tokens，输出 %d tokens，缓存命中 %d tokens，耗时 %.1f 秒",
+            step_count,
+            total["calls"],
+            total["prompt_tokens"],
+            total["completion_tokens"],
+            total["cached_tokens"],
+            total["latency"],
+        )
+
+    def close(self) -> None:
+        """释放记忆后台线程与工具资源（如常驻 Shell 会话）。"""
+        self.memory.close()
+        # 只关闭已创建的工具，避免为关闭而实例化从未使用过的工具
+        loaded = getattr(self.tools, "loaded", None)
+        tools = loaded() if callable(loaded) else list(self.tools.values())
+        for tool in {id(tool): tool for tool in tools}.values():
+            try:
+                tool.close()
+            except Exception as error:
+                logger.warning("关闭工具失败: %s", error)
+
     def restore_from_checkpoint(self, data: Dict[str, Any]) -> int:
         """从存档恢复代理状态。
 
@@ -274,26 +345,78 @@ class SolveAgent:
 
         return think or "未返回思考内容（仅返回工具调用）"
 
-    def _request_tool_plan(
-        self,
-        prompt: str,
-    ) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
-        """请求模型返回思考内容与工具调用计划（基于提示词而非原生 tool call）。
+    def _make_think_forwarder(self) -> Tuple[Callable[[str], None], Callable[[], None]]:
+        """构造流式思考文本转发器，遇到 <tool_calls> 后停止转发。
+
+        Returns:
+            (增量回调, 结束回调)。
+        """
+        state = {"buffer": "", "forwarded": 0, "done": False}
+        marker = "<tool_calls>"
+
+        def on_delta(delta: str) -> None:
+            if state["done"]:
+                return
+            state["buffer"] += delta
+            marker_index = state["buffer"].find(marker)
+            if marker_index != -1:
+                visible_end = marker_index
+                state["done"] = True
+            else:
+                # 保留可能构成标记前缀的尾部，避免把半个标签输出到界面
+                visible_end = max(state["forwarded"], len(state["buffer"]) - len(marker) + 1)
+            if visible_end > state["forwarded"]:
+                self.user_interface.display_stream(
+                    state["buffer"][state["forwarded"]:visible_end]
+                )
+                state["forwarded"] = visible_end
+
+        def on_end() -> None:
+            if state["forwarded"]:
+                self.user_interface.display_stream("\n")
+
+        return on_delta, on_end
+
+    def _complete_plan(self, prompt: str) -> Any:
+        """请求一次工具计划补全，按配置选择流式或阻塞模式。
 
         Args:
             prompt: 给模型的提示词。
 
         Returns:
-            (思考内容, 工具调用列表)；失败返回 None。
+            LLM 响应对象。
         """
+        if not self.stream_enabled:
+            return self.solve_llm.text_completion(prompt=prompt, json_check=False)
+
+        on_delta, on_end = self._make_think_forwarder()
         try:
-            response = self.solve_llm.text_completion(
+            return self.solve_llm.stream_completion(
                 prompt=prompt,
-                json_check=False,
+                on_delta=on_delta,
+                stop_marker="</tool_calls>",
             )
+        finally:
+            on_end()
+
+    def _request_tool_plan(self, prompt: str) -> PlanResult:
+        """请求模型返回思考内容与工具调用计划（基于提示词而非原生 tool call）。
+
+        Args:
+            prompt: 给模型的提示词。
+
+        Returns:
+            (思考内容, 工具调用列表)；输出中没有有效工具调用时返回 None；
+            LLM 调用失败（LLMRequest 已按策略重试）时返回 PLAN_UNAVAILABLE。
+        """
+        try:
+            response = self._complete_plan(prompt)
+        except CircuitOpenError as error:
+            logger.warning("%s", error)
+            return PLAN_UNAVAILABLE
         except Exception as error:
             logger.error("调用LLM失败: %s", error)
-            return None
+            return PLAN_UNAVAILABLE
 
         think_content = self._extract_think(
             response.choices[0].message.content
@@ -302,37 +425,72 @@ class SolveAgent:
         if tool_calls:
             return think_content, tool_calls
 
-        logger.warning("LLM未返回有效tool_calls，重试一次")
-        try:
-            retry_response = self.solve_llm.text_completion(
-                prompt=prompt,
-                json_check=False,
+        # 输出格式错误由调用方按退避策略重试，避免立即重复请求浪费 token
+        record_failure(PARSE_ERROR)
+        logger.warning("LLM未返回有效tool_calls")
+        return None
+
+    def _template(self, name: str) -> Any:
+        """返回编译后的提示词模板（每个模板只编译一次）。
+
+        Args:
+            name: prompt.yaml 中的模板名。
+
+        Returns:
+            Jinja2 模板对象。
+        """
+        template = self._templates.get(name)
+        if template is None:
+            template = self.env.from_string(self.prompt.get(name, ""))
+            self._templates[name] = template
+        return template
+
+    def _render_prompt_blocks(self) -> Tuple[str, str]:
+        """返回工具与技能说明文本，工具或 skill 集合变化前只渲染一次。
+
+        Returns:
+            (工具说明, 技能说明)。
+        """
+        version = (self.tool.tools_version, self.skill_manager.version)
+        if self._prompt_blocks is None or self._prompt_blocks[0] != version:
+            self._prompt_blocks = (
+                version,
+                (
+                    ToolUtils.format_tools_for_prompt(self.function_configs),
+                    self.skill_manager.format_for_prompt(),
+                ),
             )
-        except Exception as error:
-            logger.error("重试LLM调用失败: %s", error)
-            return None
+        return self._prompt_blocks[1]
 
-        retry_think = self._extract_think(
-            retry_response.choices[0].message.content
-        )
-        retry_tool_calls = ToolUtils.parse_tool_response(retry_response)
-        if retry_tool_calls:
-            return retry_think, retry_tool_calls
+    def _static_prompt_tokens(self) -> int:
+        """计算规划提示词中记忆摘要以外部分的 token 数。
 
-        logger.error("连续两次未返回有效tool_calls")
-        return None
+        Returns:
+            模板、题目、工具与技能说明合计的 token 数。
+        """
+        tools_text, skills_text = self._render_prompt_blocks()
+        template = self._template("think_next")
+        prompt = template.render(
+            question=self.problem,
+            history_summary="",
+            tools_text=tools_text,
+            skills_text=skills_text,
+        )
+        return count_tokens(prompt)
 
-    def next_instruction(self) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    def next_instruction(self) -> PlanResult:
         """生成下一步执行计划。
 
         Returns:
-            (思考内容, 工具调用列表)；失败返回 None。
+            (思考内容, 工具调用列表)；输出格式错误返回 None；
+            LLM 调用失败返回 PLAN_UNAVAILABLE。
         """
-        history_summary = self.memory.get_summary()
-        tools_text = ToolUtils.format_tools_for_prompt(self.function_configs)
-        skills_text = self.skill_manager.format_for_prompt()
+        history_summary = self.memory.get_summary(
+            query=f"{self.problem}\n{self.memory.latest_context()}"
+        )
+        tools_text, skills_text = self._render_prompt_blocks()
 
-        template = self.env.from_string(self.prompt.get("think_next", ""))
+        template = self._template("think_next")
         think_prompt = template.render(
             question=self.problem,
             history_summary=history_summary,
@@ -341,8 +499,8 @@ class SolveAgent:
         )
 
         result = self._request_tool_plan(think_prompt)
-        if result is None:
-            return None
+        if not isinstance(result, tuple):
+            return result
 
         think_content, tool_calls = result
         logger.info("思考内容: %s", think_content)
@@ -362,11 +520,10 @@ class SolveAgent:
         Returns:
             (新思考, 新工具调用列表)；失败返回 None。
         """
-        history_summary = self.memory.get_summary()
-        tools_text = ToolUtils.format_tools_for_prompt(self.function_configs)
-        skills_text = self.skill_manager.format_for_prompt()
+        history_summary = self.memory.get_summary(query=f"{think}\n{feedback}")
+        tools_text, skills_text = self._render_prompt_blocks()
 
-        template = self.env.from_string(self.prompt.get("reflection", ""))
+        template = self._template("reflection")
         reflection_prompt = template.render(
             question=self.problem,
             history_summary=history_summary,
@@ -377,7 +534,7 @@ class SolveAgent:
         )
 
         result = self._request_tool_plan(reflection_prompt)
-        if result is None:
+        if not isinstance(result, tuple):
             logger.warning("反思阶段未能生成有效工具调用")
             return None
 
@@ -0,0 +1,159 @@
+"""解题步骤记录模块。"""
+
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.blob_store import BlobStore
+
+# StepRecord 的固定字段，其余字段保存在 extra 中
+_STEP_FIELDS = ("step", "think", "tool_calls", "tool_results", "analysis", "status")
+
+
+def _intern_name(name: Any) -> Any:
+    """驻留工具名字符串，使大量步骤共享同一对象。"""
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+class ToolResult:
+    """单次工具调用结果，输出以引用形式保存在 BlobStore 中。"""
+
+    __slots__ = ("tool_name", "arguments", "output_ref")
+
+    def __init__(self, tool_name: Any, arguments: Dict[str, Any], output_ref: str) -> None:
+        """初始化工具结果。
+
+        Args:
+            tool_name: 工具名。
+            arguments: 调用参数。
+            output_ref: 输出内容引用。
+        """
+        self.tool_name = _intern_name(tool_name)
+        self.arguments = arguments
+        self.output_ref = output_ref
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], blobs: BlobStore) -> "ToolResult":
+        """从结果字典创建，兼容 output、raw_output 与 output_ref 字段。
+
+        Args:
+            data: 工具结果字典。
+            blobs: 输出存储。
+
+        Returns:
+            ToolResult 实例。
+        """
+        output_ref = data.get("output_ref")
+        if not isinstance(output_ref, str) or output_ref not in blobs:
+            output = data.get("output", data.get("raw_output", ""))
+            output_ref = blobs.put(str(output))
+        return cls(data.get("tool_name"), data.get("arguments", {}), output_ref)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出为字典（输出以引用表示）。"""
+        return {
+            "tool_name": self.tool_name,
+            "arguments": self.arguments,
+            "output_ref": self.output_ref,
+        }
+
+
+class StepRecord:
+    """一个解题步骤的紧凑记录。"""
+
+    __slots__ = _STEP_FIELDS + ("extra",)
+
+    def __init__(
+        self,
+        step: Optional[int] = None,
+        think: str = "",
+        tool_calls: Optional[List[Dict[str, Any]]] = None,
+        status: str = "planned",
+    ) -> None:
+        """初始化步骤记录。
+
+        Args:
+            step: 步骤编号。
+            think: 思考内容。
+            tool_calls: 工具调用列表。
+            status: 步骤状态（planned、executed 等）。
+        """
+        self.step = step
+        self.think = think
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.tool_results: List[ToolResult] = []
+        self.analysis: Optional[Dict[str, Any]] = None
+        self.status = status
+        self.extra: Optional[Dict[str, Any]] = None
+        self.set_tool_calls(tool_calls or [])
+
+    def set_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> None:
+        """设置工具调用列表并驻留工具名。
+
+        Args:
+            tool_calls: 工具调用列表。
+        """
+        for tool_call in tool_calls:
+            if "tool_name" in tool_call:
+                tool_call["tool_name"] = _intern_name(tool_call["tool_name"])
+        self.tool_calls = tool_calls
+
+    def update(self, fields: Dict[str, Any], blobs: BlobStore) -> None:
+        """按字段字典更新记录。
+
+        Args:
+            fields: 需要更新的字段，tool_results 中的输出写入 blobs。
+            blobs: 输出存储。
+        """
+        for key, value in fields.items():
+            if key == "tool_results":
+                self.tool_results = [
+                    ToolResult.from_dict(item, blobs)
+                    for item in value or []
+                    if isinstance(item, dict)
+                ]
+            elif key == "tool_calls":
+                self.set_tool_calls(list(value or []))
+            elif key == "analysis":
+                self.analysis = value if isinstance(value, dict) else None
+            elif key in ("step", "think", "status"):
+                setattr(self, key, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], blobs: BlobStore) -> "StepRecord":
+        """从步骤字典创建记录，兼容旧版内联输出的存档格式。
+
+        Args:
+            data: 步骤字典。
+            blobs: 输出存储。
+
+        Returns:
+            StepRecord 实例。
+        """
+        record = cls(status=str(data.get("status", "executed")))
+        record.update(data, blobs)
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出为可 JSON 序列化的字典（输出以引用表示）。"""
+        data: Dict[str, Any] = {
+            "step": self.step,
+            "think": self.think,
+            "tool_calls": self.tool_calls,
+            "status": self.status,
+        }
+        if self.tool_results:
+            data["tool_results"] = [result.to_dict() for result in self.tool_results]
+        if self.analysis is not None:
+            data["analysis"] = self.analysis
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def output_refs(self) -> Iterator[str]:
+        """遍历本步骤引用的输出。"""
+        for result in self.tool_results:
+            yield result.output_ref
@@ -1,6 +1,9 @@
 """解题流程编排模块。"""
 
+import hashlib
 import logging
+import os
+import time
 from typing import Callable, Optional
 
 import yaml
@@ -9,8 +12,11 @@ from agent.solve_agent import SolveAgent
 from ctf_platform.base import FlagSubmitter, Question, QuestionInputer
 from ctf_platform.registry import create_inputer, create_submitter
 from utils.llm_request import LLMRequest
+from utils.llm_retry import diff_retry_metrics, format_retry_metrics, get_retry_metrics
+from utils.telemetry import get_telemetry
 from utils.text import optimize_text
 from utils.user_interface import UserInterface
+from utils.workspace import Workspace, current_workspace, workspace_scope
 
 logger = logging.getLogger(__name__)
 
@@ -44,7 +50,7 @@ class Workflow:
             ValueError: 当配置为空时抛出。
         """
         self.config = config
-        self.processor_llm = LLMRequest("solve_agent")
+        self.processor_llm = LLMRequest("summarizer")
         with open("./prompt.yaml", "r", encoding="utf-8") as file:
             self.prompt: dict = yaml.safe_load(file)
         self.user_interface = user_interface
@@ -78,7 +84,49 @@ class Workflow:
             解题结果字符串。
         """
         self.current_question = question
+        problem_id = hashlib.md5(question.content.encode("utf-8")).hexdigest()[:12]
+        telemetry = get_telemetry()
+
+        workspace = self.prepare_workspace(problem_id, question, resume=bool(resume_data))
+        retry_baseline = get_retry_metrics()
+
+        with telemetry.problem_scope(problem_id), workspace_scope(workspace):
+            try:
+                result = self._solve_question(question, resume_data)
+            finally:
+                telemetry.set_step(None)
+                self.report_usage(problem_id, retry_baseline)
+
+        # 中断的解题保留工作目录，以便从存档恢复时继续使用其中的文件
+        if workspace is not None and not workspace.keep_on_finish and result != "用户中断":
+            workspace.cleanup()
+
+        if self.on_question_done is not None:
+            self.on_question_done(question, result)
+
+        return result
+
+    def _solve_question(
+        self,
+        question: Question,
+        resume_data: Optional[dict] = None,
+    ) -> str:
+        """摘要题目并运行解题代理。
+
+        Args:
+            question: 题目对象。
+            resume_data: 可选存档恢复数据。
+
+        Returns:
+            解题结果字符串。
+        """
         problem = self.summary_problem(question.content)
+        workspace = current_workspace()
+        if workspace is not None and workspace.attachments:
+            problem += (
+                f"\n\n题目附件已放在当前工作目录 {workspace.path} 中："
+                + "、".join(workspace.attachments)
+            )
 
         self.agent = SolveAgent(problem, user_interface=self.user_interface)
         self.agent.confirm_flag_callback = self.confirm_flag
@@ -90,12 +138,81 @@ class Workflow:
                 f"已恢复存档，从第 {resume_step} 步继续"
             )
 
-        result = self.agent.solve(resume_step=resume_step)
+        try:
+            return self.agent.solve(resume_step=resume_step)
+        finally:
+            self.agent.close()
 
-        if self.on_question_done is not None:
-            self.on_question_done(question, result)
+    def prepare_workspace(
+        self,
+        problem_id: str,
+        question: Question,
+        resume: bool = False,
+    ) -> Optional[Workspace]:
+        """按 workspace 配置创建本次求解的独立工作目录并放入附件。
 
-        return result
+        Args:
+            problem_id: 题目标识（仅作目录名前缀，目录名另带本次运行的唯一后缀）。
+            question: 题目对象。
+            resume: 是否从存档恢复，恢复时复用该题最近中断留下的目录。
+
+        Returns:
+            Workspace 实例；未启用时返回 None。
+        """
+        try:
+            workspace = Workspace.from_config(
+                problem_id, self.config.get("workspace", {}), resume=resume
+            )
+        except OSError as error:
+            logger.warning("创建工作目录失败，使用 bash_shell.working_dir: %s", error)
+            return None
+        if workspace is not None:
+            workspace.stage(question.attachments)
+            self.user_interface.display_message(f"本题工作目录: {workspace.path}")
+        return workspace
+
+    def report_usage(
+        self,
+        problem_id: str,
+        retry_baseline: Optional[dict] = None,
+    ) -> None:
+        """展示本题的 LLM 用量汇总与失败统计，按配置导出明细后释放记录。
+
+        Args:
+            problem_id: 题目标识。
+            retry_baseline: 开始解题时的失败计数快照，用于计算本题期间的增量。
+        """
+        failures = diff_retry_metrics(retry_baseline or {}, get_retry_metrics())
+        if failures:
+            self.user_interface.display_message(
+                f"\nLLM 失败统计：{format_retry_metrics(failures)}"
+            )
+
+        telemetry = get_telemetry()
+        records = telemetry.records(problem=problem_id)
+        if not records:
+            return
+
+        self.user_interface.display_message(
+            "\nLLM 用量汇总：\n" + telemetry.format_table(records)
+        )
+
+        telemetry_config = self.config.get("telemetry", {})
+        export_dir = (
+            telemetry_config.get("export_dir")
+            if isinstance(telemetry_config, dict)
+            else None
+        )
+        if export_dir:
+            path = os.path.join(
+                export_dir,
+                f"{time.strftime('%Y%m%d')}.jsonl",
+            )
+            try:
+                telemetry.export_jsonl(records, path)
+            except OSError as error:
+                logger.warning("导出 LLM 用量记录失败: %s", error)
+        telemetry.discard(problem_id)
 
     def confirm_flag(self, flag_candidate: str) -> bool:
         """通过提交器验证候选 flag。
@@ -133,6 +250,7 @@ class Workflow:
         response = self.processor_llm.text_completion(
             optimize_text(prompt),
             json_check=False,
+            cache=True,
         )
         content = response.choices[0].message.content
         return content if isinstance(content, str) else str(content)
@@ -9,6 +9,7 @@ from typing import Any
 
 import typer
 
+from cli.commands.cache import app as cache_app
 from cli.commands.checkpoint import app as checkpoint_app
 from cli.commands.config_cmd import app as config_app
 from cli.commands.resume import resume_command
@@ -25,6 +26,7 @@ app = typer.Typer(
 # 注册核心命令
 app.command("solve")(solve_command)
 app.command("resume")(resume_command)
+app.add_typer(cache_app, name="cache")
 app.add_typer(checkpoint_app, name="checkpoint")
 app.add_typer(config_app, name="config")
 app.add_typer(skill_app, name="skill")
@@ -0,0 +1,74 @@
+"""cache 子命令。"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from utils.llm_cache import load_cache_config, open_cache
+
+app = typer.Typer(help="LLM 响应缓存管理")
+
+
+def _format_bytes(size: int) -> str:
+    """将字节数格式化为易读文本。"""
+    if size < 1024:
+        return f"{size} B"
+    value = size / 1024
+    for unit in ("KB", "MB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+@app.command("stats")
+def stats_command() -> None:
+    """显示缓存统计信息。"""
+    cache_config = load_cache_config()
+    stats = open_cache(cache_config).stats()
+
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = f"{stats['hits'] / lookups:.1%}" if lookups else "-"
+    oldest = (
+        datetime.fromtimestamp(stats["oldest"]).strftime("%Y-%m-%d %H:%M:%S")
+        if stats["oldest"]
+        else "-"
+    )
+
+    table = Table(title="LLM 响应缓存")
+    table.add_column("项目", style="cyan")
+    table.add_column("值", style="white")
+    table.add_row("启用", "是" if cache_config.get("enabled", False) else "否")
+    table.add_row("路径", str(stats["path"]))
+    table.add_row("条目数", str(stats["entries"]))
+    table.add_row("占用", f"{_format_bytes(stats['bytes'])} / {_format_bytes(stats['max_bytes'])}")
+    table.add_row("TTL", f"{int(stats['ttl'])} 秒")
+    table.add_row("命中 / 未命中", f"{stats['hits']} / {stats['misses']}")
+    table.add_row("命中率", hit_rate)
+    table.add_row("最早条目", oldest)
+    Console().print(table)
+
+
+@app.command("clear")
+def clear_command(
+    yes: bool = typer.Option(False, "--yes", "-y", help="跳过确认并直接清空"),
+) -> None:
+    """清空全部缓存条目。"""
+    cache = open_cache()
+    entries = cache.stats()["entries"]
+    if not entries:
+        typer.echo("缓存为空，无需清理")
+        return
+
+    if not yes:
+        confirmed = typer.confirm(f"确认清空 {entries} 条缓存吗？")
+        if not confirmed:
+            typer.echo("已取消")
+            return
+
+    deleted = cache.clear()
+    typer.echo(f"已清空 {deleted} 条缓存")
@@ -10,29 +10,67 @@ from rich.panel import Panel
 from rich.table import Table
 
 from config import Config
+from utils.llm_request import LLM_ROLES, resolve_role
 
 app = typer.Typer(help="配置检查")
 
 
+def _check_endpoint(prefix: str, endpoint: Any) -> List[Tuple[str, bool, str]]:
+    """检查单个 LLM 端点配置的必填字段。"""
+    endpoint = endpoint if isinstance(endpoint, dict) else {}
+    return [
+        (f"{prefix}.model", isinstance(endpoint.get("model"), str) and bool(endpoint.get("model")), "模型名称"),
+        (f"{prefix}.api_key", isinstance(endpoint.get("api_key"), str) and bool(endpoint.get("api_key")), "API Key"),
+        (f"{prefix}.api_base", isinstance(endpoint.get("api_base"), str) and bool(endpoint.get("api_base")), "API Base"),
+    ]
+
+
 def _check_required_fields(config: Dict[str, Any]) -> List[Tuple[str, bool, str]]:
     """检查关键配置字段。"""
     llm = config.get("llm", {})
     platform = config.get("platform", {})
     inputer = platform.get("inputer", {})
 
-    checks: List[Tuple[str, bool, str]] = [
-        ("llm.model", isinstance(llm.get("model"), str) and bool(llm.get("model")), "模型名称"),
-        ("llm.api_key", isinstance(llm.get("api_key"), str) and bool(llm.get("api_key")), "API Key"),
-        ("llm.api_base", isinstance(llm.get("api_base"), str) and bool(llm.get("api_base")), "API Base"),
+    checks: List[Tuple[str, bool, str]] = []
+    if not isinstance(llm, dict) or "model" in llm:
+        checks.extend(_check_endpoint("llm", llm))
+    else:
+        checks.append(("llm.solve_agent", "solve_agent" in llm, "主规划角色（其他角色的回退目标）"))
+        for role, role_config in llm.items():
+            endpoints = role_config if isinstance(role_config, list) else [role_config]
+            for index, endpoint in enumerate(endpoints):
+                prefix = f"llm.{role}" if len(endpoints) == 1 else f"llm.{role}[{index}]"
+                checks.extend(_check_endpoint(prefix, endpoint))
+
+    checks.append(
         (
             "platform.inputer.type",
             isinstance(inputer.get("type"), str) and bool(inputer.get("type")),
             "输入器类型",
-        ),
-    ]
+        )
+    )
     return checks
 
 
+def _role_routes(config: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """计算各角色实际使用的配置与模型。"""
+    llm = config.get("llm", {})
+    routes: List[Tuple[str, str, str]] = []
+    for role in LLM_ROLES:
+        if not isinstance(llm, dict) or "model" in llm:
+            resolved = "llm"
+            role_config: Any = llm
+        else:
+            resolved = resolve_role(llm, role)
+            role_config = llm.get(resolved, {})
+        endpoints = role_config if isinstance(role_config, list) else [role_config]
+        models = ", ".join(
+            str(endpoint.get("model", "-")) for endpoint in endpoints if isinstance(endpoint, dict)
+        )
+        routes.append((role, resolved, models or "-"))
+    return routes
+
+
 @app.command("check")
 def check_command() -> None:
     """检查当前配置文件完整性。"""
@@ -63,6 +101,14 @@ def check_command() -> None:
         table.add_row(field, "OK" if ok else "缺失", desc)
     console.print(table)
 
+    route_table = Table(title="LLM 角色路由")
+    route_table.add_column("角色", style="cyan")
+    route_table.add_column("使用配置", style="magenta")
+    route_table.add_column("模型", style="white")
+    for role, resolved, models in _role_routes(config):
+        route_table.add_row(role, resolved, models)
+    console.print(route_table)
+
     if missing:
         raise typer.Exit(code=1)
 
@@ -2,44 +2,32 @@
 
 from __future__ import annotations
 
-import importlib
-import inspect
-import os
 from typing import Any, Dict
 
 import typer
 from rich.console import Console
 from rich.table import Table
 
-from ctf_tool.base_tool import BaseTool
+from config import Config
+from utils.tool_registry import get_tool_registry
 
 app = typer.Typer(help="工具信息")
 
 
 @app.command("list")
-def list_command() -> None:
+def list_command(
+    refresh: bool = typer.Option(False, "--refresh", help="忽略工具清单缓存，重新发现全部工具"),
+) -> None:
     """列出可用工具。"""
-    project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    tools_dir = os.path.join(project_root, "ctf_tool")
-
-    function_configs = []
-    for file_name in os.listdir(tools_dir):
-        if file_name in {"__init__.py", "base_tool.py", "mcp_adapter.py"} or not file_name.endswith(".py"):
-            continue
-
-        module_name = file_name[:-3]
-        try:
-            module = importlib.import_module(f"ctf_tool.{module_name}")
-        except Exception:
-            continue
-
-        for _, obj in inspect.getmembers(module):
-            if inspect.isclass(obj) and issubclass(obj, BaseTool) and obj is not BaseTool:
-                try:
-                    instance = obj()
-                    function_configs.append(instance.function_config)
-                except Exception:
-                    continue
+    try:
+        config = Config.load_config()
+    except ValueError:
+        config = {}
+
+    registry = get_tool_registry()
+    if refresh:
+        registry.refresh()
+    function_configs = [spec.function_config for spec in registry.specs(config)]
 
     console = Console()
     if not function_configs:
@@ -182,6 +182,11 @@ class RichPromptToolkitInterface(UserInterface):
 
         self.console.print(normalized)
 
+    def display_stream(self, chunk: str) -> None:
+        """原样输出流式思考片段，不换行。"""
+        if chunk:
+            self.console.print(chunk, end="", style="dim", markup=False, highlight=False)
+
     def manual_approval(self, think: str, tool_calls: Any) -> tuple[bool, tuple[str, Any]]:
         """兼容旧接口：审批并返回固定结构。"""
         if self.show_think:
@@ -215,9 +220,12 @@ class RichPromptToolkitInterface(UserInterface):
         tool_table.add_column("工具名", style="green", width=30)
         tool_table.add_column("参数摘要", style="white")
         for index, tool_call in enumerate(tool_calls, start=1):
+            tool_name = str(tool_call.get("tool_name", ""))
+            if tool_call.get("independent"):
+                tool_name += " [并行]"
             tool_table.add_row(
                 str(index),
-                str(tool_call.get("tool_name", "")),
+                tool_name,
                 self._args_preview(tool_call.get("arguments", {})),
             )
         self.console.print(tool_table)
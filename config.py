@@ -50,17 +50,20 @@ class Config:
                             llm_config["model"] = model_name
                         else:
                             for agent in llm_config.values():
-                                if (
-                                    isinstance(agent, dict)
-                                    and "model" in agent
-                                    and isinstance(agent["model"], str)
-                                ):
-                                    model_name = agent["model"].strip()
-                                    if model_name.startswith("openai/"):
-                                        model_name = model_name[
-                                            len("openai/") :
-                                        ]
-                                    agent["model"] = model_name
+                                # 角色可配置为单个端点或端点列表
+                                backends = agent if isinstance(agent, list) else [agent]
+                                for backend in backends:
+                                    if (
+                                        isinstance(backend, dict)
+                                        and "model" in backend
+                                        and isinstance(backend["model"], str)
+                                    ):
+                                        model_name = backend["model"].strip()
+                                        if model_name.startswith("openai/"):
+                                            model_name = model_name[
+                                                len("openai/") :
+                                            ]
+                                        backend["model"] = model_name
 
                     return config
                 except json.JSONDecodeError as error:
@@ -29,3 +29,6 @@ class BaseTool(ABC):
             函数调用配置。
         """
         raise NotImplementedError
+
+    def close(self) -> None:
+        """释放工具持有的资源（默认无操作，子类按需覆盖）。"""
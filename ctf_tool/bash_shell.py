@@ -3,11 +3,16 @@
 import logging
 import os
 import shutil
-import subprocess
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Dict, List, Optional
 
 from config import Config
 from ctf_tool.base_tool import BaseTool
+from utils.process_runner import run_streaming
+from utils.resource_governor import CgroupManager, ResourceLimits, format_usage
+from utils.shell_session import ShellSession, session_supported
+from utils.tool_workers import ToolWorkerPool, get_worker_pool
+from utils.workspace import current_workspace
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +49,45 @@ class BashShell(BaseTool):
         env_value = shell_config.get("env", {})
         self.extra_env = env_value if isinstance(env_value, dict) else {}
 
+        buffer_bytes_value = shell_config.get("buffer_bytes", 1 << 20)
+        self.buffer_bytes = (
+            buffer_bytes_value if isinstance(buffer_bytes_value, int) else 1 << 20
+        )
+
+        max_output_value = shell_config.get("max_output_bytes", 64 << 20)
+        self.max_output_bytes = (
+            max_output_value if isinstance(max_output_value, int) else 64 << 20
+        )
+
+        self.limits = ResourceLimits.from_config(shell_config.get("limits", {}))
+        cgroup_value = shell_config.get("cgroup", {})
+        self.cgroup_config = cgroup_value if isinstance(cgroup_value, dict) else {}
+        self.cgroup = CgroupManager.from_config(self.cgroup_config)
+
+        persistent_value = shell_config.get("persistent_session", False)
+        self.persistent_session = (
+            persistent_value if isinstance(persistent_value, bool) else False
+        )
+
+        # 工作目录、环境变量与 Bash 路径在工具生命周期内只计算一次
+        self.base_cwd = os.path.abspath(self.working_dir)
+        self.env = os.environ.copy()
+        for key, value in self.extra_env.items():
+            self.env[str(key)] = str(value)
+        self._shell_exec: Optional[str] = None
+        self._session: Optional[ShellSession] = None
+        self._session_lock = threading.Lock()
+        # 配置了 tool_execution.worker_processes 时，逐条命令交给执行进程池运行；
+        # 进程池在首次执行命令时才获取，工具发现阶段创建实例不会启动执行进程
+        self._worker_pool: Optional[ToolWorkerPool] = None
+        self._worker_pool_loaded = False
+
+    @property
+    def cwd(self) -> str:
+        """命令执行目录：启用独立工作目录时为当前题目的工作目录，否则为配置的 working_dir。"""
+        workspace = current_workspace()
+        return workspace.path if workspace is not None else self.base_cwd
+
     def execute(self, tool_name: str, arguments: Dict[str, Any]) -> str:
         """执行本地 Bash 命令。
 
@@ -61,51 +105,141 @@ class BashShell(BaseTool):
         if not command.strip():
             return "错误：未提供命令内容"
 
-        shell_exec = self._resolve_shell_executable()
+        shell_exec = self._get_shell_executable()
         if shell_exec is None:
             return (
                 "错误：未找到可执行的 Bash。请在 config.json 的 tool_config.bash_shell.shell_path 中配置 Bash 路径。"
             )
 
-        cwd = os.path.abspath(self.working_dir)
-        env = os.environ.copy()
-        for key, value in self.extra_env.items():
-            env[str(key)] = str(value)
-
-        bash_args = [shell_exec, "-lc", command] if self.login_shell else [
-            shell_exec,
-            "-c",
-            command,
-        ]
-
+        session = self._get_session(shell_exec)
+        worker_pool = self._get_worker_pool() if session is None else None
         try:
-            result = subprocess.run(
-                bash_args,
-                cwd=cwd,
-                env=env,
-                capture_output=True,
-                text=True,
-                timeout=self.timeout,
-            )
-            stdout_text = result.stdout or ""
-            stderr_text = result.stderr or ""
-            return (
-                f"[exit_code] {result.returncode}\n"
-                f"[stdout]\n{stdout_text}\n"
-                f"[stderr]\n{stderr_text}"
-            )
-        except subprocess.TimeoutExpired as error:
-            stdout_text = error.stdout if isinstance(error.stdout, str) else ""
-            stderr_text = error.stderr if isinstance(error.stderr, str) else ""
-            return (
-                f"命令执行超时（{self.timeout}秒）\n"
-                f"[stdout]\n{stdout_text}\n"
-                f"[stderr]\n{stderr_text}"
-            )
+            if session is not None:
+                with self._session_lock:
+                    result = session.run(
+                        command,
+                        timeout=self.timeout,
+                        buffer_bytes=self.buffer_bytes,
+                        max_output_bytes=self.max_output_bytes,
+                    )
+            elif worker_pool is not None:
+                result = worker_pool.run(
+                    self._command_args(shell_exec, command),
+                    cwd=self.cwd,
+                    env=self.env,
+                    timeout=self.timeout,
+                    buffer_bytes=self.buffer_bytes,
+                    max_output_bytes=self.max_output_bytes,
+                    limits=self.limits,
+                    cgroup_config=self.cgroup_config,
+                )
+            else:
+                result = run_streaming(
+                    self._command_args(shell_exec, command),
+                    cwd=self.cwd,
+                    env=self.env,
+                    timeout=self.timeout,
+                    buffer_bytes=self.buffer_bytes,
+                    max_output_bytes=self.max_output_bytes,
+                    limits=self.limits,
+                    cgroup=self.cgroup,
+                )
         except Exception as error:
             logger.error("本地 Bash 命令执行失败: %s", error)
             return f"命令执行错误: {str(error)}"
 
+        target = "命令" if session is not None else "进程组"
+        notes = []
+        if result.timed_out:
+            notes.append(f"命令执行超时（{self.timeout}秒），已结束{target}")
+        if result.truncated:
+            notes.append(f"输出超过 {self.max_output_bytes} 字节上限，已结束{target}")
+        if result.dropped:
+            notes.append(f"仅保留最后的输出，较早的 {result.dropped} 字节已丢弃")
+        if session is not None and result.returncode is None and not result.timed_out:
+            notes.append("Shell 会话已退出，下次执行时将重建（之前的目录与变量不再保留）")
+        header = "\n".join(f"[注意] {note}" for note in notes)
+        if result.returncode is not None and not result.timed_out and not result.truncated:
+            header = f"[exit_code] {result.returncode}" + (f"\n{header}" if header else "")
+        usage_text = format_usage(result.usage)
+        if usage_text:
+            header += f"\n[resource] {usage_text}"
+            logger.info("命令资源用量: %s（%s）", usage_text, command[:200])
+
+        if session is not None:
+            # 常驻会话经伪终端执行，stdout 与 stderr 合并输出
+            return f"{header}\n[output]\n{result.stdout}"
+        return (
+            f"{header}\n"
+            f"[stdout]\n{result.stdout}\n"
+            f"[stderr]\n{result.stderr}"
+        )
+
+    def _command_args(self, shell_exec: str, command: str) -> List[str]:
+        """构造单条命令的 Bash 启动参数。
+
+        Args:
+            shell_exec: Bash 可执行路径。
+            command: Shell 命令。
+
+        Returns:
+            命令参数列表。
+        """
+        return [shell_exec, "-lc" if self.login_shell else "-c", command]
+
+    def _get_shell_executable(self) -> Optional[str]:
+        """返回缓存的 Bash 路径，首次调用时解析。
+
+        Returns:
+            可执行的 Bash 路径，未找到时返回 None。
+        """
+        if self._shell_exec is None:
+            self._shell_exec = self._resolve_shell_executable()
+        return self._shell_exec
+
+    def _get_worker_pool(self) -> Optional[ToolWorkerPool]:
+        """返回共享执行进程池，首次调用时获取；未配置时返回 None。
+
+        Returns:
+            ToolWorkerPool 实例或 None。
+        """
+        if not self._worker_pool_loaded:
+            self._worker_pool = get_worker_pool()
+            self._worker_pool_loaded = True
+        return self._worker_pool
+
+    def _get_session(self, shell_exec: str) -> Optional[ShellSession]:
+        """按配置返回常驻 Shell 会话，未启用或平台不支持时返回 None。
+
+        Args:
+            shell_exec: Bash 可执行路径。
+
+        Returns:
+            ShellSession 实例或 None。
+        """
+        if not self.persistent_session:
+            return None
+        if self._session is None:
+            if not session_supported():
+                logger.warning("当前平台不支持常驻 Shell 会话，改为逐条启动 Bash")
+                self.persistent_session = False
+                return None
+            login_args = ["-l"] if self.login_shell else ["--noprofile", "--norc"]
+            self._session = ShellSession(
+                [shell_exec, "--noediting", *login_args],
+                cwd=self.cwd,
+                env=self.env,
+                limits=self.limits,
+                cgroup=self.cgroup,
+            )
+        return self._session
+
+    def close(self) -> None:
+        """关闭常驻 Shell 会话。"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     def _resolve_shell_executable(self) -> Optional[str]:
         """解析并校验 Bash 可执行路径。
 
@@ -0,0 +1,158 @@
+"""已落盘工具输出的查看工具。"""
+
+import re
+from typing import Any, Dict, List
+
+from ctf_tool.base_tool import BaseTool
+from utils.tool_output import get_spiller
+
+
+class BlobReader(BaseTool):
+    """按页、按正则或按行号区间读取落盘的完整工具输出。"""
+
+    def __init__(self) -> None:
+        """初始化查看工具，单次返回内容不超过落盘阈值的一半。"""
+        spiller = get_spiller()
+        threshold = spiller.threshold or 4000
+        self.page_chars = max(500, threshold // 2)
+        self.max_matches = 100
+
+    def execute(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """读取落盘内容。
+
+        Args:
+            tool_name: 工具名称（未使用）。
+            arguments: 参数字典，包含 handle、mode 及对应模式的参数。
+
+        Returns:
+            查看结果文本。
+        """
+        handle = arguments.get("handle", "")
+        text = get_spiller().read(handle)
+        if text is None:
+            return f"错误: 找不到输出 {handle}，请使用预览中给出的 blob:<引用> 句柄"
+
+        mode = str(arguments.get("mode") or "page").strip().lower()
+        try:
+            if mode == "grep":
+                return self._grep(text, str(arguments.get("pattern", "")))
+            if mode == "slice":
+                return self._slice(
+                    text,
+                    int(arguments.get("start", 1)),
+                    int(arguments.get("end", 0) or 0),
+                )
+            if mode == "page":
+                return self._page(text, int(arguments.get("page", 1)))
+        except (TypeError, ValueError) as error:
+            return f"错误: 参数无效: {error}"
+        return f"错误: 未知模式 '{mode}'，可选 page、grep、slice"
+
+    def _page(self, text: str, page: int) -> str:
+        """按固定字符数分页读取。"""
+        total_pages = max(1, -(-len(text) // self.page_chars))
+        if page < 1 or page > total_pages:
+            return f"错误: 页码超出范围（共 {total_pages} 页）"
+        start = (page - 1) * self.page_chars
+        return (
+            f"[第 {page}/{total_pages} 页]\n"
+            f"{text[start:start + self.page_chars]}"
+        )
+
+    def _grep(self, text: str, pattern: str) -> str:
+        """按正则搜索并返回带行号的匹配行。"""
+        if not pattern:
+            return "错误: grep 模式需要提供 pattern"
+        try:
+            regex = re.compile(pattern)
+        except re.error as error:
+            return f"错误: 正则表达式无效: {error}"
+
+        lines: List[str] = []
+        used = 0
+        matched = 0
+        for number, line in enumerate(text.splitlines(), 1):
+            if not regex.search(line):
+                continue
+            matched += 1
+            if len(lines) >= self.max_matches or used >= self.page_chars:
+                continue
+            entry = f"{number}: {line[:500]}"
+            lines.append(entry)
+            used += len(entry) + 1
+
+        if not matched:
+            return "无匹配行"
+        header = f"[共 {matched} 行匹配"
+        if matched > len(lines):
+            header += f"，仅显示前 {len(lines)} 行"
+        return header + "]\n" + "\n".join(lines)
+
+    def _slice(self, text: str, start: int, end: int) -> str:
+        """按行号区间（从 1 开始，闭区间）读取。"""
+        all_lines = text.splitlines()
+        start = max(1, start)
+        end = len(all_lines) if end <= 0 else min(end, len(all_lines))
+        if start > end:
+            return f"错误: 行号区间无效（共 {len(all_lines)} 行）"
+
+        lines: List[str] = []
+        used = 0
+        for number in range(start, end + 1):
+            entry = f"{number}: {all_lines[number - 1]}"
+            if used + len(entry) > self.page_chars and lines:
+                return (
+                    f"[第 {start}-{number - 1} 行，共 {len(all_lines)} 行，已达单次上限]\n"
+                    + "\n".join(lines)
+                )
+            lines.append(entry[: self.page_chars])
+            used += len(entry) + 1
+        return f"[第 {start}-{end} 行，共 {len(all_lines)} 行]\n" + "\n".join(lines)
+
+    @property
+    def function_config(self) -> Dict[str, Any]:
+        """返回工具函数配置。
+
+        Returns:
+            函数调用配置字典。
+        """
+        return {
+            "type": "function",
+            "function": {
+                "name": "read_tool_output",
+                "description": (
+                    "查看因过长而落盘的工具输出（预览中的 blob:<引用> 句柄），"
+                    "支持分页（page）、正则搜索（grep）与行号切片（slice）"
+                ),
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "handle": {
+                            "type": "string",
+                            "description": "输出句柄，如 blob:0123456789abcdef",
+                        },
+                        "mode": {
+                            "type": "string",
+                            "description": "查看方式：page、grep 或 slice，默认 page",
+                        },
+                        "page": {
+                            "type": "integer",
+                            "description": "page 模式的页码，从 1 开始",
+                        },
+                        "pattern": {
+                            "type": "string",
+                            "description": "grep 模式的正则表达式，按行匹配",
+                        },
+                        "start": {
+                            "type": "integer",
+                            "description": "slice 模式的起始行号，从 1 开始",
+                        },
+                        "end": {
+                            "type": "integer",
+                            "description": "slice 模式的结束行号（含），缺省到末尾",
+                        },
+                    },
+                    "required": ["handle"],
+                },
+            },
+        }
@@ -4,6 +4,7 @@ import asyncio
 import atexit
 import logging
 import os
+import threading
 from contextlib import AsyncExitStack
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -34,6 +35,8 @@ class MCPServerAdapter(BaseTool):
         self.loop = asyncio.new_event_loop()
         self.base_url = ""
         self.auth_token: Optional[str] = None
+        # 适配器在多个解题代理间共享，同一事件循环一次只能运行一个调用
+        self._lock = threading.Lock()
 
         self.loop.run_until_complete(self._initialize_server())
         atexit.register(self._cleanup)
@@ -159,7 +162,8 @@ class MCPServerAdapter(BaseTool):
         if tool_name not in self.tools:
             return "", f"错误：未知的MCP工具 '{tool_name}'"
 
-        return self.loop.run_until_complete(self._execute(tool_name, arguments))
+        with self._lock:
+            return self.loop.run_until_complete(self._execute(tool_name, arguments))
 
     async def _execute(
         self,
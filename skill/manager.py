@@ -44,6 +44,9 @@ class SkillManager:
         self._skills: Dict[str, SkillInfo] = {}
         self._dirs: set[str] = set()
         self._loaded = False
+        # skill 集合版本，skill 变化时递增，用于失效已渲染的提示词块
+        self._version = 0
+        self._prompt_cache: Dict[tuple, str] = {}
 
         for d in self.DEFAULT_SKILL_DIRS:
             self._dirs.add(os.path.abspath(d))
@@ -63,8 +66,22 @@ class SkillManager:
             self._scan_directory(directory)
 
         self._loaded = True
+        self._version += 1
+        self._prompt_cache.clear()
         logger.info("已加载 %d 个 skill", len(self._skills))
 
+    def reload(self) -> None:
+        """清空已加载的 skill 并重新扫描目录。"""
+        self._skills = {}
+        self._loaded = False
+        self.load()
+
+    @property
+    def version(self) -> int:
+        """skill 集合版本，每次（重新）加载后递增。"""
+        self.load()
+        return self._version
+
     def _scan_directory(self, directory: str) -> None:
         for root, _dirs, files in os.walk(directory):
             for file_name in files:
@@ -148,9 +165,19 @@ class SkillManager:
         """将 skill 内容格式化为可注入 prompt 的文本。
 
         参考 crush 的 ToPromptXML 设计，以 XML 标签包裹每个 skill。
+        同一 skill 集合版本下的渲染结果会被缓存。
         """
         self.load()
-
+        cache_key = (self._version, tuple(selected or ()))
+        cached = self._prompt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        text = self._render_prompt(selected)
+        self._prompt_cache[cache_key] = text
+        return text
+
+    def _render_prompt(self, selected: Optional[List[str]]) -> str:
+        """渲染 skill 提示词块。"""
         skills_to_include = self.get_all()
         if selected:
             skills_to_include = [
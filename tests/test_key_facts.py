@@ -0,0 +1,63 @@
+"""KeyFactStore 去重、截断、淘汰与存档恢复的测试。"""
+
+from agent.key_facts import FINDING, TOOL, KeyFactStore
+
+
+def test_keys_ignore_case_and_whitespace():
+    assert KeyFactStore.make_key(FINDING, "Flag  is\nHERE") == KeyFactStore.make_key(
+        FINDING, "flag is here"
+    )
+    assert KeyFactStore.make_key(FINDING, "x") != KeyFactStore.make_key(TOOL, "x")
+
+
+def test_exact_duplicate_is_not_added_twice():
+    store = KeyFactStore()
+    assert store.add(FINDING, "port 8080 runs flask debug console")
+    assert not store.add(FINDING, "port 8080 runs flask debug console")
+    assert len(store) == 1
+
+
+def test_near_duplicate_keeps_newest_wording():
+    store = KeyFactStore()
+    store.add(FINDING, "the admin password hash is md5 5f4dcc3b5aa765d61d8327deb882cf99")
+    assert store.add(FINDING, "the admin password hash is md5: 5f4dcc3b5aa765d61d8327deb882cf99")
+    assert store.values() == ["the admin password hash is md5: 5f4dcc3b5aa765d61d8327deb882cf99"]
+
+
+def test_near_duplicates_of_other_kinds_are_kept():
+    store = KeyFactStore()
+    store.add(FINDING, "strings chall.bin shows flag format")
+    store.add(TOOL, "strings chall.bin shows flag format")
+    assert len(store) == 2
+
+
+def test_long_facts_are_truncated():
+    store = KeyFactStore(max_chars={FINDING: 10})
+    store.add(FINDING, "a" * 50)
+    assert store.values() == ["a" * 10 + "..."]
+
+
+def test_least_recently_used_fact_is_evicted_per_kind():
+    store = KeyFactStore(capacity={FINDING: 2})
+    store.add(FINDING, "first distinct finding about rsa")
+    store.add(FINDING, "second distinct finding about xor")
+    store.add(TOOL, "tool record survives")
+    store.add(FINDING, "first distinct finding about rsa")
+    store.add(FINDING, "third distinct finding about aes")
+    assert store.values() == [
+        "tool record survives",
+        "first distinct finding about rsa",
+        "third distinct finding about aes",
+    ]
+
+
+def test_round_trip_and_legacy_restore():
+    store = KeyFactStore()
+    store.add(FINDING, "found hidden zip in png")
+    restored = KeyFactStore()
+    restored.restore(store.to_dict())
+    assert restored.to_dict() == store.to_dict()
+
+    legacy = KeyFactStore()
+    legacy.restore({"finding:abc": "legacy finding", "tool_results": "legacy tool"})
+    assert sorted(legacy.values()) == ["legacy finding", "legacy tool"]
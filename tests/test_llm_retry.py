@@ -0,0 +1,124 @@
+"""错误分类、Retry-After 解析、熔断器与重试策略的测试。"""
+
+import email.utils
+import time
+
+import httpx
+import openai
+import pytest
+
+from utils.llm_retry import (
+    FATAL,
+    RATE_LIMIT,
+    SERVER_ERROR,
+    TRANSIENT,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    classify_error,
+    diff_retry_metrics,
+    format_retry_metrics,
+    retry_after_seconds,
+)
+
+REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+def status_error(status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    error_class = {
+        429: openai.RateLimitError,
+        400: openai.BadRequestError,
+        401: openai.AuthenticationError,
+    }.get(status, openai.InternalServerError if status >= 500 else openai.APIStatusError)
+    return error_class("error", response=response, body=None)
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (status_error(429), RATE_LIMIT),
+        (status_error(503), SERVER_ERROR),
+        (status_error(408), TRANSIENT),
+        (status_error(400), FATAL),
+        (status_error(401), FATAL),
+        (openai.APITimeoutError(request=REQUEST), TRANSIENT),
+        (openai.APIConnectionError(request=REQUEST), TRANSIENT),
+        (ValueError("bad json"), FATAL),
+    ],
+)
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_retry_after_prefers_milliseconds():
+    error = status_error(429, {"retry-after-ms": "1500", "retry-after": "9"})
+    assert retry_after_seconds(error) == pytest.approx(1.5)
+
+
+def test_retry_after_seconds_and_http_date():
+    assert retry_after_seconds(status_error(429, {"retry-after": "7"})) == 7
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert retry_after_seconds(status_error(503, {"retry-after": date})) == pytest.approx(30, abs=2)
+
+
+def test_retry_after_missing_or_invalid():
+    assert retry_after_seconds(status_error(429)) is None
+    assert retry_after_seconds(status_error(429, {"retry-after": "soon"})) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_breaker_opens_at_threshold_and_half_opens_after_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.llm_retry.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("endpoint", threshold=2, cooldown=30)
+
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    now[0] += 31
+    assert not breaker.is_open
+    breaker.check()
+    breaker.record_success()
+    assert breaker.failures == 0 and breaker.opened_at is None
+
+
+def test_fatal_errors_are_not_retried():
+    policy = RetryPolicy(max_attempts=5)
+    breaker = CircuitBreaker("endpoint", threshold=1, cooldown=30)
+    error = status_error(400)
+    with pytest.raises(openai.BadRequestError):
+        policy.handle_error(0, error, breaker)
+    assert breaker.failures == 0
+
+
+def test_retryable_error_waits_for_retry_after():
+    policy = RetryPolicy(max_attempts=3, max_delay=60)
+    delay = policy.handle_error(0, status_error(429, {"retry-after": "4"}), None)
+    assert delay == 4
+
+
+def test_failover_is_immediate_and_attempts_are_bounded():
+    policy = RetryPolicy(max_attempts=2)
+    assert policy.handle_error(0, status_error(503), None, can_failover=True) == 0
+    with pytest.raises(openai.InternalServerError):
+        policy.handle_error(1, status_error(503), None, can_failover=True)
+
+
+def test_backoff_stays_within_bounds():
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0)
+    for attempt in range(6):
+        ceiling = min(8.0, 2 ** attempt)
+        assert ceiling / 2 <= policy.backoff(attempt) <= ceiling
+
+
+def test_metrics_diff_and_format():
+    before = {"retries": 1, RATE_LIMIT: 2}
+    after = {"retries": 3, RATE_LIMIT: 2, SERVER_ERROR: 1}
+    changes = diff_retry_metrics(before, after)
+    assert changes == {"retries": 2, SERVER_ERROR: 1}
+    assert format_retry_metrics(changes) == "重试 2、服务端错误 1"
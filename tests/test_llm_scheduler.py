@@ -0,0 +1,84 @@
+"""令牌桶与端点限流器的测试。"""
+
+import threading
+import time
+
+import pytest
+
+from utils.llm_scheduler import EndpointLimiter, TokenBucket, estimate_request_tokens
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    bucket.consume(1000)
+    assert bucket.unlimited
+    assert bucket.wait_time(1000, time.monotonic()) == 0
+
+
+def test_bucket_waits_for_refill_after_draining():
+    bucket = TokenBucket(60)
+    now = bucket.updated_at
+    bucket.consume(60)
+    # 每分钟 60 个令牌即每秒补充 1 个
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == 0
+
+
+def test_cost_above_capacity_is_capped():
+    bucket = TokenBucket(10)
+    assert bucket.wait_time(1000, bucket.updated_at) == 0
+    bucket.consume(1000)
+    assert bucket.level == 0
+
+
+def test_refund_does_not_exceed_capacity():
+    bucket = TokenBucket(100)
+    bucket.consume(30)
+    bucket.refund(50)
+    assert bucket.level == 100
+
+
+def test_concurrency_limit_blocks_until_release():
+    limiter = EndpointLimiter("test", max_concurrency=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def worker():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release()
+    assert acquired.wait(1.0)
+    thread.join()
+    assert limiter.in_flight == 1
+
+
+def test_rpm_limit_reports_wait_time():
+    limiter = EndpointLimiter("test", max_concurrency=0, rpm=60)
+    with limiter._lock:
+        for _ in range(60):
+            assert limiter._try_acquire(0) == 0
+        assert limiter._try_acquire(0) > 0
+
+
+def test_release_corrects_token_reservation():
+    limiter = EndpointLimiter("test", max_concurrency=0, tpm=1000)
+    with limiter.slot(estimated_tokens=400) as request_slot:
+        request_slot.actual_tokens = 100
+    # 预扣 400，实际 100，归还 300，净消耗 100
+    assert limiter.tokens.level == pytest.approx(900, abs=1)
+
+    with limiter.slot(estimated_tokens=100) as request_slot:
+        request_slot.actual_tokens = 500
+    # 预扣 100，实际 500，补扣 400
+    assert limiter.tokens.level == pytest.approx(400, abs=1)
+    assert limiter.in_flight == 0
+
+
+def test_estimate_includes_output_budget():
+    prompt_only = estimate_request_tokens("hello world", max_tokens=0)
+    assert estimate_request_tokens("hello world", max_tokens=256) == prompt_only + 256
+    assert estimate_request_tokens("hello world") == prompt_only + 1024
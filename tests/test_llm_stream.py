@@ -0,0 +1,79 @@
+"""流式补全在截断标记处停止读取的测试。"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from utils.llm_balancer import Backend, BackendPool
+from utils.llm_request import LLMRequest
+from utils.llm_retry import RetryPolicy
+
+
+def chunk(text, finish_reason=None):
+    delta = SimpleNamespace(content=text)
+    return SimpleNamespace(
+        model="fake-model",
+        usage=None,
+        choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)],
+    )
+
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.consumed += 1
+            yield chunk(piece)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def request_with_stream(monkeypatch):
+    stream = FakeStream(
+        ["<think>plan</think>", "<tool_calls>[]</tool", "_calls>", "trailing", "more"]
+    )
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: stream))
+    )
+    monkeypatch.setattr(Backend, "client", property(lambda self: client))
+
+    request = LLMRequest.__new__(LLMRequest)
+    request.role = "solve_agent"
+    request.pool = BackendPool(
+        "test", [{"model": "fake-model", "api_base": "http://stream.test/v1"}]
+    )
+    request.llm_config = request.pool.primary.config
+    request.cache = None
+    request.retry_policy = RetryPolicy(max_attempts=1)
+    return request, stream
+
+
+def test_stream_stops_at_marker_split_across_chunks(request_with_stream):
+    request, stream = request_with_stream
+    deltas = []
+    response = request.stream_completion(
+        "prompt", on_delta=deltas.append, stop_marker="</tool_calls>"
+    )
+
+    assert response.choices[0].message.content == "<think>plan</think><tool_calls>[]</tool_calls>"
+    assert response.choices[0].finish_reason == "stop_marker"
+    assert stream.consumed == 3
+    assert stream.closed
+    assert "trailing" not in "".join(deltas)
+
+
+def test_backend_is_outstanding_until_stream_closes(request_with_stream):
+    request, _ = request_with_stream
+    backend = request.pool.primary
+    seen = []
+    request.stream_completion("prompt", on_delta=lambda delta: seen.append(backend.outstanding))
+
+    assert seen and all(count == 1 for count in seen)
+    assert backend.outstanding == 0
+    assert backend.limiter.in_flight == 0
@@ -0,0 +1,78 @@
+"""Memory 后台合并记忆块的测试。"""
+
+import pytest
+
+import agent.memory as memory_module
+from agent.memory import Memory
+
+
+class FailingCompressor:
+    """每次调用都失败的压缩模型。"""
+
+    def __init__(self, role):
+        self.calls = 0
+
+    def text_completion(self, **kwargs):
+        self.calls += 1
+        raise RuntimeError("service unavailable")
+
+
+def make_block(index):
+    return {"key_findings": [f"block {index}"], "source_steps": 1}
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    monkeypatch.setattr(memory_module.Config, "load_config", classmethod(lambda cls, *args: {}))
+    monkeypatch.setattr(memory_module, "LLMRequest", FailingCompressor)
+    memory = Memory(max_blocks=2)
+    memory.compressed_memory = [make_block(index) for index in range(3)]
+    yield memory
+    memory.close()
+
+
+def run_maintenance(memory):
+    memory._maybe_compress()
+    memory._apply_pending(wait=True)
+
+
+def test_failed_merge_is_not_retried_until_blocks_grow(memory):
+    for _ in range(5):
+        run_maintenance(memory)
+    assert memory.compress_llm.calls == 1
+    assert len(memory.compressed_memory) == 3
+
+    memory.compressed_memory.append(make_block(3))
+    run_maintenance(memory)
+    run_maintenance(memory)
+    assert memory.compress_llm.calls == 2
+
+
+class FakeEmbedder:
+    """按文本长度生成向量，可指定拒绝的文本。"""
+
+    def __init__(self, reject=()):
+        self.batches = []
+        self.reject = set(reject)
+
+    def embedding(self, texts):
+        self.batches.append(list(texts))
+        if self.reject & set(texts):
+            raise ValueError("input too long")
+        return type("Response", (), {"data": [{"embedding": [len(text), 1.0]} for text in texts]})
+
+
+def test_repeated_query_is_embedded_once(memory):
+    memory.embed_llm = FakeEmbedder()
+    memory._recall_store = {"1": "aa", "2": "bbbb"}
+    assert memory._recall("query", []) == memory._recall("query", [])
+    assert memory.embed_llm.batches == [["query"], ["aa", "bbbb"]]
+
+
+def test_rejected_step_does_not_block_recall(memory):
+    memory.embed_llm = FakeEmbedder(reject={"bad"})
+    memory._recall_store = {"1": "aa"}
+    assert memory._recall("query", []) == ["1"]
+
+    memory._recall_store["2"] = "bad"
+    assert memory._recall("other", []) == ["1"]
@@ -0,0 +1,47 @@
+"""rlimit 配置与 preexec 钩子的测试。"""
+
+import subprocess
+
+import pytest
+
+from utils.resource_governor import ResourceLimits, make_preexec, resource
+
+pytestmark = pytest.mark.skipif(resource is None, reason="平台不支持 rlimit")
+
+
+def run_limited(limits, script):
+    return subprocess.run(
+        ["sh", "-c", script],
+        preexec_fn=make_preexec(limits),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+
+def test_from_config_ignores_invalid_values():
+    limits = ResourceLimits.from_config({"cpu_seconds": -1, "open_files": "64", "processes": 8})
+    assert limits == ResourceLimits(processes=8)
+
+
+def test_no_limits_means_no_preexec():
+    assert make_preexec(ResourceLimits()) is None
+
+
+def test_cpu_and_file_limits_cannot_be_raised_by_the_command():
+    result = run_limited(
+        ResourceLimits(cpu_seconds=10, file_size_mb=1),
+        "ulimit -St; ulimit -Ht; ulimit -Hf; ulimit -St unlimited || echo refused",
+    )
+    lines = result.stdout.split()
+    assert lines[:3] == ["10", "15", "2048"]
+    assert lines[-1] == "refused"
+
+
+def test_address_space_sets_only_the_soft_limit():
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    result = run_limited(ResourceLimits(memory_mb=4096), "ulimit -Sv; ulimit -Hv")
+    soft_kb, hard_text = result.stdout.split()
+    assert int(soft_kb) == 4096 * 1024
+    expected = "unlimited" if hard == resource.RLIM_INFINITY else str(hard // 1024)
+    assert hard_text == expected
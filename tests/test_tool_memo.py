@@ -0,0 +1,133 @@
+"""ToolMemo 缓存键与写入规则的测试。"""
+
+import pytest
+
+from utils.tool_memo import CACHED_MARKER, ToolMemo
+from utils.tool_output import ToolOutputSpiller
+
+SHELL = "execute_shell_command"
+
+
+@pytest.fixture
+def memo(tmp_path):
+    memo = ToolMemo(path=str(tmp_path / "memo.sqlite3"))
+    yield memo
+    memo._conn.close()
+
+
+@pytest.fixture
+def sample(tmp_path):
+    path = tmp_path / "sample.bin"
+    path.write_bytes(b"\x7fELF" + b"\x00" * 64)
+    return path
+
+
+def shell(command):
+    return {"content": command}
+
+
+def test_key_is_stable_for_same_command_and_input(memo, sample):
+    first = memo.make_key(SHELL, shell("strings sample.bin"), str(sample.parent))
+    second = memo.make_key(SHELL, shell("  strings sample.bin \n"), str(sample.parent))
+    assert first is not None
+    assert first == second
+
+
+def test_key_changes_when_input_file_changes(memo, sample):
+    before = memo.make_key(SHELL, shell("strings sample.bin"), str(sample.parent))
+    sample.write_bytes(b"changed content")
+    after = memo.make_key(SHELL, shell("strings sample.bin"), str(sample.parent))
+    assert before is not None and after is not None
+    assert before[0] != after[0]
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "strings *.bin",
+        "strings $FILE",
+        "strings sample.bin > out.txt",
+        "strings sample.bin && rm sample.bin",
+        "python3 solve.py",
+        "sort -o sample.bin sample.bin",
+        "curl -X POST -d a=1 http://example.com",
+        "curl -c cookies.txt http://example.com",
+        "curl --data-binary @sample.bin http://example.com",
+        "curl -o page.html http://example.com",
+    ],
+)
+def test_uncacheable_commands(memo, sample, command):
+    assert memo.make_key(SHELL, shell(command), str(sample.parent)) is None
+
+
+def test_quoted_patterns_are_cacheable(memo, sample):
+    key = memo.make_key(SHELL, shell("grep -a 'flag{.*}' sample.bin"), str(sample.parent))
+    assert key is not None
+
+
+def test_plain_curl_get_uses_short_ttl(memo, sample):
+    key = memo.make_key(SHELL, shell("curl -s http://example.com/"), str(sample.parent))
+    assert key is not None
+    assert key[1] == 300
+
+
+def test_directory_argument_is_uncacheable(memo, tmp_path):
+    assert memo.make_key(SHELL, shell(f"file {tmp_path}"), str(tmp_path)) is None
+
+
+def test_only_successful_output_is_stored(memo):
+    assert not memo.put("failed", SHELL, "[exit_code] 1\n[stdout]\n")
+    assert memo.get("failed") is None
+    assert memo.put("ok", SHELL, "[exit_code] 0\n[stdout]\nhello")
+    assert memo.get("ok") == "[exit_code] 0\n[stdout]\nhello"
+
+
+def test_expired_entry_is_a_miss(memo, monkeypatch):
+    assert memo.put("key", SHELL, "[exit_code] 0\nx", ttl=10)
+    now = __import__("time").time()
+    monkeypatch.setattr("utils.tool_memo.time.time", lambda: now + 60)
+    assert memo.get("key") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    memo = ToolMemo(path=str(tmp_path / "memo.sqlite3"), max_entries=2)
+    try:
+        for index in range(3):
+            memo.put(f"key{index}", SHELL, f"[exit_code] 0\n{index}")
+        assert memo.get("key0") is None
+        assert memo.get("key2") is not None
+    finally:
+        memo._conn.close()
+
+
+def test_large_output_is_stored_before_spilling(memo, tmp_path):
+    output = "[exit_code] 0\n[stdout]\n" + "A" * 10000
+    spiller = ToolOutputSpiller(spill_dir=str(tmp_path / "blobs"), threshold=4000)
+    spilled = spiller.spill(output)
+    # 落盘后的预览不再以 [exit_code] 开头，必须缓存原始输出
+    assert not spilled.startswith("[exit_code]")
+    assert memo.put("large", SHELL, output)
+    assert spiller.spill(memo.get("large")) == spilled
+
+
+def test_large_successful_output_is_served_from_memo(monkeypatch, memo, sample, tmp_path):
+    tools_module = pytest.importorskip("utils.tools")
+    spiller = ToolOutputSpiller(spill_dir=str(tmp_path / "blobs"), threshold=4000)
+    monkeypatch.setattr(tools_module, "get_tool_memo", lambda: memo)
+    monkeypatch.setattr(tools_module, "get_spiller", lambda: spiller)
+
+    class FakeShell:
+        calls = 0
+        cwd = str(sample.parent)
+
+        def execute(self, tool_name, arguments):
+            FakeShell.calls += 1
+            return "[exit_code] 0\n[stdout]\n" + "A" * 10000
+
+    tools = {SHELL: FakeShell()}
+    call = {"tool_name": SHELL, "arguments": shell("strings sample.bin")}
+    first = tools_module.ToolUtils._run_tool_call(tools, call)
+    second = tools_module.ToolUtils._run_tool_call(tools, call)
+
+    assert FakeShell.calls == 1
+    assert second["raw_output"] == f"{CACHED_MARKER}\n{first['raw_output']}"
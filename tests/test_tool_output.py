@@ -0,0 +1,89 @@
+"""工具输出落盘、预览与落盘目录回收的测试。"""
+
+import os
+import time
+
+from utils.blob_store import DiskBlobStore
+from utils.tool_output import HANDLE_PREFIX, ToolOutputSpiller, parse_handle
+
+
+def age(path, hours):
+    stamp = time.time() - hours * 3600
+    os.utime(path, (stamp, stamp))
+
+
+def test_short_output_is_returned_unchanged(tmp_path):
+    spiller = ToolOutputSpiller(spill_dir=str(tmp_path), threshold=100)
+    assert spiller.spill("short") == "short"
+    assert not os.listdir(tmp_path)
+
+
+def test_long_output_keeps_head_tail_and_handle(tmp_path):
+    spiller = ToolOutputSpiller(
+        spill_dir=str(tmp_path), threshold=100, preview_head=40, preview_tail=40
+    )
+    text = "\n".join(f"line {index:04d}" for index in range(500))
+    preview = spiller.spill(text)
+
+    assert len(preview) < len(text)
+    assert "line 0000" in preview and "line 0499" in preview
+    handle = preview.split(HANDLE_PREFIX, 1)[1].split("（", 1)[0]
+    assert spiller.read(f"{HANDLE_PREFIX}{handle}") == text
+
+
+def test_disabled_threshold_never_spills(tmp_path):
+    spiller = ToolOutputSpiller(spill_dir=str(tmp_path), threshold=0)
+    assert spiller.spill("x" * 100000) == "x" * 100000
+
+
+def test_parse_handle():
+    assert parse_handle("blob:0123456789abcdef") == "0123456789abcdef"
+    assert parse_handle(" 0123456789abcdef ") == "0123456789abcdef"
+    assert parse_handle("blob:../../etc/passwd") is None
+    assert parse_handle(None) is None
+
+
+def test_disk_store_deduplicates_content(tmp_path):
+    store = DiskBlobStore(str(tmp_path))
+    assert store.put("same") == store.put("same")
+    assert store.get(store.put("same")) == "same"
+    assert store.get("ffffffffffffffff") is None
+
+
+def test_gc_removes_expired_blobs_only(tmp_path):
+    store = DiskBlobStore(str(tmp_path))
+    old = store.put("old")
+    fresh = store.put("fresh")
+    age(store.path(old), 100)
+
+    assert store.collect_garbage(max_age_hours=72) == 1
+    assert old not in store
+    assert fresh in store
+
+
+def test_gc_trims_least_recently_used_blobs_to_size(tmp_path):
+    store = DiskBlobStore(str(tmp_path))
+    refs = [store.put(str(index) * 400000) for index in range(4)]
+    for hours, ref in zip((4, 3, 2, 1), refs):
+        age(store.path(ref), hours)
+    # 读取会刷新使用时间，最早写入的内容因此保留
+    store.get(refs[0])
+
+    assert store.collect_garbage(max_mb=1) == 2
+    assert [ref in store for ref in refs] == [True, False, False, True]
+
+
+def test_gc_disabled_by_default(tmp_path):
+    store = DiskBlobStore(str(tmp_path))
+    ref = store.put("old")
+    age(store.path(ref), 1000)
+    assert store.collect_garbage() == 0
+
+
+def test_spiller_collects_garbage_when_opening_store(tmp_path):
+    store = DiskBlobStore(str(tmp_path))
+    ref = store.put("old")
+    age(store.path(ref), 100)
+    spiller = ToolOutputSpiller(spill_dir=str(tmp_path), max_age_hours=72)
+    assert spiller.read(ref) is None
+
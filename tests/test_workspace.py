@@ -0,0 +1,59 @@
+"""工作目录命名、恢复与回收的测试。"""
+
+import os
+import time
+
+from utils.workspace import Workspace, collect_garbage, latest_run
+
+
+def age(path, hours):
+    stamp = time.time() - hours * 3600
+    os.utime(path, (stamp, stamp))
+
+
+def test_runs_of_the_same_problem_get_distinct_directories(tmp_path):
+    first = Workspace(str(tmp_path), "web")
+    second = Workspace(str(tmp_path), "web")
+    assert first.path != second.path
+
+
+def test_latest_run_ignores_problems_sharing_a_prefix(tmp_path):
+    own = Workspace(str(tmp_path), "web")
+    age(own.path, 1)
+    Workspace(str(tmp_path), "web-easy")
+    assert latest_run(str(tmp_path), "web") == own.name
+    assert latest_run(str(tmp_path), "pwn") is None
+
+
+def test_garbage_collection_keeps_directories_with_recent_nested_writes(tmp_path):
+    stale = Workspace(str(tmp_path), "stale")
+    active = Workspace(str(tmp_path), "active")
+    nested = os.path.join(active.path, "out", "dump.bin")
+    os.makedirs(os.path.dirname(nested))
+    with open(nested, "wb") as file:
+        file.write(b"data")
+    # 只有嵌套文件是新的，两个目录本身都已过期
+    age(os.path.dirname(nested), 100)
+    age(active.path, 100)
+    age(stale.path, 100)
+
+    assert collect_garbage(str(tmp_path), 72) == 1
+    assert not os.path.exists(stale.path)
+    assert os.path.exists(nested)
+
+
+def test_garbage_collection_respects_keep(tmp_path):
+    workspace = Workspace(str(tmp_path), "keep")
+    age(workspace.path, 100)
+    assert collect_garbage(str(tmp_path), 72, keep={workspace.name}) == 0
+    assert os.path.isdir(workspace.path)
+
+
+def test_attachments_are_copied_by_default(tmp_path):
+    source = tmp_path / "chall.bin"
+    source.write_bytes(b"original")
+    workspace = Workspace(str(tmp_path / "root"), "misc")
+    assert workspace.stage([str(source)]) == ["chall.bin"]
+    with open(os.path.join(workspace.path, "chall.bin"), "wb") as file:
+        file.write(b"modified")
+    assert source.read_bytes() == b"original"
@@ -0,0 +1,222 @@
+"""工具输出的内容寻址存储。
+
+步骤记录只保存输出的引用（内容哈希），相同输出在内存与存档中只保留一份；
+过长的工具输出另外落盘到 DiskBlobStore，提示词中只保留预览与引用。
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class BlobStore:
+    """基于内存字典的内容寻址存储。"""
+
+    def __init__(self) -> None:
+        """初始化空存储。"""
+        self._blobs: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        """存储的条目数量。"""
+        return len(self._blobs)
+
+    def __contains__(self, ref: Any) -> bool:
+        """引用是否存在。"""
+        return ref in self._blobs
+
+    @staticmethod
+    def make_ref(text: str) -> str:
+        """计算文本的内容引用。
+
+        Args:
+            text: 文本内容。
+
+        Returns:
+            十六进制 SHA-256 摘要前 16 位。
+        """
+        return hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()[:16]
+
+    def put(self, text: str) -> str:
+        """写入文本并返回引用，相同内容只存一份。
+
+        Args:
+            text: 文本内容。
+
+        Returns:
+            内容引用。
+        """
+        ref = self.make_ref(text)
+        self._blobs.setdefault(ref, text)
+        return ref
+
+    def get(self, ref: Optional[str]) -> str:
+        """读取引用对应的文本。
+
+        Args:
+            ref: 内容引用。
+
+        Returns:
+            文本内容；引用不存在时返回空字符串。
+        """
+        if ref is None:
+            return ""
+        return self._blobs.get(ref, "")
+
+    def retain(self, refs: Iterable[str]) -> None:
+        """只保留给定引用，释放其余内容。
+
+        Args:
+            refs: 仍被引用的内容引用。
+        """
+        keep = set(refs)
+        self._blobs = {ref: text for ref, text in self._blobs.items() if ref in keep}
+
+    def to_dict(self, refs: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """导出存储内容。
+
+        Args:
+            refs: 只导出这些引用，None 表示全部。
+
+        Returns:
+            引用到文本的映射。
+        """
+        if refs is None:
+            return dict(self._blobs)
+        return {ref: self._blobs[ref] for ref in set(refs) if ref in self._blobs}
+
+    def restore(self, data: Any) -> None:
+        """从 to_dict 导出的数据恢复。
+
+        Args:
+            data: 引用到文本的映射。
+        """
+        self._blobs = {}
+        if isinstance(data, dict):
+            for text in data.values():
+                if isinstance(text, str):
+                    self.put(text)
+
+
+class DiskBlobStore:
+    """基于目录的内容寻址存储，用于保存过长的工具输出。
+
+    每条内容以 ``<root>/<ref 前两位>/<ref>`` 的文件形式保存，写入采用临时文件加原子替换。
+    写入或读取时刷新文件修改时间，collect_garbage 据此按最近使用时间回收。
+    """
+
+    _REF_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+    def __init__(self, root: str) -> None:
+        """初始化存储目录。
+
+        Args:
+            root: 存储根目录，不存在时自动创建。
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ref: str) -> Optional[str]:
+        """返回引用对应的文件路径。
+
+        Args:
+            ref: 内容引用。
+
+        Returns:
+            文件路径；引用格式非法时返回 None。
+        """
+        if not isinstance(ref, str) or not self._REF_PATTERN.match(ref):
+            return None
+        return os.path.join(self.root, ref[:2], ref)
+
+    def __contains__(self, ref: Any) -> bool:
+        """引用是否存在。"""
+        path = self.path(ref)
+        return path is not None and os.path.isfile(path)
+
+    def put(self, text: str) -> str:
+        """写入文本并返回引用，相同内容只写一次。
+
+        Args:
+            text: 文本内容。
+
+        Returns:
+            内容引用。
+        """
+        ref = BlobStore.make_ref(text)
+        path = self.path(ref)
+        if path is not None and not self._touch(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8", errors="replace") as file:
+                file.write(text)
+            os.replace(temp_path, path)
+        return ref
+
+    def get(self, ref: Optional[str]) -> Optional[str]:
+        """读取引用对应的文本。
+
+        Args:
+            ref: 内容引用。
+
+        Returns:
+            文本内容；引用不存在或非法时返回 None。
+        """
+        path = self.path(ref) if ref is not None else None
+        if path is None or not self._touch(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """刷新文件修改时间，文件不存在时返回 False。"""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def collect_garbage(self, max_age_hours: float = 0, max_mb: float = 0) -> int:
+        """回收过期内容，并在总量超出上限时从最久未用的内容开始删除。
+
+        Args:
+            max_age_hours: 保留时长（小时），<=0 表示不按时间回收。
+            max_mb: 存储总量上限（MB），<=0 表示不限。
+
+        Returns:
+            删除的文件数量。
+        """
+        if max_age_hours <= 0 and max_mb <= 0:
+            return 0
+        entries: List[Tuple[float, int, str]] = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        deadline = time.time() - max_age_hours * 3600 if max_age_hours > 0 else None
+        total = sum(size for _, size, _ in entries)
+        limit = max_mb * 1024 * 1024 if max_mb > 0 else None
+        removed = 0
+        for mtime, size, path in entries:
+            expired = deadline is not None and mtime < deadline
+            if not expired and (limit is None or total <= limit):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,245 @@
+"""同一角色多 LLM 后端的负载均衡与故障切换。
+
+config.json 中角色既可以是单个端点配置，也可以是端点列表：
+
+    "solve_agent": [
+        {"model": "qwen2.5-72b", "api_key": "", "api_base": "http://127.0.0.1:8000/v1"},
+        {"model": "gpt-4o", "api_key": "sk-...", "api_base": "https://api.openai.com/v1"}
+    ]
+
+每次请求按 llm_balance.strategy 选择后端：
+- least_outstanding（默认）：优先在途请求最少的后端，平局时比较延迟
+- latency：优先观测延迟（EWMA）最低的后端
+
+后端出错时记入熔断器并立即切换到下一个可用后端。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from utils.llm_client import DEFAULT_TIMEOUT, get_client
+from utils.llm_retry import CircuitBreaker, RetryPolicy, get_breaker
+from utils.llm_scheduler import EndpointLimiter, get_limiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LEAST_OUTSTANDING = "least_outstanding"
+LATENCY = "latency"
+
+# 延迟 EWMA 平滑系数
+_EWMA_ALPHA = 0.3
+
+
+class Backend:
+    """单个 LLM 后端及其运行时统计。"""
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """初始化后端。
+
+        Args:
+            config: 端点配置（model、api_key、api_base、timeout）。
+        """
+        self.config = config
+        self.model: str = config["model"]
+        self.api_base: Optional[str] = config.get("api_base")
+        self.api_key: Optional[str] = config.get("api_key")
+        self.timeout: float = config.get("timeout", DEFAULT_TIMEOUT)
+        self.name = f"{self.model}@{self.api_base or 'default'}"
+
+        # 服务商的限额与故障通常按 (地址, 模型, 密钥) 区分，限流器与熔断器也按此共享，
+        # 同一网关下的不同模型或密钥互不牵连；密钥只以摘要形式出现在标识中
+        key_digest = hashlib.sha256((self.api_key or "").encode("utf-8")).hexdigest()[:8]
+        self.key = f"{self.name}#{key_digest}"
+        self.limiter: EndpointLimiter = get_limiter(self.api_base, self.key)
+        self.breaker: CircuitBreaker = get_breaker(self.api_base, self.key)
+        self.outstanding = 0
+        self.latency_ewma = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        """共享的同步 OpenAI 客户端。"""
+        return get_client(self.api_base, self.api_key, self.timeout)
+
+    def begin(self) -> float:
+        """记录请求开始。
+
+        Returns:
+            开始时间（单调时钟）。
+        """
+        with self._lock:
+            self.outstanding += 1
+        return time.monotonic()
+
+    def end(self, started_at: float) -> None:
+        """记录请求结束并更新延迟 EWMA。
+
+        失败请求同样计入延迟，使变慢或超时的后端自然降权。
+
+        Args:
+            started_at: begin() 返回的开始时间。
+        """
+        elapsed = time.monotonic() - started_at
+        with self._lock:
+            self.outstanding = max(0, self.outstanding - 1)
+            if self.latency_ewma == 0:
+                self.latency_ewma = elapsed
+            else:
+                self.latency_ewma = (
+                    _EWMA_ALPHA * elapsed + (1 - _EWMA_ALPHA) * self.latency_ewma
+                )
+
+
+class BackendPool:
+    """一个角色下的后端集合。"""
+
+    def __init__(
+        self,
+        role: str,
+        configs: List[Dict[str, Any]],
+        strategy: str = LEAST_OUTSTANDING,
+    ) -> None:
+        """初始化后端池。
+
+        Args:
+            role: 角色名。
+            configs: 端点配置列表（至少一个）。
+            strategy: 选择策略。
+        """
+        if not configs:
+            raise ValueError(f"LLM 角色 {role} 未配置任何端点")
+        self.role = role
+        self.strategy = strategy
+        self.backends = [Backend(config) for config in configs]
+
+    @property
+    def primary(self) -> Backend:
+        """配置中的第一个后端。"""
+        return self.backends[0]
+
+    def _score(self, backend: Backend) -> tuple:
+        """计算后端排序键，越小越优先。"""
+        if self.strategy == LATENCY:
+            return (backend.latency_ewma, backend.outstanding)
+        return (backend.outstanding, backend.latency_ewma)
+
+    def available(self, exclude: Optional[Backend] = None) -> List[Backend]:
+        """返回未熔断的后端，按优先级排序。
+
+        Args:
+            exclude: 需要排除的后端。
+
+        Returns:
+            可用后端列表。
+        """
+        candidates = [
+            backend
+            for backend in self.backends
+            if backend is not exclude and not backend.breaker.is_open
+        ]
+        return sorted(candidates, key=self._score)
+
+    def select(self) -> Backend:
+        """选择本次请求使用的后端。
+
+        Returns:
+            最优可用后端。
+
+        Raises:
+            CircuitOpenError: 全部后端均处于熔断期时抛出。
+        """
+        candidates = self.available()
+        if candidates:
+            return candidates[0]
+
+        # 全部熔断：交给熔断器抛出最早恢复的那个
+        soonest = min(
+            self.backends,
+            key=lambda backend: backend.breaker.opened_at or 0.0,
+        )
+        soonest.breaker.check()
+        return soonest
+
+    def call(
+        self,
+        operation: Callable[[Backend], T],
+        policy: RetryPolicy,
+        defer_end: bool = False,
+    ) -> T:
+        """在后端池上执行同步调用，失败时切换后端或按策略重试。
+
+        Args:
+            operation: 接收后端并发起请求的调用。
+            policy: 重试策略。
+            defer_end: 为 True 时成功后不调用 backend.end()，由调用方在请求真正结束时
+                调用（例如流式响应读取完毕后），使在途计数与延迟覆盖整个请求。
+
+        Returns:
+            调用结果。
+
+        Raises:
+            CircuitOpenError: 全部后端熔断时抛出。
+        """
+        attempt = 0
+        while True:
+            backend = self.select()
+            started_at = backend.begin()
+            try:
+                result = operation(backend)
+            except Exception as error:
+                backend.end(started_at)
+                can_failover = bool(self.available(exclude=backend))
+                time.sleep(policy.handle_error(attempt, error, backend.breaker, can_failover))
+                attempt += 1
+                continue
+            if not defer_end:
+                backend.end(started_at)
+            backend.breaker.record_success()
+            return result
+
+
+_pools: Dict[str, BackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(
+    role: str,
+    configs: List[Dict[str, Any]],
+    strategy: str = LEAST_OUTSTANDING,
+) -> BackendPool:
+    """获取（必要时创建）角色对应的共享后端池。
+
+    相同角色与端点配置在进程内共享统计数据。
+
+    Args:
+        role: 角色名。
+        configs: 端点配置列表。
+        strategy: 选择策略。
+
+    Returns:
+        BackendPool 实例。
+    """
+    key = json.dumps([role, configs, strategy], sort_keys=True, default=str)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = BackendPool(role, configs, strategy)
+            _pools[key] = pool
+            if len(pool.backends) > 1:
+                logger.info(
+                    "LLM 角色 %s 使用 %d 个后端（策略: %s）",
+                    role,
+                    len(pool.backends),
+                    strategy,
+                )
+    return pool
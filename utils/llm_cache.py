@@ -0,0 +1,272 @@
+"""基于内容寻址的 LLM 响应磁盘缓存。
+
+以 (model, messages, 采样参数) 的哈希为键，将响应文本存入本地 SQLite，
+支持 TTL 过期与按总字节数的 LRU 淘汰。缓存为可选功能，
+需要在 config.json 的 llm_cache.enabled 中显式开启。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "./cache/llm_cache.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS responses ("
+    " key TEXT PRIMARY KEY,"
+    " model TEXT NOT NULL,"
+    " content TEXT NOT NULL,"
+    " size INTEGER NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " accessed_at REAL NOT NULL"
+    ")",
+    "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+)
+
+
+class LLMResponseCache:
+    """SQLite 实现的 LLM 响应缓存。"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        """初始化缓存并确保数据表存在。
+
+        Args:
+            path: SQLite 文件路径。
+            ttl: 条目存活时间（秒），<=0 表示永不过期。
+            max_bytes: 缓存内容总字节上限，超出后按最近最少使用淘汰。
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, Any]],
+        params: Dict[str, Any],
+    ) -> str:
+        """计算请求的内容哈希键。
+
+        Args:
+            model: 模型名。
+            messages: 对话消息列表。
+            params: 采样参数等其他请求参数。
+
+        Returns:
+            十六进制 SHA-256 摘要。
+        """
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _bump(self, name: str) -> None:
+        """累加命中/未命中计数（需在持锁事务中调用）。"""
+        self._conn.execute(
+            "INSERT INTO counters(name, value) VALUES(?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存内容，过期条目视为未命中并删除。
+
+        Args:
+            key: 缓存键。
+
+        Returns:
+            缓存的响应文本，未命中返回 None。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is not None and self.ttl > 0 and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self._bump("misses")
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self._bump("hits")
+            return row[0]
+
+    def put(self, key: str, model: str, content: str) -> None:
+        """写入缓存并在超出容量时淘汰最久未使用的条目。
+
+        Args:
+            key: 缓存键。
+            model: 模型名。
+            content: 响应文本。
+        """
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                "(key, model, content, size, created_at, accessed_at)"
+                " VALUES(?, ?, ?, ?, ?, ?)",
+                (key, model, content, size, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """清理过期条目并按 LRU 淘汰至容量以内（需在持锁事务中调用）。"""
+        if self.ttl > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (now - self.ttl,),
+            )
+
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        overflow = total - self.max_bytes
+        freed = 0
+        victims: List[str] = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ):
+            victims.append(key)
+            freed += size
+            if freed >= overflow:
+                break
+        self._conn.executemany(
+            "DELETE FROM responses WHERE key = ?",
+            [(key,) for key in victims],
+        )
+        logger.debug("LLM 缓存淘汰 %d 条，释放 %d 字节", len(victims), freed)
+
+    def stats(self) -> Dict[str, Any]:
+        """统计缓存状态。
+
+        Returns:
+            包含条目数、总字节、命中数、未命中数等字段的字典。
+        """
+        with self._lock:
+            entries, total, oldest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at) FROM responses"
+            ).fetchone()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "oldest": oldest,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+        }
+
+    def clear(self) -> int:
+        """清空全部缓存条目与计数。
+
+        Returns:
+            删除的条目数量。
+        """
+        with self._lock:
+            with self._conn:
+                deleted = self._conn.execute("DELETE FROM responses").rowcount
+                self._conn.execute("DELETE FROM counters")
+            self._conn.execute("VACUUM")
+        return deleted
+
+
+_cache_instance: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def load_cache_config() -> Dict[str, Any]:
+    """读取 llm_cache 配置。
+
+    Returns:
+        llm_cache 配置字典，缺失时返回空字典。
+    """
+    try:
+        cache_config = Config.load_config().get("llm_cache", {})
+    except ValueError:
+        return {}
+    return cache_config if isinstance(cache_config, dict) else {}
+
+
+def open_cache(cache_config: Optional[Dict[str, Any]] = None) -> LLMResponseCache:
+    """按配置打开缓存（不检查是否启用）。
+
+    Args:
+        cache_config: llm_cache 配置，缺省时从配置文件读取。
+
+    Returns:
+        LLMResponseCache 实例。
+    """
+    if cache_config is None:
+        cache_config = load_cache_config()
+    return LLMResponseCache(
+        path=str(cache_config.get("path", DEFAULT_CACHE_PATH)),
+        ttl=float(cache_config.get("ttl", DEFAULT_TTL)),
+        max_bytes=int(cache_config.get("max_bytes", DEFAULT_MAX_BYTES)),
+    )
+
+
+def get_cache(
+    cache_config: Optional[Dict[str, Any]] = None,
+) -> Optional[LLMResponseCache]:
+    """获取进程级共享缓存；未启用时返回 None。
+
+    Args:
+        cache_config: llm_cache 配置，缺省时从配置文件读取。
+
+    Returns:
+        共享的 LLMResponseCache 实例或 None。
+    """
+    global _cache_instance
+
+    if cache_config is None:
+        cache_config = load_cache_config()
+    if not isinstance(cache_config, dict) or not cache_config.get("enabled", False):
+        return None
+
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = open_cache(cache_config)
+    return _cache_instance
@@ -0,0 +1,133 @@
+"""进程级共享的 OpenAI 客户端注册表。
+
+同一 (api_base, api_key, timeout) 组合在整个进程内只创建一个客户端，
+所有 LLMRequest 共享其底层 httpx 连接池，避免重复的 TLS 握手。
+客户端自身的重试被关闭，统一由 utils.llm_retry 中的策略处理。
+"""
+
+import atexit
+import importlib.util
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from openai import OpenAI
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_CONNECT_TIMEOUT = 30.0
+
+DEFAULT_POOL_CONFIG: Dict[str, Any] = {
+    "max_connections": 32,
+    "max_keepalive_connections": 16,
+    "keepalive_expiry": 90.0,
+    "http2": True,
+}
+
+ClientKey = Tuple[str, str, float]
+
+_clients: Dict[ClientKey, OpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    """判断当前环境是否安装了 HTTP/2 支持（h2 包）。"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def load_pool_config() -> Dict[str, Any]:
+    """读取连接池配置，缺失项使用默认值。
+
+    Returns:
+        合并默认值后的 llm_pool 配置字典。
+    """
+    pool_config = dict(DEFAULT_POOL_CONFIG)
+    try:
+        user_config = Config.load_config().get("llm_pool", {})
+    except ValueError:
+        user_config = {}
+    if isinstance(user_config, dict):
+        pool_config.update(user_config)
+    return pool_config
+
+
+def _http_client_options(timeout: float, pool_config: Dict[str, Any]) -> Dict[str, Any]:
+    """按连接池配置生成 httpx 客户端参数。
+
+    Args:
+        timeout: 读写超时（秒）。
+        pool_config: 连接池配置。
+
+    Returns:
+        httpx.Client 的构造参数。
+    """
+    limits = httpx.Limits(
+        max_connections=int(pool_config["max_connections"]),
+        max_keepalive_connections=int(pool_config["max_keepalive_connections"]),
+        keepalive_expiry=float(pool_config["keepalive_expiry"]),
+    )
+    use_http2 = bool(pool_config.get("http2")) and _http2_available()
+    if pool_config.get("http2") and not use_http2:
+        logger.debug("未安装 h2，LLM 连接回退为 HTTP/1.1")
+
+    return {
+        "limits": limits,
+        "timeout": httpx.Timeout(timeout, connect=DEFAULT_CONNECT_TIMEOUT),
+        "http2": use_http2,
+    }
+
+
+def get_client(
+    api_base: Optional[str],
+    api_key: Optional[str],
+    timeout: float = DEFAULT_TIMEOUT,
+) -> OpenAI:
+    """获取（必要时创建）共享的 OpenAI 客户端。
+
+    Args:
+        api_base: 接口地址。
+        api_key: 接口密钥。
+        timeout: 请求超时（秒）。
+
+    Returns:
+        与参数组合对应的共享 OpenAI 客户端。
+    """
+    key: ClientKey = (api_base or "", api_key or "", float(timeout))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = httpx.Client(
+                **_http_client_options(float(timeout), load_pool_config())
+            )
+            client = OpenAI(
+                api_key=api_key,
+                base_url=api_base,
+                timeout=httpx.Timeout(float(timeout), connect=DEFAULT_CONNECT_TIMEOUT),
+                http_client=http_client,
+                max_retries=0,
+            )
+            _clients[key] = client
+            logger.debug("已创建共享 LLM 客户端: %s", api_base)
+    return client
+
+
+def close_all() -> None:
+    """关闭并清空全部共享客户端。"""
+    with _clients_lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception as error:
+                logger.debug("关闭 LLM 客户端失败: %s", error)
+        _clients.clear()
+
+
+atexit.register(close_all)
@@ -1,14 +1,46 @@
 import logging
-from typing import Any, Dict, List, Union
-
-from openai import OpenAI
-from httpx import Timeout
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from config import Config
+from utils.llm_cache import LLMResponseCache, get_cache
+from utils.llm_balancer import LEAST_OUTSTANDING, Backend, BackendPool, get_pool
+from utils.llm_retry import RetryPolicy
+from utils.llm_scheduler import estimate_request_tokens
+from utils.telemetry import CallRecord, get_telemetry, usage_fields
 from utils.text import optimize_text
+from utils.tokenizer import count_tokens
 
 logger = logging.getLogger(__name__)
 
+# 内置角色：规划、步骤分析、记忆压缩、题目摘要、JSON 修复
+LLM_ROLES = ("solve_agent", "analyzer", "compressor", "summarizer", "json_fixer")
+
+# 角色未单独配置时的回退链，最终回退到 solve_agent（pre_processor 为旧名称）
+ROLE_FALLBACKS: Dict[str, str] = {
+    "analyzer": "solve_agent",
+    "compressor": "solve_agent",
+    "summarizer": "solve_agent",
+    "json_fixer": "solve_agent",
+    "pre_processor": "summarizer",
+}
+
+
+def resolve_role(llm_config: Dict[str, Any], role: str) -> str:
+    """按回退链解析实际使用的角色配置名。
+
+    Args:
+        llm_config: config.json 中按角色划分的 llm 配置。
+        role: 请求的角色名。
+
+    Returns:
+        llm_config 中存在的角色名；整条回退链都不存在时返回最后一个候选。
+    """
+    resolved = role
+    while resolved not in llm_config and resolved in ROLE_FALLBACKS:
+        resolved = ROLE_FALLBACKS[resolved]
+    return resolved
+
 
 class EmbeddingResponse:
     """Embedding 响应的轻量封装。
@@ -26,51 +58,118 @@ class EmbeddingResponse:
         self.data = data
 
 
+class CompletionMessage:
+    """补全消息的轻量封装，字段与 OpenAI message 对象保持一致。"""
+
+    def __init__(self, content: str) -> None:
+        """初始化 CompletionMessage。
+
+        Args:
+            content: 消息文本。
+        """
+        self.content = content
+        self.tool_calls = None
+
+
+class CompletionChoice:
+    """补全候选项的轻量封装。"""
+
+    def __init__(self, content: str, finish_reason: Optional[str]) -> None:
+        """初始化 CompletionChoice。
+
+        Args:
+            content: 消息文本。
+            finish_reason: 结束原因。
+        """
+        self.message = CompletionMessage(content)
+        self.finish_reason = finish_reason
+
+
+class CompletionResponse:
+    """非原始补全结果（流式聚合等）的轻量封装。
+
+    保持 ``response.choices[0].message.content`` 的访问方式，
+    使调用方无需区分结果来源。
+    """
+
+    def __init__(
+        self,
+        content: str,
+        model: str = "",
+        finish_reason: Optional[str] = None,
+        usage: Any = None,
+    ) -> None:
+        """初始化 CompletionResponse。
+
+        Args:
+            content: 完整消息文本。
+            model: 实际响应的模型名。
+            finish_reason: 结束原因。
+            usage: token 用量对象（可能为空）。
+        """
+        self.choices = [CompletionChoice(content, finish_reason)]
+        self.model = model
+        self.usage = usage
+
+
 class LLMRequest:
     """LLM 请求封装器。
 
-    负责读取配置、初始化 OpenAI 客户端，并提供文本补全和向量化接口。
+    负责解析角色配置、组装请求参数与读写响应缓存，并提供文本补全和向量化接口。
+    角色可配置多个后端，请求通过 BackendPool 负载均衡并在故障时切换。
     """
 
     def __init__(self, model: str):
-        """初始化 LLMRequest 实例。
+        """初始化 LLMRequest 实例，解析角色配置并准备缓存、后端池与重试策略。
 
         Args:
-            model: 模型名或角色别名。
+            model: 角色名（solve_agent、analyzer、compressor、summarizer、json_fixer 等），
+                未单独配置的角色按 ROLE_FALLBACKS 回退。
 
         Raises:
             KeyError: 当配置缺少必需字段时抛出。
         """
         config: dict = Config.load_config()
 
-        model_alias = {
-            "analyzer": "solve_agent",
-            "pre_processor": "solve_agent",
-        }
-        resolved_model = model_alias.get(model, model)
-
         llm_config = config["llm"]
         if isinstance(llm_config, dict) and "model" in llm_config:
-            self.llm_config = llm_config
+            resolved_model = "default"
+            role_config: Any = llm_config
         else:
-            self.llm_config = llm_config[resolved_model]
+            resolved_model = resolve_role(llm_config, model)
+            role_config = llm_config[resolved_model]
+        backend_configs = role_config if isinstance(role_config, list) else [role_config]
 
-        self.client = OpenAI(
-            api_key=self.llm_config.get("api_key"),
-            base_url=self.llm_config.get("api_base"),
-            timeout=Timeout(120, connect=30),
+        balance_config = config.get("llm_balance", {})
+        strategy = (
+            balance_config.get("strategy", LEAST_OUTSTANDING)
+            if isinstance(balance_config, dict)
+            else LEAST_OUTSTANDING
         )
 
-    def text_completion(self, prompt: str, json_check: bool, **kwargs: Any) -> Any:
-        """发起文本补全请求。
+        self.role = model
+        self.pool: BackendPool = get_pool(resolved_model, backend_configs, strategy)
+        # 主后端配置，供缓存键等需要稳定模型名的场景使用
+        self.llm_config: Dict[str, Any] = self.pool.primary.config
+        self.cache: Optional[LLMResponseCache] = get_cache(config.get("llm_cache", {}))
+        self.retry_policy = RetryPolicy.from_config(config)
+        self.client = self.pool.primary.client
+
+    def _prepare_request(
+        self,
+        prompt: str,
+        json_check: bool,
+        kwargs: Dict[str, Any],
+    ) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+        """组装补全请求的模型名、消息与额外参数。
 
         Args:
             prompt: 用户提示词。
             json_check: 是否启用 JSON 输出约束。
-            kwargs: 透传给 OpenAI chat.completions.create 的额外参数。
+            kwargs: 调用方传入的额外参数。
 
         Returns:
-            OpenAI 原始响应对象。
+            (模型名, 消息列表, 请求参数)。
         """
         request_kwargs = dict(kwargs)
 
@@ -80,12 +179,239 @@ class LLMRequest:
         if json_check and not has_tools and "response_format" not in request_kwargs:
             request_kwargs["response_format"] = {"type": "json_object"}
 
-        response = self.client.chat.completions.create(
-            model=self.llm_config["model"],
-            messages=[{"role": "user", "content": optimize_text(prompt)}],
-            **request_kwargs,
+        messages = [{"role": "user", "content": optimize_text(prompt)}]
+        return self.llm_config["model"], messages, request_kwargs
+
+    def _cache_lookup(
+        self,
+        cache: bool,
+        model_name: str,
+        messages: List[Dict[str, Any]],
+        request_kwargs: Dict[str, Any],
+    ) -> Tuple[Optional[str], Optional[CompletionResponse]]:
+        """查询响应缓存。
+
+        Args:
+            cache: 调用方是否允许使用缓存。
+            model_name: 模型名。
+            messages: 消息列表。
+            request_kwargs: 请求参数。
+
+        Returns:
+            (缓存键, 命中的响应)；未启用缓存时缓存键为 None。
+        """
+        if not cache or self.cache is None:
+            return None, None
+
+        cache_key = LLMResponseCache.make_key(model_name, messages, request_kwargs)
+        cached_content = self.cache.get(cache_key)
+        if cached_content is None:
+            return cache_key, None
+
+        logger.debug("LLM 缓存命中: %s", cache_key[:12])
+        return cache_key, CompletionResponse(
+            cached_content,
+            model=model_name,
+            finish_reason="cache",
+        )
+
+    def _cache_store(self, cache_key: Optional[str], model_name: str, response: Any) -> None:
+        """将响应文本写入缓存。
+
+        Args:
+            cache_key: 缓存键，为 None 时不写入。
+            model_name: 模型名。
+            response: OpenAI 响应对象。
+        """
+        content = response.choices[0].message.content
+        if cache_key is not None and self.cache is not None and isinstance(content, str):
+            self.cache.put(cache_key, model_name, content)
+
+    def _record(
+        self,
+        started_at: float,
+        response: Any = None,
+        status: str = "ok",
+        kind: str = "chat",
+        ttft: Optional[float] = None,
+    ) -> None:
+        """记录一次调用的遥测数据。
+
+        Args:
+            started_at: 调用开始时间（单调时钟）。
+            response: 响应对象，失败时为 None。
+            status: 调用状态（ok、error、cache）。
+            kind: 调用类型（chat、stream、embedding）。
+            ttft: 流式调用的首 token 延迟（秒）。
+        """
+        model_name = getattr(response, "model", "") or self.llm_config["model"]
+        get_telemetry().record(
+            CallRecord(
+                role=self.role,
+                model=model_name,
+                kind=kind,
+                status=status,
+                latency=time.monotonic() - started_at,
+                ttft=ttft,
+                **usage_fields(getattr(response, "usage", None)),
+            )
+        )
+
+    def text_completion(
+        self,
+        prompt: str,
+        json_check: bool,
+        cache: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        """发起文本补全请求。
+
+        Args:
+            prompt: 用户提示词。
+            json_check: 是否启用 JSON 输出约束。
+            cache: 是否允许使用响应缓存（仅应用于确定性调用，需配置启用）。
+            kwargs: 透传给 OpenAI chat.completions.create 的额外参数。
+
+        Returns:
+            OpenAI 原始响应对象；命中缓存时为 CompletionResponse。
+        """
+        model_name, messages, request_kwargs = self._prepare_request(
+            prompt, json_check, kwargs
         )
+        cache_key, cached_response = self._cache_lookup(
+            cache, model_name, messages, request_kwargs
+        )
+        started_at = time.monotonic()
+        if cached_response is not None:
+            self._record(started_at, cached_response, status="cache")
+            return cached_response
+
+        estimated = estimate_request_tokens(prompt, request_kwargs.get("max_tokens"))
+
+        def create(backend: Backend) -> Any:
+            with backend.limiter.slot(estimated) as request_slot:
+                result = backend.client.chat.completions.create(
+                    model=backend.model,
+                    messages=messages,
+                    **request_kwargs,
+                )
+                request_slot.record_usage(getattr(result, "usage", None))
+            return result
+
+        try:
+            response = self.pool.call(create, self.retry_policy)
+        except Exception:
+            self._record(started_at, status="error")
+            raise
+        self._record(started_at, response)
         logger.debug("LLM Response Message: %s", response.choices[0].message.content)
+
+        self._cache_store(cache_key, model_name, response)
+        return response
+
+    def stream_completion(
+        self,
+        prompt: str,
+        on_delta: Optional[Callable[[str], None]] = None,
+        stop_marker: Optional[str] = None,
+        **kwargs: Any,
+    ) -> CompletionResponse:
+        """以流式方式发起文本补全请求。
+
+        边接收边回调增量文本；一旦出现 stop_marker 即关闭连接，
+        丢弃模型在其后继续生成的内容。
+
+        Args:
+            prompt: 用户提示词。
+            on_delta: 可选的增量文本回调。
+            stop_marker: 可选的截断标记，出现后立即停止读取。
+            kwargs: 透传给 OpenAI chat.completions.create 的额外参数。
+
+        Returns:
+            聚合后的 CompletionResponse 对象。
+        """
+        model_name, messages, request_kwargs = self._prepare_request(
+            prompt, False, kwargs
+        )
+        estimated = estimate_request_tokens(prompt, request_kwargs.get("max_tokens"))
+
+        def open_stream(backend: Backend) -> Tuple[Backend, Any, float]:
+            opened_at = time.monotonic()
+            backend.limiter.acquire(estimated)
+            try:
+                stream = backend.client.chat.completions.create(
+                    model=backend.model,
+                    messages=messages,
+                    stream=True,
+                    **request_kwargs,
+                )
+            except Exception:
+                backend.limiter.release(estimated)
+                raise
+            return backend, stream, opened_at
+
+        started_at = time.monotonic()
+        # 仅重试建立流的请求；读取中途失败时已有内容输出到界面，不再重放。
+        # 流读取完毕前后端仍计为在途，读完后才结束计数并计入延迟
+        try:
+            backend, stream, opened_at = self.pool.call(
+                open_stream, self.retry_policy, defer_end=True
+            )
+        except Exception:
+            self._record(started_at, status="error", kind="stream")
+            raise
+
+        content = ""
+        finish_reason: Optional[str] = None
+        usage = None
+        ttft: Optional[float] = None
+        try:
+            for chunk in stream:
+                model_name = getattr(chunk, "model", "") or model_name
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if not delta:
+                    continue
+
+                if ttft is None:
+                    ttft = time.monotonic() - started_at
+                scan_start = max(0, len(content) - len(stop_marker or ""))
+                content += delta
+                if on_delta is not None:
+                    on_delta(delta)
+
+                if stop_marker:
+                    marker_index = content.find(stop_marker, scan_start)
+                    if marker_index != -1:
+                        content = content[: marker_index + len(stop_marker)]
+                        finish_reason = "stop_marker"
+                        break
+        except Exception:
+            self._record(started_at, status="error", kind="stream", ttft=ttft)
+            raise
+        finally:
+            stream.close()
+            backend.end(opened_at)
+            total_tokens = getattr(usage, "total_tokens", None)
+            backend.limiter.release(
+                estimated,
+                total_tokens if isinstance(total_tokens, int) else None,
+            )
+
+        response = CompletionResponse(
+            content,
+            model=model_name,
+            finish_reason=finish_reason,
+            usage=usage,
+        )
+        self._record(started_at, response, kind="stream", ttft=ttft)
+        logger.debug("LLM Stream Message: %s", content)
         return response
 
     def embedding(self, text: Union[str, List[str]], **kwargs: Any) -> EmbeddingResponse:
@@ -101,11 +427,23 @@ class LLMRequest:
         if isinstance(text, str):
             text = [text]
 
-        response = self.client.embeddings.create(
-            model=self.llm_config["model"],
-            input=text,
-            **kwargs,
-        )
+        estimated = sum(count_tokens(item) for item in text)
+
+        def create(backend: Backend) -> Any:
+            with backend.limiter.slot(estimated):
+                return backend.client.embeddings.create(
+                    model=backend.model,
+                    input=text,
+                    **kwargs,
+                )
+
+        started_at = time.monotonic()
+        try:
+            response = self.pool.call(create, self.retry_policy)
+        except Exception:
+            self._record(started_at, status="error", kind="embedding")
+            raise
+        self._record(started_at, response, kind="embedding")
 
         data = [{"embedding": item.embedding} for item in response.data]
         return EmbeddingResponse(data)
@@ -0,0 +1,412 @@
+"""LLM 调用的统一重试策略。
+
+- 按错误类型分类：限流（429）、服务端错误（5xx）、网络/超时等瞬时错误、不可重试错误
+- 优先遵循服务端返回的 Retry-After，否则使用带抖动的指数退避
+- 每个端点一个熔断器：连续失败达到阈值后短路一段时间，避免对故障端点持续施压
+- 失败按类型计数，可通过 get_retry_metrics() 读取
+"""
+
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import openai
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT = "rate_limit"
+SERVER_ERROR = "server_error"
+TRANSIENT = "transient"
+FATAL = "fatal"
+PARSE_ERROR = "parse_error"
+
+RETRYABLE_KINDS = {RATE_LIMIT, SERVER_ERROR, TRANSIENT}
+
+DEFAULT_RETRY_CONFIG: Dict[str, Any] = {
+    "max_attempts": 5,
+    "base_delay": 1.0,
+    "max_delay": 60.0,
+    "breaker_threshold": 5,
+    "breaker_cooldown": 30.0,
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """端点熔断中，请求被直接拒绝。"""
+
+    def __init__(self, endpoint: str, retry_in: float) -> None:
+        """初始化熔断异常。
+
+        Args:
+            endpoint: 熔断的端点名。
+            retry_in: 距离熔断恢复的秒数。
+        """
+        super().__init__(f"LLM 端点 {endpoint} 熔断中，{retry_in:.0f} 秒后重试")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+_metrics: Dict[str, int] = {}
+_metrics_lock = threading.Lock()
+
+
+def record_failure(kind: str) -> None:
+    """累加一次指定类型的失败计数。
+
+    Args:
+        kind: 失败类型。
+    """
+    with _metrics_lock:
+        _metrics[kind] = _metrics.get(kind, 0) + 1
+
+
+def get_retry_metrics() -> Dict[str, int]:
+    """读取失败计数快照。
+
+    Returns:
+        失败类型到次数的映射（含 retries 与 circuit_open）。
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+# 失败计数的展示名称
+FAILURE_LABELS: Dict[str, str] = {
+    RATE_LIMIT: "限流",
+    SERVER_ERROR: "服务端错误",
+    TRANSIENT: "网络/超时",
+    FATAL: "不可重试错误",
+    PARSE_ERROR: "输出格式错误",
+    "retries": "重试",
+    "failovers": "切换端点",
+    "circuit_open": "熔断拒绝",
+}
+
+
+def diff_retry_metrics(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    """计算两次失败计数快照之间的增量。
+
+    Args:
+        before: 较早的快照。
+        after: 较晚的快照。
+
+    Returns:
+        增量大于 0 的失败类型到次数的映射。
+    """
+    return {
+        kind: count - before.get(kind, 0)
+        for kind, count in after.items()
+        if count - before.get(kind, 0) > 0
+    }
+
+
+def format_retry_metrics(metrics: Dict[str, int]) -> str:
+    """将失败计数格式化为单行文本。
+
+    Args:
+        metrics: 失败类型到次数的映射。
+
+    Returns:
+        形如 ``限流 2、重试 3`` 的文本，无数据时为空字符串。
+    """
+    return "、".join(
+        f"{FAILURE_LABELS.get(kind, kind)} {count}"
+        for kind, count in sorted(metrics.items())
+    )
+
+
+def classify_error(error: BaseException) -> str:
+    """将异常归类为重试策略可识别的类型。
+
+    Args:
+        error: 捕获到的异常。
+
+    Returns:
+        错误类型常量。
+    """
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMIT
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return TRANSIENT
+    if isinstance(error, openai.APIStatusError):
+        status_code = getattr(error, "status_code", 0) or 0
+        if status_code == 429:
+            return RATE_LIMIT
+        if status_code >= 500:
+            return SERVER_ERROR
+        if status_code in (408, 409):
+            return TRANSIENT
+    return FATAL
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """从错误响应头中解析服务端建议的重试等待时间。
+
+    支持 retry-after-ms、retry-after（秒数或 HTTP 日期）。
+
+    Args:
+        error: 捕获到的异常。
+
+    Returns:
+        建议等待秒数；未提供时返回 None。
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return max(0.0, float(retry_ms) / 1000.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        parsed = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器。"""
+
+    def __init__(self, endpoint: str, threshold: int, cooldown: float) -> None:
+        """初始化熔断器。
+
+        Args:
+            endpoint: 端点名。
+            threshold: 触发熔断的连续失败次数，<=0 表示禁用。
+            cooldown: 熔断持续时间（秒）。
+        """
+        self.endpoint = endpoint
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """请求前检查熔断状态。
+
+        熔断期满后进入半开状态，放行请求试探端点是否恢复。
+
+        Raises:
+            CircuitOpenError: 仍处于熔断期时抛出。
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0:
+                record_failure("circuit_open")
+                raise CircuitOpenError(self.endpoint, remaining)
+
+    @property
+    def is_open(self) -> bool:
+        """当前是否处于熔断期。"""
+        with self._lock:
+            return (
+                self.opened_at is not None
+                and time.monotonic() < self.opened_at + self.cooldown
+            )
+
+    def record_success(self) -> None:
+        """记录一次成功，关闭熔断。"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        """记录一次可重试失败，达到阈值后打开熔断。"""
+        with self._lock:
+            self.failures += 1
+            if self.threshold > 0 and self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        "LLM 端点 %s 连续失败 %d 次，熔断 %.0f 秒",
+                        self.endpoint,
+                        self.failures,
+                        self.cooldown,
+                    )
+                self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """带抖动指数退避与 Retry-After 支持的重试策略。"""
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ) -> None:
+        """初始化重试策略。
+
+        Args:
+            max_attempts: 最大尝试次数（含首次）。
+            base_delay: 退避基准时长（秒）。
+            max_delay: 单次等待上限（秒）。
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> "RetryPolicy":
+        """根据 llm_retry 配置创建重试策略。
+
+        Args:
+            config: 全局配置字典，缺省时从配置文件读取。
+
+        Returns:
+            RetryPolicy 实例。
+        """
+        retry_config = load_retry_config(config)
+        return cls(
+            max_attempts=int(retry_config["max_attempts"]),
+            base_delay=float(retry_config["base_delay"]),
+            max_delay=float(retry_config["max_delay"]),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """计算第 attempt 次失败后的退避时长（指数增长，随机落在上限的 50%~100%）。
+
+        Args:
+            attempt: 已失败次数（从 0 开始）。
+
+        Returns:
+            等待秒数。
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def delay_for(self, attempt: int, error: BaseException) -> float:
+        """计算异常后的等待时长，优先使用 Retry-After。
+
+        Args:
+            attempt: 已失败次数（从 0 开始）。
+            error: 捕获到的异常。
+
+        Returns:
+            等待秒数。
+        """
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            return min(self.max_delay, hinted)
+        return self.backoff(attempt)
+
+    def handle_error(
+        self,
+        attempt: int,
+        error: BaseException,
+        breaker: Optional[CircuitBreaker],
+        can_failover: bool = False,
+    ) -> float:
+        """记录失败并决定是否继续重试。
+
+        Args:
+            attempt: 已失败次数（从 0 开始）。
+            error: 捕获到的异常。
+            breaker: 出错端点的熔断器。
+            can_failover: 是否还有其他可用端点可立即切换。
+
+        Returns:
+            下次重试前的等待秒数（切换端点时为 0）。
+
+        Raises:
+            BaseException: 不可重试或已达最大次数时重新抛出原异常。
+        """
+        kind = classify_error(error)
+        record_failure(kind)
+        if kind not in RETRYABLE_KINDS:
+            raise error
+        if breaker is not None:
+            breaker.record_failure()
+        if attempt + 1 >= self.max_attempts:
+            raise error
+
+        if can_failover:
+            record_failure("failovers")
+            logger.warning("LLM 请求失败（%s），切换到其他端点: %s", kind, error)
+            return 0.0
+        if breaker is not None and breaker.is_open:
+            raise error
+
+        delay = self.delay_for(attempt, error)
+        record_failure("retries")
+        logger.warning(
+            "LLM 请求失败（%s），%.1f 秒后第 %d 次重试: %s",
+            kind,
+            delay,
+            attempt + 1,
+            error,
+        )
+        return delay
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def load_retry_config(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """读取 llm_retry 配置，缺失项使用默认值。
+
+    Args:
+        config: 全局配置字典，缺省时从配置文件读取。
+
+    Returns:
+        合并默认值后的重试配置。
+    """
+    retry_config = dict(DEFAULT_RETRY_CONFIG)
+    if config is None:
+        try:
+            config = Config.load_config()
+        except ValueError:
+            config = {}
+    user_config = config.get("llm_retry", {})
+    if isinstance(user_config, dict):
+        retry_config.update(user_config)
+    return retry_config
+
+
+def get_breaker(endpoint: Optional[str], key: Optional[str] = None) -> CircuitBreaker:
+    """获取（必要时创建）共享熔断器。
+
+    Args:
+        endpoint: 接口地址。
+        key: 熔断器标识，缺省为接口地址；同一地址下的不同模型或密钥需要各自熔断时传入。
+
+    Returns:
+        CircuitBreaker 实例。
+    """
+    name = key or endpoint or ""
+    breaker = _breakers.get(name)
+    if breaker is not None:
+        return breaker
+
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            retry_config = load_retry_config()
+            breaker = CircuitBreaker(
+                endpoint=name,
+                threshold=int(retry_config["breaker_threshold"]),
+                cooldown=float(retry_config["breaker_cooldown"]),
+            )
+            _breakers[name] = breaker
+    return breaker
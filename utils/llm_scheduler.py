@@ -0,0 +1,264 @@
+"""LLM 请求并发与速率调度。
+
+按接口地址（api_base）为每个端点维护一个限流器，同时约束：
+- 并发请求数（max_concurrency）
+- 每分钟请求数（rpm）
+- 每分钟 token 数（tpm）
+
+限流器基于线程锁实现，进程内所有 LLMRequest（包括后台记忆压缩线程与批量并发解题）
+共享同一份额度，因此并发调用不会突破服务商的速率限制。
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from config import Config
+from utils.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS: Dict[str, Any] = {
+    "max_concurrency": 8,
+    "rpm": 0,
+    "tpm": 0,
+}
+
+
+class TokenBucket:
+    """按分钟额度匀速补充的令牌桶。"""
+
+    def __init__(self, per_minute: float) -> None:
+        """初始化令牌桶。
+
+        Args:
+            per_minute: 每分钟额度，<=0 表示不限制。
+        """
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.refill_rate = float(per_minute) / 60.0
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        """是否不限制。"""
+        return self.capacity <= 0
+
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌。"""
+        elapsed = now - self.updated_at
+        self.level = min(self.capacity, self.level + elapsed * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """计算获取 cost 个令牌还需等待的秒数。
+
+        Args:
+            cost: 需要的令牌数（超过容量时按容量计）。
+            now: 当前单调时钟时间。
+
+        Returns:
+            需要等待的秒数，0 表示可立即获取。
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        if self.level >= cost:
+            return 0.0
+        return (cost - self.level) / self.refill_rate
+
+    def consume(self, cost: float) -> None:
+        """扣除令牌（允许为负，用于事后按实际用量修正）。"""
+        if not self.unlimited:
+            self.level -= min(cost, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """归还多预扣的令牌。"""
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class EndpointLimiter:
+    """单个端点的并发与速率限流器。"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        rpm: float = 0,
+        tpm: float = 0,
+    ) -> None:
+        """初始化限流器。
+
+        Args:
+            name: 端点名（通常为 api_base）。
+            max_concurrency: 最大并发请求数，<=0 表示不限制。
+            rpm: 每分钟请求数上限，<=0 表示不限制。
+            tpm: 每分钟 token 数上限，<=0 表示不限制。
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def _try_acquire(self, estimated_tokens: int) -> float:
+        """尝试获取一个请求额度（需持锁调用）。
+
+        Args:
+            estimated_tokens: 预估 token 用量。
+
+        Returns:
+            0 表示获取成功；正数表示速率受限需等待的秒数；
+            负数表示并发已满需等待释放。
+        """
+        if self.max_concurrency > 0 and self.in_flight >= self.max_concurrency:
+            return -1.0
+
+        now = time.monotonic()
+        wait = max(
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+        if wait > 0:
+            return wait
+
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self, estimated_tokens: int = 0) -> None:
+        """阻塞直到获得请求额度。
+
+        Args:
+            estimated_tokens: 预估 token 用量。
+        """
+        with self._lock:
+            while True:
+                wait = self._try_acquire(estimated_tokens)
+                if wait == 0:
+                    return
+                if wait > 0:
+                    logger.debug("LLM 端点 %s 速率受限，等待 %.2f 秒", self.name, wait)
+                self._released.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None) -> None:
+        """释放并发槽位，并按实际用量修正 token 额度。
+
+        Args:
+            estimated_tokens: 获取时预估的 token 用量。
+            actual_tokens: 实际 token 用量，未知时不修正。
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if actual_tokens is not None:
+                difference = estimated_tokens - actual_tokens
+                if difference > 0:
+                    self.tokens.refund(difference)
+                else:
+                    self.tokens.consume(-difference)
+            self._released.notify()
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0) -> Iterator["RequestSlot"]:
+        """同步上下文管理器：获取额度并在退出时释放。
+
+        Args:
+            estimated_tokens: 预估 token 用量。
+
+        Yields:
+            RequestSlot 对象，可写入实际用量。
+        """
+        self.acquire(estimated_tokens)
+        request_slot = RequestSlot()
+        try:
+            yield request_slot
+        finally:
+            self.release(estimated_tokens, request_slot.actual_tokens)
+
+
+class RequestSlot:
+    """一次请求占用的额度句柄，用于回填实际 token 用量。"""
+
+    def __init__(self) -> None:
+        """初始化额度句柄。"""
+        self.actual_tokens: Optional[int] = None
+
+    def record_usage(self, usage: Any) -> None:
+        """根据响应 usage 回填实际 token 用量。
+
+        Args:
+            usage: OpenAI 响应中的 usage 对象。
+        """
+        total = getattr(usage, "total_tokens", None)
+        if isinstance(total, int):
+            self.actual_tokens = total
+
+
+_limiters: Dict[str, EndpointLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits_for(endpoint: str) -> Dict[str, Any]:
+    """读取指定端点的限流配置（端点配置覆盖 default）。"""
+    limits = dict(DEFAULT_LIMITS)
+    try:
+        limits_config = Config.load_config().get("llm_limits", {})
+    except ValueError:
+        limits_config = {}
+    if isinstance(limits_config, dict):
+        for key in ("default", endpoint):
+            section = limits_config.get(key)
+            if isinstance(section, dict):
+                limits.update(section)
+    return limits
+
+
+def get_limiter(endpoint: Optional[str], key: Optional[str] = None) -> EndpointLimiter:
+    """获取（必要时创建）共享限流器。
+
+    Args:
+        endpoint: 接口地址，用于查找 llm_limits 配置。
+        key: 限流器标识，缺省为接口地址；同一地址下不同模型或密钥的额度
+            相互独立时传入区分它们的标识。
+
+    Returns:
+        EndpointLimiter 实例。
+    """
+    name = key or endpoint or ""
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        return limiter
+
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limits = _limits_for(endpoint or "")
+            limiter = EndpointLimiter(
+                name=name,
+                max_concurrency=int(limits["max_concurrency"]),
+                rpm=float(limits["rpm"]),
+                tpm=float(limits["tpm"]),
+            )
+            _limiters[name] = limiter
+    return limiter
+
+
+def estimate_request_tokens(prompt: str, max_tokens: Any = None) -> int:
+    """粗略预估一次请求的 token 用量，用于 TPM 预扣。
+
+    Args:
+        prompt: 提示词文本。
+        max_tokens: 请求的最大输出 token 数。
+
+    Returns:
+        预估 token 数。
+    """
+    completion_budget = max_tokens if isinstance(max_tokens, int) else 1024
+    return count_tokens(prompt) + completion_budget
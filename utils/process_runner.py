@@ -0,0 +1,387 @@
+"""流式子进程执行模块。
+
+stdout/stderr 由读取线程按块读入有字节上限的环形缓冲区，执行过程中的输出
+实时转发给当前上下文注册的监听器；超时或输出总量超过上限时结束整个进程组。
+可选地为子进程设置 rlimit 或放入 cgroup v2 子组，并通过 os.wait4 统计资源用量。
+"""
+
+import codecs
+import contextlib
+import contextvars
+import logging
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from utils.resource_governor import (
+    CgroupManager,
+    ResourceLimits,
+    make_preexec,
+    rusage_to_dict,
+)
+
+logger = logging.getLogger(__name__)
+
+_READ_CHUNK = 65536
+# 主进程退出后等待管道关闭的秒数
+_EXIT_GRACE = 1.0
+
+# 当前执行上下文的实时输出监听器，由工具执行方注册
+_output_listener: contextvars.ContextVar[Optional[Callable[[str], None]]] = (
+    contextvars.ContextVar("output_listener", default=None)
+)
+
+
+@contextlib.contextmanager
+def output_listener(callback: Optional[Callable[[str], None]]) -> Iterator[None]:
+    """在上下文内注册实时输出监听器。
+
+    Args:
+        callback: 接收输出片段的回调，None 表示不转发。
+    """
+    token = _output_listener.set(callback)
+    try:
+        yield
+    finally:
+        _output_listener.reset(token)
+
+
+def current_output_listener() -> Optional[Callable[[str], None]]:
+    """返回当前上下文注册的实时输出监听器。"""
+    return _output_listener.get()
+
+
+class RingBuffer:
+    """保留最近写入内容的字节环形缓冲区。"""
+
+    def __init__(self, capacity: int) -> None:
+        """初始化缓冲区。
+
+        Args:
+            capacity: 最多保留的字节数。
+        """
+        self.capacity = max(1, capacity)
+        self._chunks: Deque[bytes] = deque()
+        self._size = 0
+        self.dropped = 0
+
+    def write(self, data: bytes) -> None:
+        """写入数据，超出容量时丢弃最早的字节。
+
+        Args:
+            data: 新数据。
+        """
+        if len(data) >= self.capacity:
+            self.dropped += self._size + len(data) - self.capacity
+            self._chunks = deque([data[-self.capacity:]])
+            self._size = self.capacity
+            return
+
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size > self.capacity:
+            overflow = self._size - self.capacity
+            head = self._chunks[0]
+            if len(head) <= overflow:
+                self._chunks.popleft()
+                self._size -= len(head)
+                self.dropped += len(head)
+            else:
+                self._chunks[0] = head[overflow:]
+                self._size -= overflow
+                self.dropped += overflow
+
+    def getvalue(self) -> bytes:
+        """返回当前保留的全部字节。"""
+        return b"".join(self._chunks)
+
+
+class ProcessResult:
+    """流式执行结果。"""
+
+    __slots__ = (
+        "returncode",
+        "stdout",
+        "stderr",
+        "timed_out",
+        "truncated",
+        "dropped",
+        "usage",
+    )
+
+    def __init__(
+        self,
+        returncode: Optional[int],
+        stdout: str,
+        stderr: str,
+        timed_out: bool = False,
+        truncated: bool = False,
+        dropped: int = 0,
+        usage: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """初始化执行结果。
+
+        Args:
+            returncode: 退出码，被强制结束时为负的信号值或 None。
+            stdout: 保留的标准输出。
+            stderr: 保留的标准错误。
+            timed_out: 是否因超时被结束。
+            truncated: 是否因输出超过上限被结束。
+            dropped: 环形缓冲区丢弃的最早字节数。
+            usage: 资源用量（rusage 与 cgroup 统计），不可用时为 None。
+        """
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.truncated = truncated
+        self.dropped = dropped
+        self.usage = usage
+
+
+class _ExitWatcher:
+    """以 os.wait4 回收子进程，同时取得其资源用量（平台不支持时退回 Popen.poll）。"""
+
+    def __init__(self, process: "subprocess.Popen[bytes]") -> None:
+        """初始化。
+
+        Args:
+            process: 被监视的子进程。
+        """
+        self.process = process
+        self.returncode: Optional[int] = None
+        self.usage: Optional[Dict[str, float]] = None
+
+    def poll(self) -> Optional[int]:
+        """非阻塞检查子进程是否已退出。
+
+        Returns:
+            退出码，仍在运行时返回 None。
+        """
+        if self.returncode is not None:
+            return self.returncode
+        if not hasattr(os, "wait4"):
+            self.returncode = self.process.poll()
+            return self.returncode
+        try:
+            pid, status, rusage = os.wait4(self.process.pid, os.WNOHANG)
+        except ChildProcessError:
+            self.returncode = self.process.poll()
+            return self.returncode
+        if pid == 0:
+            return None
+        self.returncode = os.waitstatus_to_exitcode(status)
+        self.usage = rusage_to_dict(rusage)
+        self.process.returncode = self.returncode
+        return self.returncode
+
+    def wait(self, timeout: float) -> Optional[int]:
+        """等待子进程退出。
+
+        Args:
+            timeout: 最长等待秒数。
+
+        Returns:
+            退出码，超时仍未退出时返回 None。
+        """
+        deadline = time.monotonic() + timeout
+        while self.poll() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.returncode
+
+
+def _popen_group_kwargs() -> Dict[str, Any]:
+    """返回让子进程成为新进程组组长的 Popen 参数。"""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_group(process: "subprocess.Popen[bytes]") -> None:
+    """结束子进程及其所在进程组。
+
+    Args:
+        process: 以新进程组启动的子进程。
+    """
+    if process.poll() is not None and os.name == "nt":
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                capture_output=True,
+                check=False,
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError) as error:
+        logger.debug("结束进程组 %s 失败: %s", process.pid, error)
+        with contextlib.suppress(OSError):
+            process.kill()
+
+
+def _reader(stream: Any, name: str, chunks: "queue.Queue[Tuple[str, Optional[bytes]]]") -> None:
+    """读取线程：按块读取管道并放入队列，读到 EOF 时放入 None。"""
+    try:
+        while True:
+            data = stream.read1(_READ_CHUNK) if hasattr(stream, "read1") else stream.read(_READ_CHUNK)
+            if not data:
+                break
+            chunks.put((name, data))
+    except (OSError, ValueError):
+        pass
+    finally:
+        chunks.put((name, None))
+
+
+def run_streaming(
+    args: List[str],
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    buffer_bytes: int = 1 << 20,
+    max_output_bytes: int = 64 << 20,
+    listener: Optional[Callable[[str], None]] = None,
+    limits: Optional[ResourceLimits] = None,
+    cgroup: Optional[CgroupManager] = None,
+    **popen_kwargs: Any,
+) -> ProcessResult:
+    """流式执行命令。
+
+    Args:
+        args: 命令参数列表。
+        cwd: 工作目录。
+        env: 环境变量。
+        timeout: 超时秒数，None 表示不限。
+        buffer_bytes: stdout、stderr 各自最多保留的字节数。
+        max_output_bytes: 输出总字节数上限，超过后结束进程组，0 表示不限。
+        listener: 实时输出回调，缺省使用当前上下文注册的监听器。
+        limits: 子进程的 rlimit 限制。
+        cgroup: 可选的 cgroup v2 管理器，命令在独立子组中运行。
+        popen_kwargs: 透传给 Popen 的其他参数。
+
+    Returns:
+        ProcessResult 执行结果。
+
+    Raises:
+        OSError: 子进程启动失败时抛出。
+    """
+    if listener is None:
+        listener = current_output_listener()
+
+    slot = cgroup.create() if cgroup is not None else None
+    preexec = make_preexec(limits, slot) if os.name == "posix" else None
+    if preexec is not None:
+        popen_kwargs["preexec_fn"] = preexec
+    try:
+        process = subprocess.Popen(
+            args,
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **_popen_group_kwargs(),
+            **popen_kwargs,
+        )
+    except BaseException:
+        if slot is not None:
+            slot.remove()
+        raise
+    watcher = _ExitWatcher(process)
+
+    chunks: "queue.Queue[Tuple[str, Optional[bytes]]]" = queue.Queue()
+    buffers = {"stdout": RingBuffer(buffer_bytes), "stderr": RingBuffer(buffer_bytes)}
+    decoders = {
+        name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in buffers
+    }
+    readers = [
+        threading.Thread(target=_reader, args=(stream, name, chunks), daemon=True)
+        for stream, name in ((process.stdout, "stdout"), (process.stderr, "stderr"))
+    ]
+    for reader in readers:
+        reader.start()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    open_streams = 2
+    total = 0
+    timed_out = False
+    truncated = False
+    exited_at: Optional[float] = None
+
+    while open_streams:
+        wait = 0.5 if deadline is None else deadline - time.monotonic()
+        if deadline is not None and wait <= 0:
+            timed_out = True
+            break
+        try:
+            name, data = chunks.get(timeout=min(wait, 0.5))
+        except queue.Empty:
+            # 主进程已退出但后台子进程仍占用管道时，稍候即停止读取
+            if exited_at is None and watcher.poll() is not None:
+                exited_at = time.monotonic()
+            elif exited_at is not None and time.monotonic() - exited_at > _EXIT_GRACE:
+                break
+            continue
+        if data is None:
+            open_streams -= 1
+            continue
+
+        buffers[name].write(data)
+        total += len(data)
+        if listener is not None:
+            text = decoders[name].decode(data)
+            if text:
+                try:
+                    listener(text)
+                except Exception as error:
+                    logger.debug("实时输出回调失败: %s", error)
+                    listener = None
+        if max_output_bytes > 0 and total > max_output_bytes:
+            truncated = True
+            break
+
+    if timed_out or truncated or open_streams:
+        kill_process_group(process)
+        if slot is not None:
+            # 结束脱离进程组（如 setsid）但仍在子组内的后代进程
+            slot.kill()
+    returncode = watcher.wait(5)
+    if returncode is None:
+        process.kill()
+        returncode = watcher.wait(1)
+
+    # 结束后把队列中剩余的数据收进缓冲区（读取线程在管道关闭后退出）
+    for reader in readers:
+        reader.join(timeout=1)
+    while True:
+        try:
+            name, data = chunks.get_nowait()
+        except queue.Empty:
+            break
+        if data is not None and not truncated:
+            buffers[name].write(data)
+
+    for stream in (process.stdout, process.stderr):
+        with contextlib.suppress(OSError):
+            stream.close()  # type: ignore[union-attr]
+
+    usage = watcher.usage
+    if slot is not None:
+        usage = dict(usage or {}, **slot.usage())
+        slot.remove()
+
+    return ProcessResult(
+        returncode=returncode,
+        stdout=buffers["stdout"].getvalue().decode("utf-8", errors="replace"),
+        stderr=buffers["stderr"].getvalue().decode("utf-8", errors="replace"),
+        timed_out=timed_out,
+        truncated=truncated,
+        dropped=buffers["stdout"].dropped + buffers["stderr"].dropped,
+        usage=usage,
+    )
@@ -0,0 +1,317 @@
+"""子进程资源限制与用量统计。
+
+通过 preexec 钩子中的 resource.setrlimit 为每条命令设置 CPU 时间、地址空间、
+打开文件数、进程数与写入文件大小上限；系统提供可写的 cgroup v2 层级时，
+还可把命令放入独立的 cgroup，按整棵进程树限制内存与进程数并在结束时一并清理。
+仅在 POSIX 平台生效，其他平台上各项限制自动忽略。
+"""
+
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+# CPU 硬限制比软限制多出的秒数：软限制先发送 SIGXCPU，进程忽略该信号时由硬限制 SIGKILL 结束
+_CPU_HARD_MARGIN = 5
+
+
+@dataclass
+class ResourceLimits:
+    """单条命令的 rlimit 配置，0 表示不限制。"""
+
+    cpu_seconds: int = 0
+    memory_mb: int = 0
+    open_files: int = 0
+    processes: int = 0
+    file_size_mb: int = 0
+
+    @classmethod
+    def from_config(cls, config: Any) -> "ResourceLimits":
+        """从 limits 配置创建，忽略非法取值。
+
+        Args:
+            config: limits 配置字典。
+
+        Returns:
+            ResourceLimits 实例。
+        """
+        if not isinstance(config, dict):
+            return cls()
+        values = {
+            name: config.get(name, 0)
+            for name in ("cpu_seconds", "memory_mb", "open_files", "processes", "file_size_mb")
+        }
+        return cls(**{
+            name: value if isinstance(value, int) and value > 0 else 0
+            for name, value in values.items()
+        })
+
+    def rlimits(self) -> List[Tuple[int, int, Optional[int]]]:
+        """返回需要设置的 (资源, 软限制, 硬限制) 列表，平台不支持时为空。
+
+        命令由模型生成，软限制可被命令自身的 ulimit 调高，因此同时设置硬限制；
+        仅地址空间只设软限制（硬限制为 None 表示保留原值），便于个别程序按需放宽。
+        """
+        if resource is None:
+            return []
+        candidates = (
+            ("RLIMIT_CPU", self.cpu_seconds, self.cpu_seconds + _CPU_HARD_MARGIN),
+            ("RLIMIT_AS", self.memory_mb * _MB, None),
+            ("RLIMIT_NOFILE", self.open_files, self.open_files),
+            ("RLIMIT_NPROC", self.processes, self.processes),
+            ("RLIMIT_FSIZE", self.file_size_mb * _MB, self.file_size_mb * _MB),
+        )
+        return [
+            (getattr(resource, name), soft, hard)
+            for name, soft, hard in candidates
+            if soft > 0 and hasattr(resource, name)
+        ]
+
+
+class CgroupSlot:
+    """一条命令独占的 cgroup v2 子组。"""
+
+    def __init__(self, path: str) -> None:
+        """初始化子组。
+
+        Args:
+            path: 已创建的子组目录。
+        """
+        self.path = path
+
+    def join(self) -> None:
+        """把当前进程移入子组（在子进程的 preexec 钩子中调用）。"""
+        with open(os.path.join(self.path, "cgroup.procs"), "w") as file:
+            file.write("0")
+
+    def kill(self) -> bool:
+        """结束子组内的全部进程（需要内核支持 cgroup.kill）。
+
+        Returns:
+            是否成功发出结束请求。
+        """
+        try:
+            with open(os.path.join(self.path, "cgroup.kill"), "w") as file:
+                file.write("1")
+            return True
+        except OSError:
+            return False
+
+    def usage(self) -> Dict[str, float]:
+        """读取子组的 CPU 与内存峰值用量。
+
+        Returns:
+            包含 cgroup_cpu_seconds、cgroup_memory_peak_mb 的字典（读取失败的项缺省）。
+        """
+        usage: Dict[str, float] = {}
+        try:
+            with open(os.path.join(self.path, "cpu.stat"), "r") as file:
+                for line in file:
+                    key, _, value = line.partition(" ")
+                    if key == "usage_usec":
+                        usage["cgroup_cpu_seconds"] = int(value) / 1e6
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(os.path.join(self.path, "memory.peak"), "r") as file:
+                usage["cgroup_memory_peak_mb"] = int(file.read().strip()) / _MB
+        except (OSError, ValueError):
+            pass
+        return usage
+
+    def remove(self) -> None:
+        """删除子组目录（组内进程退出后才能删除，被结束的进程可能稍后才退出）。"""
+        for attempt in range(20):
+            try:
+                os.rmdir(self.path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError as error:
+                if attempt == 19:
+                    logger.debug("删除 cgroup %s 失败: %s", self.path, error)
+                    return
+                time.sleep(0.05)
+
+
+class CgroupManager:
+    """在指定的 cgroup v2 目录下为每条命令创建子组。"""
+
+    def __init__(
+        self,
+        root: str,
+        memory_max_mb: int = 0,
+        pids_max: int = 0,
+        cpu_max: str = "",
+    ) -> None:
+        """初始化并检查 cgroup v2 是否可用。
+
+        Args:
+            root: 父 cgroup 目录（需可写，如 /sys/fs/cgroup/buuctf_agent）。
+            memory_max_mb: 每条命令的内存上限（MB），0 表示不限。
+            pids_max: 每条命令的进程数上限，0 表示不限。
+            cpu_max: 写入 cpu.max 的配额，如 "100000 100000" 表示最多一个核。
+        """
+        self.root = root
+        self.memory_max_mb = memory_max_mb
+        self.pids_max = pids_max
+        self.cpu_max = cpu_max
+        self.available = self._prepare()
+
+    def _prepare(self) -> bool:
+        """创建父目录并开启所需控制器。"""
+        parent = os.path.dirname(self.root.rstrip("/"))
+        if not os.path.isfile(os.path.join(parent, "cgroup.controllers")):
+            logger.warning("未检测到 cgroup v2 层级，忽略 cgroup 资源限制: %s", parent)
+            return False
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            controllers = []
+            if self.memory_max_mb:
+                controllers.append("+memory")
+            if self.pids_max:
+                controllers.append("+pids")
+            if self.cpu_max:
+                controllers.append("+cpu")
+            if controllers:
+                with open(os.path.join(self.root, "cgroup.subtree_control"), "w") as file:
+                    file.write(" ".join(controllers))
+        except OSError as error:
+            logger.warning("初始化 cgroup %s 失败，忽略 cgroup 资源限制: %s", self.root, error)
+            return False
+        return True
+
+    def create(self) -> Optional[CgroupSlot]:
+        """为一条命令创建子组并写入限制。
+
+        Returns:
+            CgroupSlot 实例；cgroup 不可用或创建失败时返回 None。
+        """
+        if not self.available:
+            return None
+        path = os.path.join(self.root, f"cmd-{uuid.uuid4().hex[:12]}")
+        try:
+            os.mkdir(path)
+            settings = (
+                ("memory.max", self.memory_max_mb * _MB if self.memory_max_mb else 0),
+                ("pids.max", self.pids_max),
+                ("cpu.max", self.cpu_max),
+            )
+            for name, value in settings:
+                if value:
+                    with open(os.path.join(path, name), "w") as file:
+                        file.write(str(value))
+        except OSError as error:
+            logger.warning("创建 cgroup 子组失败: %s", error)
+            CgroupSlot(path).remove()
+            return None
+        return CgroupSlot(path)
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["CgroupManager"]:
+        """从 cgroup 配置创建，未启用或平台不支持时返回 None。
+
+        Args:
+            config: cgroup 配置字典。
+
+        Returns:
+            CgroupManager 实例或 None。
+        """
+        if not isinstance(config, dict) or not config.get("enabled", False):
+            return None
+        if os.name != "posix":
+            return None
+        return cls(
+            root=str(config.get("root", "/sys/fs/cgroup/buuctf_agent")),
+            memory_max_mb=int(config.get("memory_max_mb", 0) or 0),
+            pids_max=int(config.get("pids_max", 0) or 0),
+            cpu_max=str(config.get("cpu_max", "") or ""),
+        )
+
+
+def make_preexec(
+    limits: Optional[ResourceLimits],
+    slot: Optional[CgroupSlot] = None,
+) -> Optional[Callable[[], None]]:
+    """构造子进程 preexec 钩子。
+
+    钩子在 fork 之后、exec 之前运行，只做预先计算好的系统调用，
+    避免在多线程进程的子进程中执行复杂的 Python 逻辑。
+
+    Args:
+        limits: rlimit 配置。
+        slot: 需要加入的 cgroup 子组。
+
+    Returns:
+        preexec 回调；无需设置任何限制时返回 None。
+    """
+    rlimits = limits.rlimits() if limits is not None else []
+    if not rlimits and slot is None:
+        return None
+
+    def preexec() -> None:
+        if slot is not None:
+            slot.join()
+        for limit_resource, soft, hard in rlimits:
+            _, current_hard = resource.getrlimit(limit_resource)
+            if current_hard != resource.RLIM_INFINITY:
+                soft = min(soft, current_hard)
+                hard = current_hard if hard is None else min(hard, current_hard)
+            elif hard is None:
+                hard = current_hard
+            resource.setrlimit(limit_resource, (soft, hard))
+
+    return preexec
+
+
+def rusage_to_dict(usage: Any) -> Dict[str, float]:
+    """将 resource.struct_rusage 转为用量字典。
+
+    Args:
+        usage: os.wait4 返回的 rusage。
+
+    Returns:
+        包含 user_seconds、system_seconds、max_rss_mb 的字典。
+    """
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    rss_unit = 1 if os.uname().sysname == "Darwin" else 1024
+    return {
+        "user_seconds": usage.ru_utime,
+        "system_seconds": usage.ru_stime,
+        "max_rss_mb": usage.ru_maxrss * rss_unit / _MB,
+    }
+
+
+def format_usage(usage: Optional[Dict[str, float]]) -> str:
+    """将用量字典格式化为单行文本。
+
+    Args:
+        usage: rusage 与 cgroup 用量字典。
+
+    Returns:
+        形如 ``user 0.12s sys 0.03s maxrss 12.3MB`` 的文本，无数据时为空字符串。
+    """
+    if not usage:
+        return ""
+    parts = []
+    if "user_seconds" in usage:
+        parts.append(f"user {usage['user_seconds']:.2f}s")
+    if "system_seconds" in usage:
+        parts.append(f"sys {usage['system_seconds']:.2f}s")
+    if "max_rss_mb" in usage:
+        parts.append(f"maxrss {usage['max_rss_mb']:.1f}MB")
+    if "cgroup_cpu_seconds" in usage:
+        parts.append(f"cgroup cpu {usage['cgroup_cpu_seconds']:.2f}s")
+    if "cgroup_memory_peak_mb" in usage:
+        parts.append(f"cgroup mem peak {usage['cgroup_memory_peak_mb']:.1f}MB")
+    return " ".join(parts)
@@ -0,0 +1,306 @@
+"""基于伪终端的常驻 Shell 会话。
+
+同一次解题内的命令在同一个 Bash 进程中执行，工作目录、环境变量与虚拟环境等状态
+在步骤之间保留，也免去每条命令重新启动 Shell（以及登录 Shell 重新加载配置）的开销。
+每条命令以带随机标记的哨兵行结束，超时或输出超限时先发送中断，Shell 无响应时结束并在
+下次调用时重建。仅支持提供 pty 模块的 POSIX 平台。
+"""
+
+import codecs
+import logging
+import os
+import re
+import select
+import signal
+import subprocess
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from utils.process_runner import ProcessResult, RingBuffer, current_output_listener
+from utils.resource_governor import CgroupManager, CgroupSlot, ResourceLimits, make_preexec
+
+try:
+    import fcntl
+    import pty
+    import termios
+except ImportError:
+    fcntl = None
+    pty = None
+    termios = None
+
+logger = logging.getLogger(__name__)
+
+# 中断命令后等待 Shell 恢复响应的秒数
+_INTERRUPT_GRACE = 2.0
+_READ_CHUNK = 65536
+
+
+def session_supported() -> bool:
+    """当前平台是否支持常驻会话。"""
+    return pty is not None and termios is not None and fcntl is not None and os.name == "posix"
+
+
+def _quote_ansi_c(text: str) -> str:
+    """将文本转为 Bash 的 $'...' 字符串字面量，使多行命令可作为单行发送。"""
+    escaped = (
+        text.replace("\\", "\\\\")
+        .replace("'", "\\'")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+    return f"$'{escaped}'"
+
+
+class ShellSession:
+    """通过伪终端驱动的常驻 Bash 进程。"""
+
+    def __init__(
+        self,
+        args: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        limits: Optional[ResourceLimits] = None,
+        cgroup: Optional[CgroupManager] = None,
+    ) -> None:
+        """初始化会话（首次执行命令时才启动 Shell）。
+
+        Args:
+            args: Shell 启动参数，如 ["/bin/bash", "--noediting", "--noprofile", "--norc"]。
+            cwd: 初始工作目录。
+            env: 环境变量。
+            limits: rlimit 限制，作用于 Shell 及其启动的每个命令。
+            cgroup: 可选的 cgroup v2 管理器，整个会话共用一个子组。
+        """
+        self.args = args
+        self.cwd = cwd
+        self.limits = limits
+        self.cgroup = cgroup
+        self._slot: Optional[CgroupSlot] = None
+        self.env = dict(env or os.environ)
+        self.env.update({"PS1": "", "PS2": "", "PROMPT_COMMAND": "", "TERM": "dumb"})
+        self.pid: Optional[int] = None
+        self.fd: Optional[int] = None
+        self._process: Optional["subprocess.Popen[bytes]"] = None
+
+    @property
+    def alive(self) -> bool:
+        """Shell 进程是否仍在运行。"""
+        return self._process is not None and self._process.poll() is None
+
+    def _spawn(self) -> None:
+        """启动 Shell 并关闭回显、规范模式与换行转换。
+
+        伪终端的属性在父进程中设置好，子进程以 subprocess 启动，
+        fork 之后只执行设置控制终端与资源限制的系统调用。
+        """
+        self._slot = self.cgroup.create() if self.cgroup is not None else None
+        limits_preexec = make_preexec(self.limits, self._slot)
+
+        def preexec() -> None:
+            # 将伪终端设为新会话的控制终端，使中断字符能送达前台命令
+            fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+            if limits_preexec is not None:
+                limits_preexec()
+
+        master, slave = pty.openpty()
+        try:
+            attrs = termios.tcgetattr(slave)
+            attrs[1] &= ~termios.ONLCR
+            attrs[3] &= ~(termios.ECHO | termios.ICANON)
+            attrs[6][termios.VMIN] = 1
+            attrs[6][termios.VTIME] = 0
+            termios.tcsetattr(slave, termios.TCSANOW, attrs)
+            self._process = subprocess.Popen(
+                self.args,
+                stdin=slave,
+                stdout=slave,
+                stderr=slave,
+                cwd=self.cwd or None,
+                env=self.env,
+                start_new_session=True,
+                preexec_fn=preexec,
+            )
+        except Exception:
+            os.close(master)
+            if self._slot is not None:
+                self._slot.remove()
+                self._slot = None
+            raise
+        finally:
+            os.close(slave)
+
+        self.pid, self.fd = self._process.pid, master
+        # 登录 Shell 加载的配置可能重设提示符，启动后统一清空并同步一次
+        result = self.run(
+            "PS1=''; PS2=''; PROMPT_COMMAND=''; unset HISTFILE",
+            timeout=10,
+            listener=None,
+        )
+        if result.returncode is None:
+            self.close()
+            raise OSError("常驻 Shell 启动失败")
+        logger.info("已启动常驻 Shell 会话: pid=%s", self.pid)
+
+    def run(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        buffer_bytes: int = 1 << 20,
+        max_output_bytes: int = 64 << 20,
+        listener: Optional[Callable[[str], None]] = None,
+    ) -> ProcessResult:
+        """在会话中执行一条命令。
+
+        Args:
+            command: Shell 命令，可为多行。
+            timeout: 超时秒数，None 表示不限。
+            buffer_bytes: 最多保留的输出字节数（stdout 与 stderr 合并）。
+            max_output_bytes: 输出总字节数上限，超过后中断命令，0 表示不限。
+            listener: 实时输出回调，缺省使用当前上下文注册的监听器。
+
+        Returns:
+            ProcessResult 执行结果，输出全部位于 stdout；Shell 被重建时 returncode 为 None。
+
+        Raises:
+            OSError: Shell 启动失败时抛出。
+        """
+        if not self.alive:
+            self.close()
+            self._spawn()
+        if listener is None:
+            listener = current_output_listener()
+        self._drain()
+
+        marker = f"__BUUCTF_DONE_{uuid.uuid4().hex}__:"
+        self._write(
+            f"eval {_quote_ansi_c(command)} < /dev/null; "
+            f"printf '\\n%s%d\\n' '{marker}' \"$?\"\n"
+        )
+
+        pattern = re.compile(re.escape(marker) + r"(-?\d+)\n")
+        hold = len(marker) + 12
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        buffer = RingBuffer(buffer_bytes)
+        deadline = time.monotonic() + timeout if timeout else None
+        carry = ""
+        total = 0
+        timed_out = False
+        truncated = False
+        returncode: Optional[int] = None
+
+        def emit(text: str) -> None:
+            nonlocal listener
+            if not text:
+                return
+            buffer.write(text.encode("utf-8", errors="replace"))
+            if listener is not None:
+                try:
+                    listener(text)
+                except Exception as error:
+                    logger.debug("实时输出回调失败: %s", error)
+                    listener = None
+
+        while True:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline and not (timed_out or truncated):
+                timed_out = True
+                deadline = self._interrupt(marker)
+            elif deadline is not None and now >= deadline:
+                # 中断后 Shell 仍未响应，结束整个会话
+                self.close()
+                break
+
+            wait = 0.5 if deadline is None else max(0.0, min(0.5, deadline - now))
+            data = self._read(wait)
+            if data is None:
+                # Shell 已退出（例如命令中执行了 exit）
+                emit(carry + decoder.decode(b"", final=True))
+                carry = ""
+                self.close()
+                break
+            if not data:
+                continue
+
+            total += len(data)
+            window = carry + decoder.decode(data)
+            match = pattern.search(window)
+            if match:
+                emit(window[: match.start()].removesuffix("\n"))
+                returncode = int(match.group(1))
+                break
+            carry = window[-hold:]
+            if not (timed_out or truncated):
+                emit(window[: len(window) - len(carry)])
+            if max_output_bytes > 0 and total > max_output_bytes and not truncated:
+                truncated = True
+                deadline = self._interrupt(marker)
+
+        return ProcessResult(
+            returncode=returncode,
+            stdout=buffer.getvalue().decode("utf-8", errors="replace"),
+            stderr="",
+            timed_out=timed_out,
+            truncated=truncated,
+            dropped=buffer.dropped,
+        )
+
+    def _interrupt(self, marker: str) -> float:
+        """向前台命令发送中断，并补发哨兵行以确认 Shell 恢复。
+
+        Returns:
+            等待 Shell 恢复响应的截止时间。
+        """
+        self._write("\x03")
+        time.sleep(0.1)
+        self._write(f"printf '\\n%s%d\\n' '{marker}' 130\n")
+        return time.monotonic() + _INTERRUPT_GRACE
+
+    def _drain(self) -> None:
+        """丢弃上一条命令残留的输出（例如中断后补发的哨兵行）。"""
+        while self._read(0):
+            pass
+
+    def _write(self, text: str) -> None:
+        """向伪终端写入文本。"""
+        data = text.encode("utf-8")
+        while data:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+    def _read(self, wait: float) -> Optional[bytes]:
+        """从伪终端读取数据。
+
+        Returns:
+            读取到的字节；超时无数据时返回 b""；Shell 已退出时返回 None。
+        """
+        ready, _, _ = select.select([self.fd], [], [], wait)
+        if not ready:
+            return b""
+        try:
+            data = os.read(self.fd, _READ_CHUNK)
+        except OSError:
+            return None
+        return data or None
+
+    def close(self) -> None:
+        """结束 Shell 进程组并释放伪终端。"""
+        if self._process is not None:
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            self._process.wait()
+            logger.info("已关闭常驻 Shell 会话: pid=%s", self._process.pid)
+        if self.fd is not None:
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+        if self._slot is not None:
+            self._slot.kill()
+            self._slot.remove()
+        self.pid = None
+        self.fd = None
+        self._process = None
+        self._slot = None
@@ -0,0 +1,285 @@
+"""LLM 调用的 token 用量与延迟遥测。
+
+每次 LLM 调用记录一条 CallRecord（角色、模型、token 用量、耗时、首 token 延迟等），
+并通过 contextvars 标注所属题目与步骤，以便按步骤、按题目聚合。
+批量并发解题时每个线程/协程拥有独立的上下文，记录不会串题。
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_problem: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "telemetry_problem", default=None
+)
+_current_step: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "telemetry_step", default=None
+)
+
+
+@dataclass
+class CallRecord:
+    """单次 LLM 调用的遥测数据。"""
+
+    role: str
+    model: str
+    kind: str = "chat"
+    status: str = "ok"
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency: float = 0.0
+    ttft: Optional[float] = None
+    problem: Optional[str] = None
+    step: Optional[int] = None
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def total_tokens(self) -> int:
+        """输入与输出 token 之和。"""
+        return self.prompt_tokens + self.completion_tokens
+
+
+def usage_fields(usage: Any) -> Dict[str, int]:
+    """从 OpenAI usage 对象中提取 token 字段。
+
+    Args:
+        usage: 响应中的 usage 对象，可能为空。
+
+    Returns:
+        包含 prompt_tokens、completion_tokens、cached_tokens 的字典。
+    """
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    return {
+        "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+        "cached_tokens": int(cached or 0),
+    }
+
+
+def _display_width(text: str) -> int:
+    """计算文本在终端中的显示宽度（中日韩全角字符计 2）。"""
+    return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+
+def _cell(text: str, width: int, left: bool = False) -> str:
+    """按显示宽度对齐单元格文本。"""
+    padding = " " * max(0, width - _display_width(text))
+    return text + padding if left else padding + text
+
+
+class Telemetry:
+    """进程级 LLM 调用遥测收集器。"""
+
+    def __init__(self) -> None:
+        """初始化收集器。"""
+        self._records: List[CallRecord] = []
+        self._lock = threading.Lock()
+
+    def record(self, record: CallRecord) -> None:
+        """记录一次调用，并补充当前题目与步骤上下文。
+
+        Args:
+            record: 调用记录。
+        """
+        if record.problem is None:
+            record.problem = _current_problem.get()
+        if record.step is None:
+            record.step = _current_step.get()
+        with self._lock:
+            self._records.append(record)
+        logger.debug(
+            "LLM 调用 [%s/%s] %s: prompt=%d completion=%d cached=%d latency=%.2fs",
+            record.role,
+            record.model,
+            record.status,
+            record.prompt_tokens,
+            record.completion_tokens,
+            record.cached_tokens,
+            record.latency,
+        )
+
+    @contextmanager
+    def problem_scope(self, problem_id: str) -> Iterator[None]:
+        """在上下文内将调用归属到指定题目。
+
+        Args:
+            problem_id: 题目标识。
+        """
+        token = _current_problem.set(problem_id)
+        try:
+            yield
+        finally:
+            _current_problem.reset(token)
+
+    @staticmethod
+    def current_problem() -> Optional[str]:
+        """返回当前上下文的题目标识。"""
+        return _current_problem.get()
+
+    @staticmethod
+    def set_step(step: Optional[int]) -> None:
+        """设置当前上下文的步骤编号。
+
+        Args:
+            step: 步骤编号，None 表示不属于任何步骤。
+        """
+        _current_step.set(step)
+
+    def records(
+        self,
+        problem: Optional[str] = None,
+        step: Optional[int] = None,
+    ) -> List[CallRecord]:
+        """按题目与步骤筛选调用记录。
+
+        Args:
+            problem: 题目标识，None 表示不筛选。
+            step: 步骤编号，None 表示不筛选。
+
+        Returns:
+            匹配的调用记录列表。
+        """
+        with self._lock:
+            return [
+                item
+                for item in self._records
+                if (problem is None or item.problem == problem)
+                and (step is None or item.step == step)
+            ]
+
+    def discard(self, problem: str) -> None:
+        """丢弃指定题目的记录，避免批量运行时无限增长。
+
+        Args:
+            problem: 题目标识。
+        """
+        with self._lock:
+            self._records = [item for item in self._records if item.problem != problem]
+
+    @staticmethod
+    def summarize(records: List[CallRecord]) -> Dict[str, Dict[str, Any]]:
+        """按角色聚合调用记录。
+
+        Args:
+            records: 调用记录列表。
+
+        Returns:
+            角色到聚合指标的映射，额外包含键 "总计"。
+        """
+        groups: Dict[str, Dict[str, Any]] = {}
+        for item in records:
+            for key in (item.role, "总计"):
+                group = groups.setdefault(
+                    key,
+                    {
+                        "calls": 0,
+                        "errors": 0,
+                        "cache_hits": 0,
+                        "prompt_tokens": 0,
+                        "completion_tokens": 0,
+                        "cached_tokens": 0,
+                        "latency": 0.0,
+                        "ttft_sum": 0.0,
+                        "ttft_count": 0,
+                    },
+                )
+                group["calls"] += 1
+                group["errors"] += 1 if item.status == "error" else 0
+                group["cache_hits"] += 1 if item.status == "cache" else 0
+                group["prompt_tokens"] += item.prompt_tokens
+                group["completion_tokens"] += item.completion_tokens
+                group["cached_tokens"] += item.cached_tokens
+                group["latency"] += item.latency
+                if item.ttft is not None:
+                    group["ttft_sum"] += item.ttft
+                    group["ttft_count"] += 1
+        return groups
+
+    @classmethod
+    def format_table(cls, records: List[CallRecord]) -> str:
+        """将调用记录格式化为按角色汇总的文本表格。
+
+        Args:
+            records: 调用记录列表。
+
+        Returns:
+            表格文本；无记录时返回提示文本。
+        """
+        if not records:
+            return "无 LLM 调用记录"
+
+        columns = ["角色", "调用", "失败", "缓存", "输入", "输出", "缓存命中", "总耗时", "平均TTFT"]
+        widths = [14, 6, 6, 6, 10, 10, 10, 10, 10]
+        groups = cls.summarize(records)
+        total = groups.pop("总计")
+        rows: List[List[str]] = []
+        for role, group in [*groups.items(), ("总计", total)]:
+            ttft = (
+                f"{group['ttft_sum'] / group['ttft_count']:.2f}s"
+                if group["ttft_count"]
+                else "-"
+            )
+            rows.append(
+                [
+                    role,
+                    str(group["calls"]),
+                    str(group["errors"]),
+                    str(group["cache_hits"]),
+                    str(group["prompt_tokens"]),
+                    str(group["completion_tokens"]),
+                    str(group["cached_tokens"]),
+                    f"{group['latency']:.1f}s",
+                    ttft,
+                ]
+            )
+
+        lines = []
+        for row in [columns, *rows]:
+            lines.append(
+                "".join(
+                    _cell(value, width, left=index == 0)
+                    for index, (value, width) in enumerate(zip(row, widths))
+                )
+            )
+        lines.insert(1, "-" * sum(widths))
+        return "\n".join(lines)
+
+    @staticmethod
+    def export_jsonl(records: List[CallRecord], path: str) -> None:
+        """将调用记录追加写入 JSONL 文件。
+
+        Args:
+            records: 调用记录列表。
+            path: 输出文件路径。
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as file:
+            for item in records:
+                file.write(json.dumps(asdict(item), ensure_ascii=False) + "\n")
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """获取进程级遥测收集器。
+
+    Returns:
+        Telemetry 单例。
+    """
+    return _telemetry
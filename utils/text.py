@@ -26,16 +26,19 @@ def fix_json_with_llm(json_str: str, err_content: str) -> str:
         f"错误JSON: {json_str}"
         f"错误信息: {err_content}"
     )
-    pre_processor = LLMRequest("solve_agent")
+    json_fixer = LLMRequest("json_fixer")
 
+    attempt = 0
     while True:
         try:
             repaired_json = repair_json(json_str)
             if json.loads(repaired_json):
                 return repaired_json
         except Exception:
-            response = pre_processor.text_completion(prompt, True)
+            # 仅首次请求走缓存，避免缓存的错误结果导致重复失败
+            response = json_fixer.text_completion(prompt, True, cache=attempt == 0)
             json_str = response.choices[0].message.content
+            attempt += 1
             continue
 
 
@@ -0,0 +1,165 @@
+"""文本 token 计数。
+
+优先使用 tiktoken 的 BPE 编码（可选依赖，编码表进程内只加载一次），
+未安装或加载失败时退回按字符类别估算：
+- 中日韩文字约 1 字 1 token
+- 连续的英文字母按约 4 字符 1 token，数字按约 3 位 1 token
+- 其他标点与符号各计 1 token，空白不计
+
+config.json 中可通过 tokenizer 配置选择后端：
+
+    "tokenizer": {"backend": "auto", "encoding": "cl100k_base"}
+
+backend 可选 auto（默认，有 tiktoken 则用）、tiktoken、heuristic。
+"""
+
+import logging
+import re
+import threading
+from typing import Any, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+
+_CJK_PATTERN = (
+    "぀-ヿ"  # 日文假名
+    "㐀-䶿"  # CJK 扩展 A
+    "一-鿿"  # CJK 统一汉字
+    "가-힯"  # 韩文音节
+    "豈-﫿"  # CJK 兼容汉字
+    "　-〿"  # CJK 标点
+    "＀-￯"  # 全角字符
+)
+_TOKEN_CLASSES = re.compile(
+    rf"(?P<cjk>[{_CJK_PATTERN}])"
+    r"|(?P<word>[A-Za-z]+)"
+    r"|(?P<digits>[0-9]+)"
+    r"|(?P<space>\s+)"
+    r"|(?P<other>.)",
+    re.DOTALL,
+)
+
+
+class HeuristicTokenizer:
+    """按字符类别估算 token 数的后备实现。"""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        """估算文本 token 数。
+
+        Args:
+            text: 待计数文本。
+
+        Returns:
+            估算的 token 数。
+        """
+        total = 0
+        for match in _TOKEN_CLASSES.finditer(text):
+            kind = match.lastgroup
+            if kind == "word":
+                total += (len(match.group()) + 3) // 4
+            elif kind == "digits":
+                total += (len(match.group()) + 2) // 3
+            elif kind != "space":
+                total += 1
+        return total
+
+
+class TiktokenTokenizer:
+    """基于 tiktoken BPE 编码的精确计数。"""
+
+    name = "tiktoken"
+
+    def __init__(self, encoding: str = DEFAULT_ENCODING) -> None:
+        """加载 BPE 编码表。
+
+        Args:
+            encoding: tiktoken 编码名。
+
+        Raises:
+            ImportError: 未安装 tiktoken 时抛出。
+        """
+        import tiktoken
+
+        self.encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        """计算文本 token 数。
+
+        Args:
+            text: 待计数文本。
+
+        Returns:
+            token 数。
+        """
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+_tokenizer: Optional[Any] = None
+_tokenizer_lock = threading.Lock()
+
+
+def load_tokenizer(tokenizer_config: Optional[Dict[str, Any]] = None) -> Any:
+    """按配置创建分词器，tiktoken 不可用时退回启发式估算。
+
+    Args:
+        tokenizer_config: tokenizer 配置，缺省时从配置文件读取。
+
+    Returns:
+        具有 count(text) 方法的分词器对象。
+    """
+    if tokenizer_config is None:
+        try:
+            tokenizer_config = Config.load_config().get("tokenizer", {})
+        except ValueError:
+            tokenizer_config = {}
+    if not isinstance(tokenizer_config, dict):
+        tokenizer_config = {}
+
+    backend = tokenizer_config.get("backend", "auto")
+    if backend == "heuristic":
+        return HeuristicTokenizer()
+
+    encoding = str(tokenizer_config.get("encoding", DEFAULT_ENCODING))
+    try:
+        return TiktokenTokenizer(encoding)
+    except Exception as error:
+        if backend == "tiktoken":
+            logger.warning("加载 tiktoken 编码 %s 失败，改用启发式估算: %s", encoding, error)
+        else:
+            logger.debug("tiktoken 不可用，使用启发式估算: %s", error)
+        return HeuristicTokenizer()
+
+
+def get_tokenizer() -> Any:
+    """获取进程级共享分词器。
+
+    Returns:
+        具有 count(text) 方法的分词器对象。
+    """
+    global _tokenizer
+
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = load_tokenizer()
+                logger.debug("token 计数后端: %s", _tokenizer.name)
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """计算文本 token 数。
+
+    Args:
+        text: 待计数文本。
+
+    Returns:
+        token 数。
+    """
+    if not text:
+        return 0
+    return get_tokenizer().count(text)
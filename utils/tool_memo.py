@@ -0,0 +1,389 @@
+"""幂等工具调用的结果缓存。
+
+以 (工具名, 规范化参数, 参数中引用文件的内容哈希) 为键，将工具输出存入本地 SQLite，
+跨步骤与存档恢复复用 file、strings、binwalk 等命令在未变化输入上的结果。
+哪些调用可以缓存由按工具配置的规则决定，缓存按最近最少使用淘汰。
+需要在 config.json 的 tool_memo.enabled 中显式开启。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shlex
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMO_PATH = "./cache/tool_memo.sqlite3"
+DEFAULT_MAX_ENTRIES = 2000
+
+CACHED_MARKER = "[cached] 参数与输入文件均未变化，直接返回之前的执行结果"
+
+# 默认规则：本地 Shell 中只读取输入文件的分析命令（命令名 -> 缓存秒数，0 表示不过期）
+DEFAULT_RULES: Dict[str, Dict[str, Any]] = {
+    "execute_shell_command": {
+        "argument": "content",
+        "commands": {
+            "file": 0,
+            "strings": 0,
+            "binwalk": 0,
+            "checksec": 0,
+            "exiftool": 0,
+            "readelf": 0,
+            "objdump": 0,
+            "xxd": 0,
+            "hexdump": 0,
+            "md5sum": 0,
+            "sha1sum": 0,
+            "sha256sum": 0,
+            "zsteg": 0,
+            "pngcheck": 0,
+            "grep": 0,
+            "head": 0,
+            "tail": 0,
+            "wc": 0,
+            "uniq": 0,
+            "curl": 300,
+        },
+        # 命令出现这些选项时不缓存：curl 只缓存不带请求体、不改请求方法、不读写 Cookie 与文件的 GET 请求
+        "reject_options": {
+            "curl": {
+                "short": "dFXcbOoTK",
+                "long": [
+                    "data",
+                    "form",
+                    "json",
+                    "request",
+                    "cookie",
+                    "output",
+                    "remote-name",
+                    "upload-file",
+                    "config",
+                ],
+            },
+        },
+        "success_pattern": r"^\[exit_code\] 0\b",
+    },
+}
+
+_SHELL_OPERATORS = {"|", "||", "&&", ";"}
+_GLOB_CHARS = set("*?[{")
+# 含重定向、后台执行或命令替换的命令可能产生副作用或依赖未追踪的输入，不做缓存
+_UNSAFE_PATTERN = re.compile(r"[<>`]|\$\(|(?<!&)&(?!&)")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS results ("
+    " key TEXT PRIMARY KEY,"
+    " tool_name TEXT NOT NULL,"
+    " output TEXT NOT NULL,"
+    " expires_at REAL NOT NULL,"
+    " accessed_at REAL NOT NULL"
+    ")",
+    "CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)",
+)
+
+
+class ToolMemo:
+    """SQLite 实现的工具结果缓存。"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_MEMO_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        rules: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        """初始化缓存并确保数据表存在。
+
+        Args:
+            path: SQLite 文件路径。
+            max_entries: 最多保留的条目数，超出后按最近最少使用淘汰。
+            rules: 工具名到缓存规则的映射，缺省使用 DEFAULT_RULES。
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self._lock = threading.Lock()
+        # (路径, 大小, 修改时间) -> 内容摘要，避免重复哈希未变化的大文件
+        self._file_digests: Dict[Tuple[str, int, int], str] = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def _file_digest(self, path: str) -> str:
+        """计算文件内容摘要（按大小与修改时间缓存）。"""
+        stat = os.stat(path)
+        signature = (path, stat.st_size, stat.st_mtime_ns)
+        digest = self._file_digests.get(signature)
+        if digest is None:
+            hasher = hashlib.sha256()
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            self._file_digests[signature] = digest
+        return digest
+
+    @staticmethod
+    def _has_expansion(command: str) -> bool:
+        """命令中是否含有未加引号的通配符，或单引号以外的 $ 变量展开。
+
+        展开后的实际文件无法从参数文本得知，无法判断输入是否变化。
+        """
+        quote = ""
+        escaped = False
+        for char in command:
+            if escaped:
+                escaped = False
+            elif char == "\\" and quote != "'":
+                escaped = True
+            elif quote:
+                if char == quote:
+                    quote = ""
+                elif char == "$" and quote == '"':
+                    return True
+            elif char in ("'", '"'):
+                quote = char
+            elif char == "$" or char in _GLOB_CHARS:
+                return True
+        return False
+
+    @staticmethod
+    def _rejects(words: List[str], options: Any) -> bool:
+        """命令参数中是否含有规则禁止缓存的选项。"""
+        if not isinstance(options, dict):
+            return False
+        short = str(options.get("short", ""))
+        long_names = [str(name) for name in options.get("long", [])]
+        for word in words[1:]:
+            if word == "--":
+                break
+            if word.startswith("--"):
+                name = word[2:].split("=", 1)[0]
+                if any(name == prefix or name.startswith(f"{prefix}-") for prefix in long_names):
+                    return True
+            elif word.startswith("-") and any(flag in short for flag in word[1:]):
+                return True
+        return False
+
+    @staticmethod
+    def _shell_commands(command: str) -> Optional[List[List[str]]]:
+        """将 Shell 命令拆分为简单命令列表，含重定向、后台、命令替换或通配符展开时返回 None。"""
+        if _UNSAFE_PATTERN.search(command) or ToolMemo._has_expansion(command):
+            return None
+        lexer = shlex.shlex(command.replace("\n", ";"), posix=True, punctuation_chars=";&|")
+        lexer.whitespace_split = True
+        try:
+            tokens = list(lexer)
+        except ValueError:
+            return None
+
+        commands: List[List[str]] = [[]]
+        for token in tokens:
+            if token in _SHELL_OPERATORS:
+                commands.append([])
+            else:
+                commands[-1].append(token)
+        return [words for words in commands if words]
+
+    def _rule_for(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[Tuple[float, List[str]]]:
+        """判断调用是否可缓存。
+
+        Returns:
+            (缓存秒数, 需要检查的参数片段)；不可缓存时返回 None。
+        """
+        rule = self.rules.get(tool_name)
+        if not isinstance(rule, dict):
+            return None
+
+        commands = rule.get("commands")
+        if not isinstance(commands, dict):
+            tokens = [str(value) for value in arguments.values() if isinstance(value, str)]
+            return float(rule.get("ttl", 0)), tokens
+
+        command = arguments.get(str(rule.get("argument", "content")))
+        if not isinstance(command, str):
+            return None
+        parsed = self._shell_commands(command)
+        if not parsed:
+            return None
+
+        reject_options = rule.get("reject_options", {})
+        ttl = 0.0
+        tokens: List[str] = []
+        for words in parsed:
+            # 跳过前导的 VAR=value 环境变量赋值
+            while words and re.match(r"^[A-Za-z_][A-Za-z0-9_]*=", words[0]):
+                words = words[1:]
+            if not words or os.path.basename(words[0]) not in commands:
+                return None
+            if isinstance(reject_options, dict) and self._rejects(
+                words, reject_options.get(os.path.basename(words[0]))
+            ):
+                return None
+            command_ttl = float(commands[os.path.basename(words[0])] or 0)
+            if command_ttl > 0:
+                ttl = command_ttl if ttl <= 0 else min(ttl, command_ttl)
+            tokens.extend(words[1:])
+        return ttl, tokens
+
+    def make_key(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        cwd: Optional[str] = None,
+    ) -> Optional[Tuple[str, float]]:
+        """计算调用的缓存键。
+
+        Args:
+            tool_name: 工具名。
+            arguments: 调用参数。
+            cwd: 解析相对路径使用的工作目录。
+
+        Returns:
+            (缓存键, 缓存秒数)；调用不可缓存时返回 None。
+        """
+        rule = self._rule_for(tool_name, arguments)
+        if rule is None:
+            return None
+        ttl, tokens = rule
+
+        files: Dict[str, str] = {}
+        for token in tokens:
+            candidate = token.split("=", 1)[1] if token.startswith("-") and "=" in token else token
+            if not candidate or candidate.startswith("-"):
+                continue
+            path = os.path.join(cwd or os.getcwd(), os.path.expanduser(candidate))
+            if os.path.isfile(path):
+                try:
+                    files[os.path.abspath(path)] = self._file_digest(path)
+                except OSError:
+                    return None
+            elif os.path.exists(path):
+                # 目录与设备文件的内容无法哈希，不能判断是否变化
+                return None
+
+        normalized = {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in arguments.items()
+        }
+        payload = json.dumps(
+            {"tool": tool_name, "arguments": normalized, "cwd": cwd, "files": files},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest(), ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存结果，过期条目视为未命中并删除。
+
+        Args:
+            key: 缓存键。
+
+        Returns:
+            缓存的工具输出，未命中返回 None。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT output, expires_at FROM results WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] > 0 and row[1] < now:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            return row[0]
+
+    def put(self, key: str, tool_name: str, output: str, ttl: float = 0) -> bool:
+        """写入成功执行的结果，并在超出容量时淘汰最久未使用的条目。
+
+        Args:
+            key: 缓存键。
+            tool_name: 工具名。
+            output: 工具原始输出（落盘与截断预览之前），success_pattern 据此判断。
+            ttl: 缓存秒数，0 表示不过期。
+
+        Returns:
+            是否写入（不满足规则中 success_pattern 的输出不会缓存）。
+        """
+        pattern = self.rules.get(tool_name, {}).get("success_pattern")
+        if pattern and not re.search(pattern, output):
+            return False
+
+        now = time.time()
+        expires_at = now + ttl if ttl > 0 else 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results"
+                "(key, tool_name, output, expires_at, accessed_at)"
+                " VALUES(?, ?, ?, ?, ?)",
+                (key, tool_name, output, expires_at, now),
+            )
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+        return True
+
+    def clear(self) -> int:
+        """清空全部缓存条目。
+
+        Returns:
+            删除的条目数量。
+        """
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM results").rowcount
+
+
+_memo_instance: Optional[ToolMemo] = None
+_memo_lock = threading.Lock()
+
+
+def get_tool_memo(memo_config: Optional[Dict[str, Any]] = None) -> Optional[ToolMemo]:
+    """获取进程级共享的工具结果缓存；未启用时返回 None。
+
+    Args:
+        memo_config: tool_memo 配置，缺省时从配置文件读取。
+
+    Returns:
+        共享的 ToolMemo 实例或 None。
+    """
+    global _memo_instance
+
+    if memo_config is None:
+        try:
+            memo_config = Config.load_config().get("tool_memo", {})
+        except ValueError:
+            memo_config = {}
+    if not isinstance(memo_config, dict) or not memo_config.get("enabled", False):
+        return None
+
+    if _memo_instance is None:
+        with _memo_lock:
+            if _memo_instance is None:
+                rules = memo_config.get("rules")
+                _memo_instance = ToolMemo(
+                    path=str(memo_config.get("path", DEFAULT_MEMO_PATH)),
+                    max_entries=int(memo_config.get("max_entries", DEFAULT_MAX_ENTRIES)),
+                    rules=rules if isinstance(rules, dict) else None,
+                )
+    return _memo_instance
@@ -0,0 +1,187 @@
+"""工具输出落盘与预览模块。
+
+超过阈值的工具输出完整保存到内容寻址目录，日志、记忆与提示词中只保留
+首尾预览和 ``blob:<引用>`` 句柄，模型可通过 read_tool_output 工具按需查看全文。
+"""
+
+import logging
+import re
+import threading
+from typing import Any, Dict, Optional
+
+from config import Config
+from utils.blob_store import DiskBlobStore
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PREFIX = "blob:"
+DEFAULT_SPILL_DIR = "./cache/blobs"
+
+_HANDLE_PATTERN = re.compile(r"^(?:blob:)?([0-9a-f]{16})$")
+
+
+def parse_handle(handle: Any) -> Optional[str]:
+    """从句柄文本中解析内容引用。
+
+    Args:
+        handle: ``blob:<引用>`` 或裸引用。
+
+    Returns:
+        内容引用；格式非法时返回 None。
+    """
+    if not isinstance(handle, str):
+        return None
+    match = _HANDLE_PATTERN.match(handle.strip())
+    return match.group(1) if match else None
+
+
+class ToolOutputSpiller:
+    """将过长的工具输出落盘并生成首尾预览。"""
+
+    def __init__(
+        self,
+        spill_dir: str = DEFAULT_SPILL_DIR,
+        threshold: int = 4000,
+        preview_head: int = 1500,
+        preview_tail: int = 1000,
+        max_age_hours: float = 72,
+        max_mb: float = 1024,
+    ) -> None:
+        """初始化落盘策略。
+
+        Args:
+            spill_dir: 落盘目录。
+            threshold: 输出字符数超过该值时落盘，0 表示不落盘。
+            preview_head: 预览保留的开头字符数。
+            preview_tail: 预览保留的结尾字符数。
+            max_age_hours: 落盘内容的保留时长（小时），<=0 表示不按时间回收。
+            max_mb: 落盘目录的总量上限（MB），<=0 表示不限。
+        """
+        self.spill_dir = spill_dir
+        self.threshold = max(0, threshold)
+        self.preview_head = max(0, preview_head)
+        self.preview_tail = max(0, preview_tail)
+        self.max_age_hours = max_age_hours
+        self.max_mb = max_mb
+        self._store: Optional[DiskBlobStore] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> "ToolOutputSpiller":
+        """按 tool_output 配置创建。
+
+        Args:
+            config: tool_output 配置，缺省时从配置文件读取。
+
+        Returns:
+            ToolOutputSpiller 实例。
+        """
+        if config is None:
+            try:
+                config = Config.load_config().get("tool_output", {})
+            except ValueError:
+                config = {}
+        if not isinstance(config, dict):
+            config = {}
+        return cls(
+            spill_dir=str(config.get("spill_dir") or DEFAULT_SPILL_DIR),
+            threshold=int(config.get("spill_threshold", 4000)),
+            preview_head=int(config.get("preview_head", 1500)),
+            preview_tail=int(config.get("preview_tail", 1000)),
+            max_age_hours=float(config.get("max_age_hours", 72)),
+            max_mb=float(config.get("max_mb", 1024)),
+        )
+
+    @property
+    def store(self) -> DiskBlobStore:
+        """落盘存储（首次使用时创建目录并回收过期内容）。"""
+        if self._store is None:
+            store = DiskBlobStore(self.spill_dir)
+            try:
+                removed = store.collect_garbage(self.max_age_hours, self.max_mb)
+            except OSError as error:
+                logger.warning("回收落盘输出失败: %s", error)
+            else:
+                if removed:
+                    logger.info("已回收 %d 个过期的落盘输出", removed)
+            self._store = store
+        return self._store
+
+    def read(self, handle: Any) -> Optional[str]:
+        """读取句柄对应的完整输出。
+
+        Args:
+            handle: ``blob:<引用>`` 或裸引用。
+
+        Returns:
+            完整输出；句柄非法或内容不存在时返回 None。
+        """
+        ref = parse_handle(handle)
+        if ref is None:
+            return None
+        return self.store.get(ref)
+
+    def spill(self, text: str) -> str:
+        """输出过长时落盘并返回预览，否则原样返回。
+
+        Args:
+            text: 工具原始输出。
+
+        Returns:
+            原始输出或带句柄的首尾预览。
+        """
+        if self.threshold <= 0 or len(text) <= self.threshold:
+            return text
+        try:
+            ref = self.store.put(text)
+        except OSError as error:
+            logger.warning("工具输出落盘失败，改为直接截断: %s", error)
+            return self._preview(text, None)
+        logger.debug("工具输出已落盘: %s", self.store.path(ref))
+        return self._preview(text, ref)
+
+    def _preview(self, text: str, ref: Optional[str]) -> str:
+        """生成首尾预览，切点尽量落在换行处。"""
+        head_end = self.preview_head
+        newline = text.rfind("\n", 0, head_end)
+        if newline > head_end // 2:
+            head_end = newline + 1
+
+        tail_start = max(head_end, len(text) - self.preview_tail)
+        newline = text.find("\n", tail_start)
+        if tail_start > head_end and 0 <= newline < len(text) - self.preview_tail // 2:
+            tail_start = newline + 1
+
+        omitted = text[head_end:tail_start]
+        total_lines = text.count("\n") + 1
+        if ref is not None:
+            header = (
+                f"[输出过长，完整内容已保存为 {HANDLE_PREFIX}{ref}"
+                f"（共 {len(text)} 字符，{total_lines} 行），"
+                "可使用 read_tool_output 工具分页、搜索或切片查看]"
+            )
+        else:
+            header = f"[输出过长（共 {len(text)} 字符，{total_lines} 行），仅保留首尾]"
+        return (
+            f"{header}\n{text[:head_end].rstrip(chr(10))}"
+            f"\n...（省略 {len(omitted)} 字符，{omitted.count(chr(10))} 行）...\n"
+            f"{text[tail_start:]}"
+        )
+
+
+_spiller: Optional[ToolOutputSpiller] = None
+_spiller_lock = threading.Lock()
+
+
+def get_spiller() -> ToolOutputSpiller:
+    """获取进程级共享的输出落盘器。
+
+    Returns:
+        ToolOutputSpiller 实例。
+    """
+    global _spiller
+
+    if _spiller is None:
+        with _spiller_lock:
+            if _spiller is None:
+                _spiller = ToolOutputSpiller.from_config()
+    return _spiller
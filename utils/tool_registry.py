@@ -0,0 +1,338 @@
+"""工具注册表：带清单缓存的工具发现与按需实例化。
+
+扫描 ctf_tool 下的模块得到各工具的函数配置，连同模块的修改时间与大小写入清单文件；
+之后只在模块变化时重新导入，MCP 服务器的工具列表按服务器配置缓存，无需每次连接。
+解题代理拿到的是按需实例化的工具映射，工具在首次调用时才创建，MCP 服务器在首次调用时
+才连接，且连接在进程内共享，批量解题构造多个代理时不再重复导入与连接。
+"""
+
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ctf_tool.base_tool import BaseTool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = "./cache/tool_manifest.json"
+
+_MANIFEST_VERSION = 1
+_TOOLS_PACKAGE = "ctf_tool"
+_SKIP_FILES = {"__init__.py", "base_tool.py", "mcp_adapter.py"}
+
+
+@dataclass
+class ToolSpec:
+    """单个工具的描述（不含实例）。"""
+
+    name: str
+    function_config: Dict[str, Any]
+    module: str = ""
+    class_name: str = ""
+    server: str = ""
+
+
+def _digest(value: Any) -> str:
+    """计算 JSON 可序列化对象的摘要。"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LazyToolMap(Mapping):
+    """工具名到工具实例的映射，实例在首次访问时创建。"""
+
+    def __init__(self, registry: "ToolRegistry", specs: List[ToolSpec]) -> None:
+        """初始化映射。
+
+        Args:
+            registry: 负责创建实例的注册表。
+            specs: 工具描述列表。
+        """
+        self._registry = registry
+        self._specs = {spec.name: spec for spec in specs}
+        self._instances: Dict[str, BaseTool] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> BaseTool:
+        spec = self._specs[name]
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._registry.instantiate(spec)
+                self._instances[name] = instance
+        return instance
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._specs
+
+    def loaded(self) -> List[BaseTool]:
+        """返回已创建的工具实例（去重）。"""
+        with self._lock:
+            return list({id(tool): tool for tool in self._instances.values()}.values())
+
+
+class ToolRegistry:
+    """带清单缓存的工具发现与实例创建。"""
+
+    def __init__(
+        self,
+        tools_dir: Optional[str] = None,
+        manifest_path: str = DEFAULT_MANIFEST_PATH,
+    ) -> None:
+        """初始化注册表。
+
+        Args:
+            tools_dir: 本地工具目录，缺省为 ctf_tool 包目录。
+            manifest_path: 清单文件路径。
+        """
+        self.tools_dir = tools_dir or os.path.join(os.path.dirname(__file__), "..", _TOOLS_PACKAGE)
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._classes: Dict[Tuple[str, str], type] = {}
+        self._mcp_configs: Dict[str, Dict[str, Any]] = {}
+        self._adapters: Dict[str, Any] = {}
+        self._adapter_lock = threading.Lock()
+
+    def specs(self, config: Dict[str, Any]) -> List[ToolSpec]:
+        """返回全部工具描述，仅对有变化的模块与 MCP 服务器重新发现。
+
+        Args:
+            config: 全局配置字典。
+
+        Returns:
+            工具描述列表，本地工具在前、MCP 工具在后。
+        """
+        with self._lock:
+            manifest = self._read_manifest()
+            changed = False
+
+            tool_config_digest = _digest(config.get("tool_config", {}))
+            if manifest.get("tool_config") != tool_config_digest:
+                manifest["tool_config"] = tool_config_digest
+                manifest["modules"] = {}
+                changed = True
+
+            modules: Dict[str, Any] = manifest.setdefault("modules", {})
+            seen = set()
+            local_specs: List[ToolSpec] = []
+            for file_name in sorted(os.listdir(self.tools_dir)):
+                if not file_name.endswith(".py") or file_name in _SKIP_FILES:
+                    continue
+                module_name = f"{_TOOLS_PACKAGE}.{file_name[:-3]}"
+                seen.add(module_name)
+                stat = os.stat(os.path.join(self.tools_dir, file_name))
+                signature = [stat.st_mtime_ns, stat.st_size]
+                entry = modules.get(module_name)
+                if entry is None or entry.get("signature") != signature:
+                    entry = {"signature": signature, "tools": self._discover_module(module_name)}
+                    modules[module_name] = entry
+                    changed = True
+                local_specs.extend(ToolSpec(**tool) for tool in entry["tools"])
+            for module_name in set(modules) - seen:
+                del modules[module_name]
+                changed = True
+
+            servers: Dict[str, Any] = manifest.setdefault("mcp_servers", {})
+            mcp_servers = config.get("mcp_server", {})
+            mcp_servers = mcp_servers if isinstance(mcp_servers, dict) else {}
+            self._mcp_configs = {}
+            mcp_specs: List[ToolSpec] = []
+            for server_name, server_config in mcp_servers.items():
+                server_config = dict(server_config, name=server_name)
+                self._mcp_configs[server_name] = server_config
+                config_digest = _digest(server_config)
+                entry = servers.get(server_name)
+                if entry is None or entry.get("config") != config_digest:
+                    with self._adapter_lock:
+                        # 配置变化后旧连接不再可用，按新配置重新连接
+                        self._adapters.pop(server_name, None)
+                    tools = self._discover_server(server_name)
+                    if tools is None:
+                        servers.pop(server_name, None)
+                        changed = True
+                        continue
+                    entry = {"config": config_digest, "tools": tools}
+                    servers[server_name] = entry
+                    changed = True
+                mcp_specs.extend(ToolSpec(**tool) for tool in entry["tools"])
+            for server_name in set(servers) - set(mcp_servers):
+                del servers[server_name]
+                changed = True
+
+            if changed:
+                self._write_manifest(manifest)
+            return local_specs + mcp_specs
+
+    def _discover_module(self, module_name: str) -> List[Dict[str, Any]]:
+        """导入模块并记录其中定义的工具。"""
+        try:
+            if module_name in sys.modules:
+                module = importlib.reload(sys.modules[module_name])
+            else:
+                module = importlib.import_module(module_name)
+        except Exception as error:
+            logger.error("加载本地工具%s失败: %s", module_name, error)
+            return []
+
+        tools: List[Dict[str, Any]] = []
+        for class_name, obj in inspect.getmembers(module, inspect.isclass):
+            if (
+                not issubclass(obj, BaseTool)
+                or obj is BaseTool
+                or obj.__module__ != module_name
+                or inspect.isabstract(obj)
+            ):
+                continue
+            try:
+                instance = obj()
+                function_config = instance.function_config
+                instance.close()
+            except Exception as error:
+                logger.error("加载本地工具%s失败: %s", class_name, error)
+                continue
+            self._classes[(module_name, class_name)] = obj
+            spec = ToolSpec(
+                name=function_config["function"]["name"],
+                function_config=function_config,
+                module=module_name,
+                class_name=class_name,
+            )
+            tools.append(asdict(spec))
+            logger.info("已发现本地工具: %s", spec.name)
+        return tools
+
+    def _discover_server(self, server_name: str) -> Optional[List[Dict[str, Any]]]:
+        """连接 MCP 服务器并记录其工具列表，连接失败时返回 None。"""
+        try:
+            adapter = self.mcp_adapter(server_name)
+        except Exception as error:
+            logger.error("加载MCP服务器失败: %s", error)
+            return None
+        configs = adapter.get_tool_configs()
+        if not configs:
+            return None
+        logger.info("已发现MCP服务器: %s", server_name)
+        return [
+            asdict(ToolSpec(name=tool["function"]["name"], function_config=tool, server=server_name))
+            for tool in configs
+        ]
+
+    def mcp_adapter(self, server_name: str) -> Any:
+        """返回进程内共享的 MCP 适配器，首次调用时连接服务器。
+
+        Args:
+            server_name: MCP 服务器名。
+
+        Returns:
+            MCPServerAdapter 实例。
+
+        Raises:
+            KeyError: 服务器未配置时抛出。
+        """
+        with self._adapter_lock:
+            adapter = self._adapters.get(server_name)
+            if adapter is None:
+                from ctf_tool.mcp_adapter import MCPServerAdapter
+
+                adapter = MCPServerAdapter(self._mcp_configs[server_name])
+                self._adapters[server_name] = adapter
+                logger.info("已连接MCP服务器: %s", server_name)
+            return adapter
+
+    def instantiate(self, spec: ToolSpec) -> BaseTool:
+        """创建工具实例；MCP 工具返回共享的服务器适配器。
+
+        Args:
+            spec: 工具描述。
+
+        Returns:
+            工具实例。
+        """
+        if spec.server:
+            return self.mcp_adapter(spec.server)
+        key = (spec.module, spec.class_name)
+        tool_class = self._classes.get(key)
+        if tool_class is None:
+            tool_class = getattr(importlib.import_module(spec.module), spec.class_name)
+            self._classes[key] = tool_class
+        instance = tool_class()
+        logger.info("已加载本地工具: %s", spec.name)
+        return instance
+
+    def lazy_tools(self, config: Dict[str, Any]) -> Tuple[LazyToolMap, List[ToolSpec]]:
+        """返回按需实例化的工具映射及对应的工具描述。
+
+        Args:
+            config: 全局配置字典。
+
+        Returns:
+            二元组：(工具映射, 工具描述列表)。
+        """
+        specs = self.specs(config)
+        return LazyToolMap(self, specs), specs
+
+    def refresh(self) -> None:
+        """丢弃清单，下次获取时重新发现全部工具。"""
+        with self._lock:
+            self._manifest = {}
+            self._write_manifest(self._manifest)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        """读取清单（进程内只读取一次），版本不符或损坏时返回空清单。"""
+        if self._manifest is None:
+            manifest: Dict[str, Any] = {}
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as file:
+                    manifest = json.load(file)
+            except (OSError, ValueError):
+                pass
+            if not isinstance(manifest, dict) or manifest.get("version") != _MANIFEST_VERSION:
+                manifest = {}
+            self._manifest = manifest
+        return self._manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        """原子写入清单文件。"""
+        manifest["version"] = _MANIFEST_VERSION
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(manifest, file, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.manifest_path)
+        except OSError as error:
+            logger.warning("写入工具清单失败: %s", error)
+
+
+_registry: Optional[ToolRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_tool_registry() -> ToolRegistry:
+    """获取进程级共享的工具注册表。
+
+    Returns:
+        共享的 ToolRegistry 实例。
+    """
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ToolRegistry()
+    return _registry
@@ -0,0 +1,266 @@
+"""工具命令执行进程池。
+
+多道题在同一进程中并发求解时，命令不再由持有全部 LLM 状态的主解释器逐条派生，
+而是交给预先启动的执行进程（POSIX 上使用 forkserver）通过本地 IPC 执行；
+执行进程中的输出经队列实时回传，执行进程崩溃时只影响当前命令，进程池随即重建。
+"""
+
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from utils.process_runner import ProcessResult, current_output_listener, run_streaming
+from utils.resource_governor import CgroupManager, ResourceLimits
+
+logger = logging.getLogger(__name__)
+
+# 执行进程内的全局状态（由 _worker_init 设置）
+_worker_output_queue: Optional[Any] = None
+_worker_cgroups: Dict[str, Optional[CgroupManager]] = {}
+
+
+def _worker_init(output_queue: Any) -> None:
+    """执行进程初始化：保存输出回传队列。"""
+    global _worker_output_queue
+    _worker_output_queue = output_queue
+
+
+def _worker_ping() -> int:
+    """预热任务：返回执行进程 pid。"""
+    return os.getpid()
+
+
+def _worker_run(
+    task_id: int,
+    stream: bool,
+    args: List[str],
+    cwd: Optional[str],
+    env: Optional[Dict[str, str]],
+    timeout: Optional[float],
+    buffer_bytes: int,
+    max_output_bytes: int,
+    limits: Optional[ResourceLimits],
+    cgroup_config: Optional[Dict[str, Any]],
+) -> ProcessResult:
+    """在执行进程中运行一条命令。"""
+    cgroup = None
+    if cgroup_config:
+        key = repr(sorted(cgroup_config.items()))
+        if key not in _worker_cgroups:
+            _worker_cgroups[key] = CgroupManager.from_config(cgroup_config)
+        cgroup = _worker_cgroups[key]
+
+    listener: Optional[Callable[[str], None]] = None
+    if stream and _worker_output_queue is not None:
+        output_queue = _worker_output_queue
+
+        def listener(chunk: str) -> None:
+            output_queue.put((task_id, chunk))
+
+    try:
+        return run_streaming(
+            args,
+            cwd=cwd,
+            env=env,
+            timeout=timeout,
+            buffer_bytes=buffer_bytes,
+            max_output_bytes=max_output_bytes,
+            listener=listener,
+            limits=limits,
+            cgroup=cgroup,
+        )
+    finally:
+        if listener is not None:
+            # 结束标记，保证主进程在返回结果前已转发完全部实时输出
+            _worker_output_queue.put((task_id, None))
+
+
+class ToolWorkerPool:
+    """预启动的命令执行进程池。"""
+
+    def __init__(self, workers: int = 4) -> None:
+        """初始化进程池并预启动执行进程。
+
+        Args:
+            workers: 执行进程数量。
+        """
+        self.workers = max(1, workers)
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in methods else "spawn"
+        )
+        if self._context.get_start_method() == "forkserver":
+            self._context.set_forkserver_preload(["utils.process_runner"])
+
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count(1)
+        # 任务号 -> (实时输出回调, 输出转发完成事件)
+        self._listeners: Dict[int, Tuple[Callable[[str], None], threading.Event]] = {}
+        self._output_queue = self._context.Queue()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._closed = False
+
+        self._pump = threading.Thread(target=self._pump_output, name="tool-worker-output", daemon=True)
+        self._pump.start()
+        self._start_executor()
+
+    def _start_executor(self) -> None:
+        """创建执行进程池并预热全部执行进程。"""
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=_worker_init,
+            initargs=(self._output_queue,),
+        )
+        for _ in range(self.workers):
+            executor.submit(_worker_ping)
+        self._executor = executor
+        logger.info(
+            "已启动 %d 个工具执行进程（%s）",
+            self.workers,
+            self._context.get_start_method(),
+        )
+
+    def _pump_output(self) -> None:
+        """转发执行进程回传的实时输出。"""
+        while True:
+            try:
+                item = self._output_queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            task_id, chunk = item
+            with self._lock:
+                entry = self._listeners.get(task_id)
+            if entry is None:
+                continue
+            listener, finished = entry
+            if chunk is None:
+                finished.set()
+                continue
+            try:
+                listener(chunk)
+            except Exception as error:
+                logger.debug("实时输出回调失败: %s", error)
+
+    def run(
+        self,
+        args: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        buffer_bytes: int = 1 << 20,
+        max_output_bytes: int = 64 << 20,
+        limits: Optional[ResourceLimits] = None,
+        cgroup_config: Optional[Dict[str, Any]] = None,
+    ) -> ProcessResult:
+        """在执行进程中运行命令，参数含义同 run_streaming。
+
+        实时输出转发给当前上下文注册的监听器。
+
+        Returns:
+            ProcessResult 执行结果。
+
+        Raises:
+            RuntimeError: 执行进程崩溃或进程池已关闭时抛出。
+        """
+        listener = current_output_listener()
+        finished = threading.Event()
+        task_id = next(self._task_ids)
+        with self._lock:
+            if self._closed or self._executor is None:
+                raise RuntimeError("工具执行进程池已关闭")
+            executor = self._executor
+            if listener is not None:
+                self._listeners[task_id] = (listener, finished)
+
+        try:
+            future = executor.submit(
+                _worker_run,
+                task_id,
+                listener is not None,
+                args,
+                cwd,
+                env,
+                timeout,
+                buffer_bytes,
+                max_output_bytes,
+                limits,
+                cgroup_config,
+            )
+            result = future.result()
+            if listener is not None:
+                finished.wait(timeout=1)
+            return result
+        except BrokenProcessPool as error:
+            logger.error("工具执行进程异常退出，重建进程池: %s", error)
+            self._restart(executor)
+            raise RuntimeError("工具执行进程异常退出，命令未完成") from error
+        finally:
+            with self._lock:
+                self._listeners.pop(task_id, None)
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """替换已损坏的进程池（多个调用同时发现时只重建一次）。"""
+        with self._lock:
+            if self._closed or self._executor is not broken:
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._start_executor()
+
+    def close(self) -> None:
+        """关闭进程池与输出转发线程。"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._output_queue.put(None)
+        self._pump.join(timeout=5)
+
+
+_pool: Optional[ToolWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[ToolWorkerPool]:
+    """获取进程级共享的执行进程池；未配置 tool_execution.worker_processes 时返回 None。
+
+    Returns:
+        ToolWorkerPool 实例或 None。
+    """
+    global _pool
+
+    if _pool is None:
+        try:
+            execution_config = Config.load_config().get("tool_execution", {})
+        except ValueError:
+            execution_config = {}
+        workers = execution_config.get("worker_processes", 0) if isinstance(execution_config, dict) else 0
+        if not isinstance(workers, int) or workers <= 0:
+            return None
+        with _pool_lock:
+            if _pool is None:
+                _pool = ToolWorkerPool(workers)
+                atexit.register(shutdown_worker_pool)
+    return _pool
+
+
+def shutdown_worker_pool() -> None:
+    """关闭共享执行进程池（程序退出前调用）。"""
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
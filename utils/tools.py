@@ -1,10 +1,9 @@
-import importlib
-import inspect
+import contextvars
 import json
 import logging
-import os
 import re
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
 import json_repair
 import yaml
@@ -13,7 +12,11 @@ from jinja2 import Environment, FileSystemLoader
 from config import Config
 from ctf_tool.base_tool import BaseTool
 from utils.llm_request import LLMRequest
+from utils.process_runner import output_listener
 from utils.text import fix_json_with_llm
+from utils.tool_memo import CACHED_MARKER, get_tool_memo
+from utils.tool_output import get_spiller
+from utils.tool_registry import get_tool_registry
 
 logger = logging.getLogger(__name__)
 
@@ -32,11 +35,13 @@ class ToolUtils:
             ValueError: 当配置文件不存在或读取失败时抛出。
         """
         self.config = Config.load_config()
-        self.analyzer_llm = LLMRequest("solve_agent")
+        self.analyzer_llm = LLMRequest("summarizer")
 
-        self.tools: Dict[str, Any] = {}
+        self.tools: Mapping[str, BaseTool] = {}
         self.local_function_configs: List[Dict[str, Any]] = []
         self.mcp_function_configs: List[Dict[str, Any]] = []
+        # 工具集合版本，每次加载工具后递增，用于失效已渲染的工具提示词块
+        self.tools_version = 0
 
         with open("./prompt.yaml", "r", encoding="utf-8") as prompt_file:
             self.prompt: dict = yaml.safe_load(prompt_file)
@@ -46,66 +51,21 @@ class ToolUtils:
 
         self.env = Environment(loader=FileSystemLoader("."))
 
-    def load_tools(self) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    def load_tools(self) -> Tuple[Mapping[str, BaseTool], List[Dict[str, Any]]]:
         """加载工具并区分本地工具与 MCP 工具。
 
+        工具描述来自进程内共享的注册表（带清单缓存），工具实例在首次调用时才创建。
+
         Returns:
-            二元组：(工具实例字典, 工具配置列表)。
+            二元组：(按需实例化的工具映射, 工具配置列表)。
         """
         config = Config.load_config()
-        tools_dir = os.path.join(os.path.dirname(__file__), "..", "ctf_tool")
-
-        self.local_function_configs = []
-        self.mcp_function_configs = []
-        self.tools = {}
-
-        for file_name in os.listdir(tools_dir):
-            if file_name.endswith(".py") and file_name not in [
-                "__init__.py",
-                "base_tool.py",
-                "mcp_adapter.py",
-            ]:
-                module_name = file_name[:-3]
-                try:
-                    module = importlib.import_module(f"ctf_tool.{module_name}")
-                    for name, obj in inspect.getmembers(module):
-                        if (
-                            inspect.isclass(obj)
-                            and issubclass(obj, BaseTool)
-                            and obj != BaseTool
-                        ):
-                            if name in config.get("tool_config", {}):
-                                tool_instance = obj()
-                            else:
-                                tool_instance = obj()
-
-                            tool_name = tool_instance.function_config["function"][
-                                "name"
-                            ]
-                            self.tools[tool_name] = tool_instance
-                            self.local_function_configs.append(
-                                tool_instance.function_config
-                            )
-                            logger.info("已加载本地工具: %s", tool_name)
-                except Exception as error:
-                    logger.error("加载本地工具%s失败: %s", module_name, str(error))
-
-        mcp_servers: dict = config.get("mcp_server", {})
-        for server_name, server_config in mcp_servers.items():
-            try:
-                from ctf_tool.mcp_adapter import MCPServerAdapter
+        self.tools, specs = get_tool_registry().lazy_tools(config)
 
-                server_config["name"] = server_name
-                adapter = MCPServerAdapter(server_config)
+        self.local_function_configs = [spec.function_config for spec in specs if not spec.server]
+        self.mcp_function_configs = [spec.function_config for spec in specs if spec.server]
 
-                for mcp_tool_config in adapter.get_tool_configs():
-                    tool_name = mcp_tool_config["function"]["name"]
-                    self.tools[tool_name] = adapter
-                    self.mcp_function_configs.append(mcp_tool_config)
-
-                logger.info("已加载MCP服务器: %s", server_name)
-            except Exception as error:
-                logger.error("加载MCP服务器失败: %s", str(error))
+        self.tools_version += 1
 
         all_configs = self.local_function_configs + self.mcp_function_configs
         return self.tools, all_configs
@@ -217,9 +177,9 @@ class ToolUtils:
         """
         @brief 从 XML 字符串中解析 tool_calls。
 
-        支持的 XML 格式：
+        支持的 XML 格式（independent 可选，标记可与相邻调用并行执行）：
         <tool_calls>
-          <tool_call name="工具名">
+          <tool_call name="工具名" independent="true">
             <arg key="参数名">参数值</arg>
           </tool_call>
         </tool_calls>
@@ -243,10 +203,9 @@ class ToolUtils:
                     if key:
                         arguments[key] = value
                 if tool_name:
-                    tool_calls.append({
-                        "tool_name": tool_name,
-                        "arguments": arguments,
-                    })
+                    tool_calls.append(ToolUtils._make_tool_call(
+                        tool_name, arguments, tc_elem.get("independent")
+                    ))
         except Exception:
             logger.debug("xml.etree 解析失败，尝试正则回退")
             tool_calls = ToolUtils._parse_tool_calls_from_xml_regex(xml_str)
@@ -257,15 +216,40 @@ class ToolUtils:
 
         return tool_calls
 
+    @staticmethod
+    def _make_tool_call(
+        tool_name: str,
+        arguments: Dict[str, Any],
+        independent: Any = None,
+    ) -> Dict[str, Any]:
+        """构造工具调用字典，仅在标记为可并行时写入 independent 字段。
+
+        Args:
+            tool_name: 工具名。
+            arguments: 调用参数。
+            independent: 计划中的 independent 标记（布尔值或 "true" 等字符串）。
+
+        Returns:
+            工具调用字典。
+        """
+        tool_call: Dict[str, Any] = {"tool_name": tool_name, "arguments": arguments}
+        if independent is True or (
+            isinstance(independent, str) and independent.strip().lower() in ("true", "1", "yes")
+        ):
+            tool_call["independent"] = True
+        return tool_call
+
     @staticmethod
     def _parse_tool_calls_from_xml_regex(xml_str: str) -> List[Dict[str, Any]]:
         """正则回退解析 XML 格式的 tool_calls。"""
         tool_calls: List[Dict[str, Any]] = []
 
-        # 匹配每个 <tool_call name="...">...</tool_call>
-        tc_pattern = r"<tool_call\s+name\s*=\s*\"(.*?)\">(.*?)</tool_call>"
+        # 匹配每个 <tool_call name="..." ...>...</tool_call>
+        tc_pattern = r"<tool_call\s+([^>]*)>(.*?)</tool_call>"
+        attr_pattern = r"(\w+)\s*=\s*\"(.*?)\""
         for match in re.finditer(tc_pattern, xml_str, re.DOTALL):
-            tool_name = match.group(1)
+            attributes = dict(re.findall(attr_pattern, match.group(1)))
+            tool_name = attributes.get("name", "")
             inner = match.group(2)
             arguments: Dict[str, Any] = {}
 
@@ -277,10 +261,9 @@ class ToolUtils:
                 arguments[key] = value
 
             if tool_name:
-                tool_calls.append({
-                    "tool_name": tool_name,
-                    "arguments": arguments,
-                })
+                tool_calls.append(ToolUtils._make_tool_call(
+                    tool_name, arguments, attributes.get("independent")
+                ))
 
         return tool_calls
 
@@ -345,7 +328,9 @@ class ToolUtils:
             arguments = tool_call.get("arguments", {})
             if not isinstance(arguments, dict):
                 arguments = {}
-            tool_calls.append({"tool_name": func_name, "arguments": arguments})
+            tool_calls.append(ToolUtils._make_tool_call(
+                func_name, arguments, tool_call.get("independent")
+            ))
 
         for tool_call in tool_calls:
             logger.info("使用工具: %s", tool_call.get("tool_name"))
@@ -353,72 +338,177 @@ class ToolUtils:
 
         return tool_calls
 
+    @staticmethod
+    def plan_batches(tool_calls: List[Dict[str, Any]]) -> List[List[int]]:
+        """按 independent 标记将工具调用划分为顺序执行的批次。
+
+        连续标记为 independent 的调用组成一个可并行的批次；未标记的调用单独成批，
+        作为屏障等待此前的调用全部完成后才执行，之后的调用也等待它完成。
+
+        Args:
+            tool_calls: 工具调用计划列表。
+
+        Returns:
+            批次列表，每个批次为调用在计划中的下标列表。
+        """
+        batches: List[List[int]] = []
+        for index, tool_call in enumerate(tool_calls):
+            if tool_call.get("independent") and batches and tool_calls[batches[-1][0]].get(
+                "independent"
+            ):
+                batches[-1].append(index)
+            else:
+                batches.append([index])
+        return batches
+
+    @staticmethod
+    def _run_tool_call(
+        tools: Mapping[str, BaseTool],
+        tool_call: Dict[str, Any],
+        display_stream: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """执行单个工具调用。
+
+        Args:
+            tools: 工具实例映射，key 为工具名。
+            tool_call: 工具调用，包含 tool_name 和 arguments。
+            display_stream: 可选的流式显示回调。
+
+        Returns:
+            工具结果字典，包含 tool_name、arguments 与 raw_output。
+        """
+        tool_name = tool_call.get("tool_name")
+        arguments: Dict[str, Any] = tool_call.get("arguments", {})
+
+        tool: Optional[BaseTool] = None
+        load_error = ""
+        if tool_name in tools:
+            try:
+                tool = tools[tool_name]
+            except Exception as error:
+                logger.error("创建工具 %s 失败: %s", tool_name, error)
+                load_error = f"工具加载失败: {str(error)}"
+
+        memo_key: Optional[Tuple[str, float]] = None
+        memo = get_tool_memo()
+        if tool is None or getattr(tool, "persistent_session", False):
+            # 常驻 Shell 会话的当前目录会随 cd 变化，工具的基准目录无法正确解析相对路径，
+            # 该工具的调用既不读取也不写入缓存
+            memo = None
+        if memo is not None:
+            memo_key = memo.make_key(tool_name, arguments, getattr(tool, "cwd", None))
+            if memo_key is not None:
+                cached = memo.get(memo_key[0])
+                if cached is not None:
+                    # 缓存的是落盘前的原始输出，返回时重新按阈值生成预览（落盘内容按哈希去重）
+                    result = f"{CACHED_MARKER}\n{get_spiller().spill(cached)}"
+                    logger.info("工具 %s 命中结果缓存:\n%s", tool_name, result)
+                    return {"tool_name": tool_name, "arguments": arguments, "raw_output": result}
+
+        if tool is None:
+            result = load_error or f"错误: 未找到工具 '{tool_name}'"
+        else:
+            streamed: List[str] = []
+
+            def forward(chunk: str) -> None:
+                if display_stream is not None:
+                    display_stream(chunk)
+                    streamed[:1] = [chunk]
+
+            try:
+                with output_listener(forward if display_stream else None):
+                    result = tool.execute(tool_name, arguments)
+                if not result:
+                    result = "注意！无输出内容！"
+                result = str(result)
+                if memo is not None and memo_key is not None:
+                    memo.put(memo_key[0], tool_name, result, memo_key[1])
+                result = get_spiller().spill(result)
+            except Exception as error:
+                result = f"工具执行出错: {str(error)}"
+            if streamed and not streamed[0].endswith("\n"):
+                forward("\n")
+
+        logger.info("工具 %s 原始输出:\n%s", tool_name, result)
+        return {"tool_name": tool_name, "arguments": arguments, "raw_output": result}
+
     @staticmethod
     def execute_tools(
-        tools: Dict[str, BaseTool],
+        tools: Mapping[str, BaseTool],
         tool_calls: List[Dict[str, Any]],
         display_message: Optional[Callable[[str], None]] = None,
+        display_stream: Optional[Callable[[str], None]] = None,
+        max_workers: Optional[int] = None,
     ) -> Tuple[List[Dict[str, Any]], str]:
         """执行一组工具调用并收集原始输出。
 
+        标记为 independent 的相邻调用在线程池中并行执行（并行时不实时显示输出），
+        结果始终按计划顺序返回。开启 tool_memo 时，符合缓存规则且输入未变化的调用
+        直接返回带 [cached] 标记的缓存结果。超过 tool_output.spill_threshold 的输出会落盘，
+        结果中只保留首尾预览与句柄。
+
         Args:
             tools: 工具实例映射，key 为工具名。
             tool_calls: 工具调用计划列表，每项包含 tool_name 和 arguments。
             display_message: 可选的消息显示回调，用于输出执行进度。
+            display_stream: 可选的流式显示回调，用于实时输出工具执行过程中的内容。
+            max_workers: 并行执行的最大线程数，缺省读取 tool_execution.max_workers。
 
         Returns:
             二元组：(工具结果列表, 合并后的原始输出字符串)。
         """
-        all_tool_results: List[Dict[str, Any]] = []
-        combined_raw_output = ""
-
-        for index, tool_call in enumerate(tool_calls):
-            tool_name = tool_call.get("tool_name")
-            arguments: Dict[str, Any] = tool_call.get("arguments", {})
+        if max_workers is None:
+            try:
+                execution_config = Config.load_config().get("tool_execution", {})
+            except ValueError:
+                execution_config = {}
+            max_workers = int(execution_config.get("max_workers", 4))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
+        total = len(tool_calls)
+
+        for batch in ToolUtils.plan_batches(tool_calls):
+            if len(batch) == 1 or max_workers <= 1:
+                for index in batch:
+                    if display_message is not None:
+                        display_message(
+                            f"\n执行工具 {index + 1}/{total}: "
+                            f"{tool_calls[index].get('tool_name')}"
+                        )
+                    results[index] = ToolUtils._run_tool_call(
+                        tools, tool_calls[index], display_stream
+                    )
+                continue
 
             if display_message is not None:
+                names = ", ".join(str(tool_calls[index].get("tool_name")) for index in batch)
                 display_message(
-                    f"\n执行工具 {index + 1}/{len(tool_calls)}: "
-                    f"{tool_name}"
+                    f"\n并行执行工具 {batch[0] + 1}-{batch[-1] + 1}/{total}: {names}"
                 )
-
-            if tool_name in tools:
-                try:
-                    tool = tools[tool_name]
-                    result = tool.execute(tool_name, arguments)
-                    if not result:
-                        result = "注意！无输出内容！"
-
-                    tool_result = {
-                        "tool_name": tool_name,
-                        "arguments": arguments,
-                        "raw_output": result,
-                    }
-                    all_tool_results.append(tool_result)
-                    combined_raw_output += str(result) + "\n---\n"
-                except Exception as error:
-                    error_msg = f"工具执行出错: {str(error)}"
-                    tool_result = {
-                        "tool_name": tool_name,
-                        "arguments": arguments,
-                        "raw_output": error_msg,
-                    }
-                    all_tool_results.append(tool_result)
-                    combined_raw_output += error_msg + "\n---\n"
-            else:
-                error_msg = f"错误: 未找到工具 '{tool_name}'"
-                tool_result = {
-                    "tool_name": tool_name,
-                    "arguments": arguments,
-                    "raw_output": error_msg,
+            with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(batch)),
+                thread_name_prefix="tool",
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        ToolUtils._run_tool_call,
+                        tools,
+                        tool_calls[index],
+                    ): index
+                    for index in batch
                 }
-                all_tool_results.append(tool_result)
-                combined_raw_output += error_msg + "\n---\n"
-
-            logger.info(
-                "工具 %s 原始输出:\n%s",
-                tool_name,
-                all_tool_results[-1]["raw_output"],
-            )
-
+                for future in as_completed(futures):
+                    index = futures[future]
+                    results[index] = future.result()
+                    if display_message is not None:
+                        display_message(
+                            f"工具 {index + 1}/{total} 执行完成: "
+                            f"{tool_calls[index].get('tool_name')}"
+                        )
+
+        all_tool_results = [result for result in results if result is not None]
+        combined_raw_output = "".join(
+            f"{result['raw_output']}\n---\n" for result in all_tool_results
+        )
         return all_tool_results, combined_raw_output
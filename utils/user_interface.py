@@ -55,6 +55,14 @@ class UserInterface(ABC):
         """
         pass
 
+    def display_stream(self, chunk: str) -> None:
+        """增量显示流式文本（默认不显示，子类按需覆盖）。
+
+        Args:
+            chunk: 新到达的文本片段。
+        """
+        del chunk
+
     @abstractmethod
     def manual_approval(self, think: str, tool_calls: Any) -> tuple[bool, tuple[str, Any]]:
         """在手动模式下获取用户对当前步骤的批准。
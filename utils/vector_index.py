@@ -0,0 +1,106 @@
+"""内存向量索引，支持余弦相似度 top-k 检索。
+
+安装 numpy 时使用矩阵运算，否则退回纯 Python 实现（适合数百条以内的步骤记忆）。
+"""
+
+import heapq
+import math
+from typing import Any, Collection, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    """将向量归一化为单位长度（零向量原样返回）。"""
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        return list(vector)
+    return [value / norm for value in vector]
+
+
+class VectorIndex:
+    """以任意可哈希键索引的向量集合。"""
+
+    def __init__(self) -> None:
+        """初始化空索引。"""
+        self._keys: List[Any] = []
+        self._vectors: List[List[float]] = []
+        # numpy 可用时缓存堆叠后的矩阵，新增向量后失效
+        self._matrix: Optional[Any] = None
+
+    def __len__(self) -> int:
+        """索引中的向量数量。"""
+        return len(self._keys)
+
+    def __contains__(self, key: Any) -> bool:
+        """键是否已被索引。"""
+        return key in self._keys
+
+    def add(self, key: Any, vector: Sequence[float]) -> None:
+        """加入一条向量。
+
+        Args:
+            key: 向量对应的键。
+            vector: 向量数据。
+        """
+        self._keys.append(key)
+        self._vectors.append(_normalize(vector))
+        self._matrix = None
+
+    def discard(self, key: Any) -> None:
+        """移除键对应的向量（不存在时忽略）。
+
+        Args:
+            key: 向量对应的键。
+        """
+        if key not in self._keys:
+            return
+        index = self._keys.index(key)
+        del self._keys[index]
+        del self._vectors[index]
+        self._matrix = None
+
+    def clear(self) -> None:
+        """清空索引。"""
+        self._keys = []
+        self._vectors = []
+        self._matrix = None
+
+    def search(
+        self,
+        vector: Sequence[float],
+        k: int,
+        exclude: Collection[Any] = (),
+    ) -> List[Tuple[Any, float]]:
+        """检索与给定向量余弦相似度最高的 k 条记录。
+
+        Args:
+            vector: 查询向量。
+            k: 返回数量。
+            exclude: 需要排除的键。
+
+        Returns:
+            (键, 相似度) 列表，按相似度从高到低排列。
+        """
+        if not self._keys or k <= 0:
+            return []
+
+        query = _normalize(vector)
+        if numpy is not None:
+            if self._matrix is None:
+                self._matrix = numpy.asarray(self._vectors, dtype=numpy.float32)
+            scores = (self._matrix @ numpy.asarray(query, dtype=numpy.float32)).tolist()
+        else:
+            scores = [
+                sum(a * b for a, b in zip(row, query)) for row in self._vectors
+            ]
+
+        candidates = (
+            (key, float(score))
+            for key, score in zip(self._keys, scores)
+            if key not in exclude
+        )
+        return heapq.nlargest(k, candidates, key=lambda item: item[1])
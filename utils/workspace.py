@@ -0,0 +1,299 @@
+"""每道题独立的工作目录。
+
+每次求解在 workspace.root 下获得自己的目录（题目标识加上本次运行的唯一后缀），题目附件
+优先以 reflink（写时复制）方式放入，不支持时复制，也可显式改用只读的硬链接；工作目录超过配额时提示模型清理，求解结束后自动删除，
+中断的求解保留目录以便恢复，超过 max_age_hours 的残留目录在下次创建工作目录时回收。
+当前工作目录通过 contextvars 传递，工具据此决定命令的执行目录。
+"""
+
+import contextlib
+import contextvars
+import errno
+import logging
+import os
+import re
+import shutil
+import stat as stat_module
+import time
+import uuid
+from typing import Any, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Linux FICLONE ioctl：在支持的文件系统（btrfs、xfs 等）上创建共享数据块的副本
+_FICLONE = 0x40049409
+# 运行目录名中题目标识之后的后缀：-时间戳-随机串
+_RUN_SUFFIX = r"-\d{14}-[0-9a-f]{6}"
+
+_current_workspace: contextvars.ContextVar[Optional["Workspace"]] = contextvars.ContextVar(
+    "current_workspace", default=None
+)
+
+
+def current_workspace() -> Optional["Workspace"]:
+    """返回当前上下文的工作目录，未启用时返回 None。"""
+    return _current_workspace.get()
+
+
+@contextlib.contextmanager
+def workspace_scope(workspace: Optional["Workspace"]) -> Iterator[None]:
+    """在上下文内设置当前工作目录。
+
+    Args:
+        workspace: 工作目录，None 表示不使用独立工作目录。
+    """
+    token = _current_workspace.set(workspace)
+    try:
+        yield
+    finally:
+        _current_workspace.reset(token)
+
+
+def _reflink(source: str, target: str) -> bool:
+    """尝试以 reflink 方式创建文件副本。"""
+    if fcntl is None or not hasattr(fcntl, "ioctl"):
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        shutil.copystat(source, target)
+        return True
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(target)
+        return False
+
+
+class Workspace:
+    """一次求解的独立工作目录。"""
+
+    def __init__(
+        self,
+        root: str,
+        problem_id: str,
+        quota_mb: int = 0,
+        link_mode: str = "auto",
+        keep_on_finish: bool = False,
+        run_name: Optional[str] = None,
+    ) -> None:
+        """创建工作目录。
+
+        Args:
+            root: 工作目录根路径。
+            problem_id: 题目标识。
+            quota_mb: 配额（MB），0 表示不限；不计入以链接方式放入的附件。
+            link_mode: 附件放入方式：auto（reflink，不支持时复制）、reflink、copy，
+                或显式指定的 hardlink（链接后文件设为只读，原附件同样变为只读）。
+            keep_on_finish: 求解结束后是否保留工作目录。
+            run_name: 目录名，缺省为题目标识加时间戳与随机后缀，
+                保证同一道题的并发求解互不干扰。
+        """
+        self.root = os.path.abspath(root)
+        self.problem_id = problem_id
+        self.name = run_name or (
+            f"{problem_id}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        )
+        self.path = os.path.join(self.root, self.name)
+        self.quota_bytes = max(0, quota_mb) * 1024 * 1024
+        self.link_mode = link_mode
+        self.keep_on_finish = keep_on_finish
+        self.attachments: List[str] = []
+        # 以链接方式放入的附件 (设备号, inode)，计算用量时跳过
+        self._shared_inodes: Set[Tuple[int, int]] = set()
+        os.makedirs(self.path, exist_ok=True)
+        # 恢复时复用的目录同样刷新修改时间，避免被其他进程的回收误删
+        os.utime(self.path)
+
+    def stage(self, sources: Optional[List[str]]) -> List[str]:
+        """将附件放入工作目录。
+
+        Args:
+            sources: 附件路径列表。
+
+        Returns:
+            成功放入的附件文件名列表。
+        """
+        for source in sources or []:
+            if not os.path.isfile(source):
+                logger.warning("附件不存在，已跳过: %s", source)
+                continue
+            name = os.path.basename(source)
+            target = os.path.join(self.path, name)
+            if os.path.exists(target):
+                if name not in self.attachments:
+                    self.attachments.append(name)
+                continue
+            try:
+                method = self._place(source, target)
+            except OSError as error:
+                logger.error("放入附件 %s 失败: %s", source, error)
+                continue
+            if method != "copy":
+                stat = os.stat(target)
+                self._shared_inodes.add((stat.st_dev, stat.st_ino))
+            self.attachments.append(name)
+            logger.info("附件 %s 已放入工作目录（%s）", name, method)
+        return list(self.attachments)
+
+    def _place(self, source: str, target: str) -> str:
+        """按 link_mode 放入单个附件，返回实际使用的方式。
+
+        硬链接与原附件共用同一 inode，原地修改会改动原附件，因此只在显式配置时使用，
+        并去掉写权限（权限同样作用于原附件；root 用户不受写权限约束）。
+        """
+        if self.link_mode in ("auto", "reflink") and _reflink(source, target):
+            return "reflink"
+        if self.link_mode == "hardlink":
+            try:
+                os.link(source, target)
+                mode = os.stat(target).st_mode
+                os.chmod(
+                    target,
+                    mode & ~(stat_module.S_IWUSR | stat_module.S_IWGRP | stat_module.S_IWOTH),
+                )
+                return "hardlink"
+            except OSError as error:
+                if error.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+        shutil.copy2(source, target)
+        return "copy"
+
+    def usage_bytes(self) -> int:
+        """统计工作目录实际占用的字节数（不含共享数据块的附件）。"""
+        total = 0
+        for directory, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    stat = os.lstat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                if (stat.st_dev, stat.st_ino) in self._shared_inodes:
+                    continue
+                total += getattr(stat, "st_blocks", 0) * 512 or stat.st_size
+        return total
+
+    def check_quota(self) -> Optional[str]:
+        """检查配额。
+
+        Returns:
+            超出配额时返回提示文本，否则返回 None。
+        """
+        if not self.quota_bytes:
+            return None
+        used = self.usage_bytes()
+        if used <= self.quota_bytes:
+            return None
+        return (
+            f"[注意] 工作目录 {self.path} 已占用 {used / 1048576:.0f}MB，"
+            f"超过 {self.quota_bytes / 1048576:.0f}MB 配额，请删除不再需要的中间文件"
+        )
+
+    def cleanup(self) -> None:
+        """删除工作目录。"""
+        shutil.rmtree(self.path, ignore_errors=True)
+        logger.info("已清理工作目录: %s", self.path)
+
+    @classmethod
+    def from_config(
+        cls,
+        problem_id: str,
+        config: Any,
+        resume: bool = False,
+    ) -> Optional["Workspace"]:
+        """按 workspace 配置创建工作目录，并回收过期的残留目录。
+
+        Args:
+            problem_id: 题目标识。
+            config: workspace 配置字典。
+            resume: 是否从存档恢复；为 True 时复用该题最近一次中断留下的目录。
+
+        Returns:
+            Workspace 实例；未启用时返回 None。
+        """
+        if not isinstance(config, dict) or not config.get("enabled", False):
+            return None
+        root = str(config.get("root", "./workspaces"))
+        run_name = latest_run(root, problem_id) if resume else None
+        collect_garbage(
+            root,
+            float(config.get("max_age_hours", 72)),
+            keep={run_name} if run_name else None,
+        )
+        return cls(
+            root=root,
+            problem_id=problem_id,
+            run_name=run_name,
+            quota_mb=int(config.get("quota_mb", 0) or 0),
+            link_mode=str(config.get("link_mode", "auto")),
+            keep_on_finish=bool(config.get("keep_on_finish", False)),
+        )
+
+
+def latest_run(root: str, problem_id: str) -> Optional[str]:
+    """返回某道题最近修改的工作目录名，不存在时返回 None。
+
+    Args:
+        root: 工作目录根路径。
+        problem_id: 题目标识。
+    """
+    if not os.path.isdir(root):
+        return None
+    # 精确匹配目录名格式，避免 web 匹配到 web-easy 等以其为前缀的题目
+    pattern = re.compile(re.escape(problem_id) + _RUN_SUFFIX + "$")
+    candidates = [
+        entry
+        for entry in os.scandir(root)
+        if entry.is_dir(follow_symlinks=False) and pattern.match(entry.name)
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda entry: entry.stat().st_mtime).name
+
+
+def collect_garbage(root: str, max_age_hours: float, keep: Optional[Set[str]] = None) -> int:
+    """删除根目录下超过保留时长未修改的工作目录。
+
+    Args:
+        root: 工作目录根路径。
+        max_age_hours: 保留时长（小时），<=0 表示不回收。
+        keep: 不回收的目录名。
+
+    Returns:
+        删除的目录数量。
+    """
+    if max_age_hours <= 0 or not os.path.isdir(root):
+        return 0
+    deadline = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in os.scandir(root):
+        if not entry.is_dir(follow_symlinks=False) or entry.name in (keep or set()):
+            continue
+        if _modified_since(entry.path, deadline):
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+        logger.info("已回收过期工作目录: %s", entry.path)
+    return removed
+
+
+def _modified_since(path: str, deadline: float) -> bool:
+    """目录树中是否有文件或子目录在 deadline 之后修改过。
+
+    顶层目录的修改时间不随子目录内的写入或已有文件的改写而变化，需逐项检查；
+    无法读取的条目按仍在使用处理。
+    """
+    try:
+        if os.stat(path).st_mtime >= deadline:
+            return True
+        for directory, dirs, files in os.walk(path):
+            for name in dirs + files:
+                if os.lstat(os.path.join(directory, name)).st_mtime >= deadline:
+                    return True
+    except OSError:
+        return True
+    return False